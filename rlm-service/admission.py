@@ -0,0 +1,280 @@
+"""
+Admission Control
+
+Bounds how much work the worker takes on at once. Without it every /query
+immediately starts embedding, retrieval and Sonnet calls, and background
+imports on the same worker compete for the same event loop.
+
+Work is admitted through lanes, each with its own concurrency limit and
+FIFO wait queue, so interactive queries are never starved by import jobs:
+
+- "interactive" (/query, /query/stream): when all slots are busy, requests
+  wait up to ADMISSION_QUEUE_TIMEOUT_SECONDS; when the queue is full or the
+  wait times out they are rejected fast with 503 + Retry-After. A single
+  user holding ADMISSION_MAX_PER_USER requests is rejected with 429.
+- "import" (quick pass) and "full_pass" (chunking, facts, MEMORY): jobs
+  wait as long as needed once accepted; the endpoints reject new jobs with
+  503 only when the lane's queue is already full. Full passes run for
+  minutes, so they get their own lane rather than delaying quick passes.
+  Endpoints that answer 202 reserve() the slot or queue position before
+  responding and hand the reservation to the background job, so a burst
+  can't be accepted and then rejected once the job starts.
+
+Queue wait time is recorded in soulprint_admission_wait_seconds{lane}.
+
+Config (env):
+- ADMISSION_QUERY_CONCURRENCY          (default 32)
+- ADMISSION_QUERY_QUEUE                (waiting requests, default 64, 0 = unbounded)
+- ADMISSION_QUEUE_TIMEOUT_SECONDS      (default 10)
+- ADMISSION_MAX_PER_USER               (in-flight + queued per user, default 4, 0 = off)
+- ADMISSION_IMPORT_CONCURRENCY         (default 2)
+- ADMISSION_IMPORT_QUEUE               (waiting jobs, default 50, 0 = unbounded)
+- ADMISSION_FULL_PASS_CONCURRENCY      (default 2)
+- ADMISSION_FULL_PASS_QUEUE            (waiting jobs, default 50, 0 = unbounded)
+"""
+
+import os
+import math
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any
+
+from metrics import counter, histogram
+
+
+ADMISSION_QUERY_CONCURRENCY = int(os.getenv("ADMISSION_QUERY_CONCURRENCY", "32"))
+ADMISSION_QUERY_QUEUE = int(os.getenv("ADMISSION_QUERY_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
+ADMISSION_MAX_PER_USER = int(os.getenv("ADMISSION_MAX_PER_USER", "4"))
+ADMISSION_IMPORT_CONCURRENCY = int(os.getenv("ADMISSION_IMPORT_CONCURRENCY", "2"))
+ADMISSION_IMPORT_QUEUE = int(os.getenv("ADMISSION_IMPORT_QUEUE", "50"))
+ADMISSION_FULL_PASS_CONCURRENCY = int(os.getenv("ADMISSION_FULL_PASS_CONCURRENCY", "2"))
+ADMISSION_FULL_PASS_QUEUE = int(os.getenv("ADMISSION_FULL_PASS_QUEUE", "50"))
+
+ADMISSION_WAIT_SECONDS = histogram(
+    "soulprint_admission_wait_seconds",
+    "Time spent queued for an admission slot by lane",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+ADMISSION_TOTAL = counter("soulprint_admission_total", "Admission decisions by lane and result")
+
+# Retry-After bounds (seconds)
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 30
+
+
+class AdmissionRejected(Exception):
+    """Raised when a lane can't take more work; carries the HTTP status and Retry-After."""
+
+    def __init__(self, lane: str, reason: str, status_code: int, retry_after: int):
+        super().__init__(f"{lane} lane rejected request: {reason}")
+        self.lane = lane
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Reservation:
+    """A slot (waiter is None) or queue position claimed by reserve(), consumed by one acquire()."""
+
+    __slots__ = ("waiter",)
+
+    def __init__(self, waiter: Optional[asyncio.Future] = None):
+        self.waiter = waiter
+
+
+class Lane:
+    """Concurrency limit plus a bounded FIFO queue; freed slots go straight to the oldest waiter."""
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        queue_size: int,
+        queue_timeout: Optional[float] = None,
+        max_per_user: int = 0,
+    ):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.max_per_user = max_per_user
+        self.active = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._per_user: Dict[str, int] = {}
+        self._hold_total = 0.0
+        self._holds = 0
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_full": 0,
+            "rejected_timeout": 0,
+            "rejected_user": 0,
+            "wait_total_ms": 0.0,
+            "wait_max_ms": 0.0,
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def retry_after(self) -> int:
+        """Estimate when a slot frees up from the average hold time and queue depth."""
+        if not self._holds:
+            return MIN_RETRY_AFTER
+        average_hold = self._hold_total / self._holds
+        estimate = average_hold * (self.queue_depth + 1) / max(self.concurrency, 1)
+        return int(min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(estimate))))
+
+    def _reject(self, reason: str, status_code: int) -> AdmissionRejected:
+        self.stats[f"rejected_{reason}"] += 1
+        ADMISSION_TOTAL.inc(lane=self.name, result=f"rejected_{reason}")
+        return AdmissionRejected(self.name, reason, status_code, self.retry_after())
+
+    def check_capacity(self) -> None:
+        """Raise AdmissionRejected if a new request would be rejected as queue-full."""
+        if self.active >= self.concurrency and self.queue_size and self.queue_depth >= self.queue_size:
+            raise self._reject("full", 503)
+
+    def reserve(self, user_id: Optional[str] = None) -> Reservation:
+        """Synchronously take a slot or a queue position.
+
+        Raises AdmissionRejected like acquire(). The reservation must be passed
+        to acquire() exactly once.
+        """
+        if user_id and self.max_per_user and self._per_user.get(user_id, 0) >= self.max_per_user:
+            raise self._reject("user", 429)
+
+        if self.active < self.concurrency and not self.queue_depth:
+            self.active += 1
+            return Reservation()
+
+        self.check_capacity()
+        self._add_user(user_id)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["queued"] += 1
+        return Reservation(waiter)
+
+    async def acquire(self, user_id: Optional[str] = None, reservation: Optional[Reservation] = None) -> None:
+        waiter = (reservation or self.reserve(user_id)).waiter
+        if waiter is not None:
+            started = time.perf_counter()
+            try:
+                if self.queue_timeout is None:
+                    await waiter
+                else:
+                    await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if waiter.done() and not waiter.cancelled():
+                    # A slot was handed over just as we gave up -- pass it on
+                    self._release_slot()
+                else:
+                    try:
+                        self._waiters.remove(waiter)
+                    except ValueError:
+                        pass
+                self._remove_user(user_id)
+                if isinstance(e, asyncio.TimeoutError):
+                    raise self._reject("timeout", 503) from None
+                raise
+            waited = time.perf_counter() - started
+            ADMISSION_WAIT_SECONDS.observe(waited, lane=self.name)
+            self.stats["wait_total_ms"] += waited * 1000
+            self.stats["wait_max_ms"] = max(self.stats["wait_max_ms"], waited * 1000)
+            self._remove_user(user_id)
+
+        self.stats["admitted"] += 1
+        ADMISSION_TOTAL.inc(lane=self.name, result="admitted")
+        self._add_user(user_id)
+
+    def _add_user(self, user_id: Optional[str]) -> None:
+        if user_id:
+            self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+
+    def _remove_user(self, user_id: Optional[str]) -> None:
+        if user_id and user_id in self._per_user:
+            self._per_user[user_id] -= 1
+            if self._per_user[user_id] <= 0:
+                del self._per_user[user_id]
+
+    def _release_slot(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # Slot transfers; active count unchanged
+                return
+        self.active -= 1
+
+    def release(self, user_id: Optional[str] = None, held_seconds: Optional[float] = None) -> None:
+        self._remove_user(user_id)
+        if held_seconds is not None:
+            self._hold_total += held_seconds
+            self._holds += 1
+        self._release_slot()
+
+
+_lanes: Dict[str, Lane] = {
+    "interactive": Lane(
+        "interactive",
+        ADMISSION_QUERY_CONCURRENCY,
+        ADMISSION_QUERY_QUEUE,
+        queue_timeout=ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        max_per_user=ADMISSION_MAX_PER_USER,
+    ),
+    "import": Lane("import", ADMISSION_IMPORT_CONCURRENCY, ADMISSION_IMPORT_QUEUE),
+    "full_pass": Lane("full_pass", ADMISSION_FULL_PASS_CONCURRENCY, ADMISSION_FULL_PASS_QUEUE),
+}
+
+
+def get_lane(name: str) -> Lane:
+    return _lanes[name]
+
+
+def reserve(lane: str, user_id: Optional[str] = None) -> Reservation:
+    """Claim a slot or queue position now (raises AdmissionRejected); pass it to acquire()/admit()."""
+    return _lanes[lane].reserve(user_id)
+
+
+async def acquire(lane: str, user_id: Optional[str] = None, reservation: Optional[Reservation] = None) -> float:
+    """Wait for a slot in the lane (raises AdmissionRejected). Returns the admit time for release()."""
+    await _lanes[lane].acquire(user_id, reservation)
+    return time.perf_counter()
+
+
+def release(lane: str, user_id: Optional[str] = None, admitted_at: Optional[float] = None) -> None:
+    """Give the slot back (exactly once per successful acquire)."""
+    held = time.perf_counter() - admitted_at if admitted_at is not None else None
+    _lanes[lane].release(user_id, held)
+
+
+@asynccontextmanager
+async def admit(lane: str, user_id: Optional[str] = None, reservation: Optional[Reservation] = None):
+    """Hold a lane slot for the duration of the block."""
+    admitted_at = await acquire(lane, user_id, reservation)
+    try:
+        yield
+    finally:
+        release(lane, user_id, admitted_at)
+
+
+def get_admission_stats() -> Dict[str, Any]:
+    """Active/queued counts, limits and admit/reject counters per lane."""
+    stats: Dict[str, Any] = {}
+    for name, lane in _lanes.items():
+        admitted = lane.stats["admitted"]
+        queued = lane.stats["queued"]
+        stats[f"{name}_active"] = lane.active
+        stats[f"{name}_queue_depth"] = lane.queue_depth
+        stats[f"{name}_concurrency"] = lane.concurrency
+        stats[f"{name}_queue_size"] = lane.queue_size
+        stats[f"{name}_admitted"] = admitted
+        stats[f"{name}_queued"] = queued
+        stats[f"{name}_rejected_full"] = lane.stats["rejected_full"]
+        stats[f"{name}_rejected_timeout"] = lane.stats["rejected_timeout"]
+        stats[f"{name}_rejected_user"] = lane.stats["rejected_user"]
+        stats[f"{name}_wait_avg_ms"] = round(lane.stats["wait_total_ms"] / queued, 2) if queued else 0.0
+        stats[f"{name}_wait_max_ms"] = round(lane.stats["wait_max_ms"], 2)
+    return stats
@@ -0,0 +1,259 @@
+"""
+Failure Alert Dispatcher
+
+Alerts used to be POSTed to the webhook inline, inside the request path --
+adding a full HTTP round trip to already-degraded requests and posting one
+message per failure during an outage. Now alert_failure() only enqueues; a
+background dispatcher does the sending:
+
+- Bounded queue: enqueue never blocks; when full, the alert is dropped and
+  counted
+- Batching: alerts arriving within ALERT_BATCH_WINDOW_SECONDS of the first
+  one go out as a single webhook message
+- De-duplication: alerts with the same error signature (error text with
+  numbers/ids masked) are coalesced into one line with a count and the
+  number of affected users
+- Rate limiting: at most ALERT_MAX_POSTS_PER_WINDOW webhook posts per
+  ALERT_RATE_WINDOW_SECONDS; batches over the limit are held, their counts
+  merged into the next allowed post, and sent as soon as the window has
+  room even if no further alert arrives
+
+Without ALERT_WEBHOOK, batches are printed as [ALERT] lines instead.
+
+Config (env):
+- ALERT_WEBHOOK                  (optional)
+- ALERT_QUEUE_SIZE               (default 1000)
+- ALERT_BATCH_WINDOW_SECONDS     (default 5)
+- ALERT_MAX_POSTS_PER_WINDOW     (default 6)
+- ALERT_RATE_WINDOW_SECONDS      (default 60)
+"""
+
+import os
+import re
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+
+import httpx
+
+
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "1000"))
+ALERT_BATCH_WINDOW_SECONDS = float(os.getenv("ALERT_BATCH_WINDOW_SECONDS", "5"))
+ALERT_MAX_POSTS_PER_WINDOW = int(os.getenv("ALERT_MAX_POSTS_PER_WINDOW", "6"))
+ALERT_RATE_WINDOW_SECONDS = float(os.getenv("ALERT_RATE_WINDOW_SECONDS", "60"))
+
+# Held (rate-limited) signatures are capped so an outage can't grow memory
+MAX_HELD_SIGNATURES = 100
+
+_queue: Optional[asyncio.Queue] = None
+_task: Optional[asyncio.Task] = None
+_client: Optional[httpx.AsyncClient] = None
+
+# signature -> {"error", "message", "count", "users"}
+_held: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_post_times: List[float] = []
+# Batch being collected by the dispatcher (flushed on shutdown if interrupted)
+_batch: List[tuple] = []
+
+_stats = {
+    "enqueued": 0,
+    "dropped": 0,
+    "coalesced": 0,
+    "rate_limited": 0,
+    "posts": 0,
+    "post_errors": 0,
+}
+
+
+def error_signature(error: str) -> str:
+    """Group alerts by error text with ids, numbers and hex masked."""
+    signature = re.sub(r"[0-9a-f]{8}-[0-9a-f-]{27,}", "<id>", error.lower())
+    signature = re.sub(r"0x[0-9a-f]+|\d+(\.\d+)?", "#", signature)
+    return signature[:200]
+
+
+def alert_failure(error: str, user_id: str, message: str) -> None:
+    """Queue a failure alert. Never blocks and never raises."""
+    global _queue
+    try:
+        if _queue is None:
+            _queue = asyncio.Queue(maxsize=ALERT_QUEUE_SIZE)
+        _queue.put_nowait((error, user_id, message))
+        _stats["enqueued"] += 1
+    except asyncio.QueueFull:
+        _stats["dropped"] += 1
+        return
+
+    # Start lazily if the lifespan hook didn't (scripts, tests) or the dispatcher died
+    if _task is None or _task.done():
+        try:
+            start_alert_dispatcher()
+        except RuntimeError:
+            pass  # No running loop -- picked up once the dispatcher starts
+
+
+def _coalesce(batch: List[tuple]) -> "OrderedDict[str, Dict[str, Any]]":
+    groups: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    for error, user_id, message in batch:
+        signature = error_signature(error)
+        group = groups.get(signature)
+        if group is None:
+            groups[signature] = {"error": error, "message": message, "count": 1, "users": {user_id}}
+        else:
+            group["count"] += 1
+            group["users"].add(user_id)
+    _stats["coalesced"] += len(batch) - len(groups)
+    return groups
+
+
+def _merge_held(groups: "OrderedDict[str, Dict[str, Any]]") -> None:
+    for signature, group in groups.items():
+        held = _held.get(signature)
+        if held is None:
+            if len(_held) >= MAX_HELD_SIGNATURES:
+                _held.popitem(last=False)
+            _held[signature] = group
+        else:
+            held["count"] += group["count"]
+            held["users"] |= group["users"]
+
+
+def _format_batch(groups: "OrderedDict[str, Dict[str, Any]]") -> str:
+    total = sum(group["count"] for group in groups.values())
+    lines = [f"🚨 SoulPrint RLM Failure ({total} alert{'s' if total != 1 else ''})"]
+    for group in groups.values():
+        users = sorted(group["users"])
+        user_text = users[0] if len(users) == 1 else f"{len(users)} users"
+        lines.append(
+            f"• x{group['count']} | User: {user_text} | Error: {group['error'][:300]}"
+            f" | Message: {group['message'][:100]}"
+        )
+    return "\n".join(lines)
+
+
+async def _send(groups: "OrderedDict[str, Dict[str, Any]]") -> None:
+    global _client
+    text = _format_batch(groups)
+    webhook = os.getenv("ALERT_WEBHOOK")
+    if not webhook:
+        print(f"[ALERT] {text}")
+        return
+
+    try:
+        if _client is None:
+            _client = httpx.AsyncClient(timeout=10.0)
+        response = await _client.post(webhook, json={"text": text})
+        if not 200 <= response.status_code < 300:
+            _stats["post_errors"] += 1
+            print(f"Failed to send alert: webhook returned {response.status_code}: {response.text[:200]}")
+            return
+        _stats["posts"] += 1
+    except Exception as e:
+        _stats["post_errors"] += 1
+        print(f"Failed to send alert: {e}")
+
+
+def _seconds_until_post_allowed() -> float:
+    """0 if a post fits in the rate window now, else the wait until the oldest post leaves it."""
+    now = time.monotonic()
+    while _post_times and now - _post_times[0] >= ALERT_RATE_WINDOW_SECONDS:
+        _post_times.pop(0)
+    if len(_post_times) < ALERT_MAX_POSTS_PER_WINDOW:
+        return 0.0
+    return _post_times[0] + ALERT_RATE_WINDOW_SECONDS - now
+
+
+async def _flush(batch: List[tuple]) -> None:
+    """Coalesce a batch and send it, or hold it if over the rate limit."""
+    groups = _coalesce(batch)
+    _merge_held(groups)
+
+    if _seconds_until_post_allowed() > 0:
+        _stats["rate_limited"] += len(batch)
+        return
+
+    _post_times.append(time.monotonic())
+    pending = OrderedDict(_held)
+    _held.clear()
+    await _send(pending)
+
+
+async def _dispatch_loop() -> None:
+    queue = _queue
+    while True:
+        if _held:
+            # Held (rate-limited) alerts go out once the window has room,
+            # whether or not another alert arrives first
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=_seconds_until_post_allowed() + 0.01)
+            except asyncio.TimeoutError:
+                await _flush([])
+                continue
+        else:
+            item = await queue.get()
+        _batch.append(item)
+        deadline = time.monotonic() + ALERT_BATCH_WINDOW_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                _batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        batch = list(_batch)
+        _batch.clear()
+        await _flush(batch)
+
+
+def start_alert_dispatcher() -> None:
+    """Start the background dispatcher (called from the FastAPI lifespan hook)."""
+    global _queue, _task
+    if _task is not None and not _task.done():
+        return
+    if _queue is None:
+        _queue = asyncio.Queue(maxsize=ALERT_QUEUE_SIZE)
+    _task = asyncio.get_running_loop().create_task(_dispatch_loop())
+
+
+async def stop_alert_dispatcher(timeout: float = 5.0) -> None:
+    """Stop the dispatcher, flushing queued and held alerts (bounded by timeout)."""
+    global _task, _client, _queue
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+    remaining: List[tuple] = list(_batch)
+    _batch.clear()
+    while _queue is not None and not _queue.empty():
+        remaining.append(_queue.get_nowait())
+    _queue = None
+
+    if remaining:
+        _merge_held(_coalesce(remaining))
+    if _held:
+        pending = OrderedDict(_held)
+        _held.clear()
+        try:
+            await asyncio.wait_for(_send(pending), timeout=timeout)
+        except asyncio.TimeoutError:
+            print("[Alerts] Timed out flushing alerts on shutdown")
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_alert_stats() -> Dict[str, Any]:
+    """Queue depth and enqueued/dropped/coalesced/rate-limited counters."""
+    return {
+        "running": _task is not None and not _task.done(),
+        "queue_depth": _queue.qsize() if _queue is not None else 0,
+        "held_signatures": len(_held),
+        **_stats,
+    }
@@ -0,0 +1,133 @@
+"""
+Shared Anthropic Client
+
+One module-level AsyncAnthropic client for the /query hot path. Building a
+synchronous anthropic.Anthropic per request both paid connection setup on
+every call and blocked the event loop for the whole generation; this client
+is async, keeps its connections alive, and is closed from the FastAPI
+lifespan hook.
+
+Also owns prompt caching: build_system_blocks() marks the stable per-user
+system prefix (persona + MEMORY) with cache_control so repeat turns read it
+from Anthropic's prompt cache, and record_usage() tracks cache reads/writes
+from each response's usage block.
+
+Config (env):
+- ANTHROPIC_TIMEOUT_SECONDS          (overall request timeout, default 60)
+- ANTHROPIC_CONNECT_TIMEOUT_SECONDS  (default 10)
+- ANTHROPIC_MAX_RETRIES              (default 2)
+- ANTHROPIC_MAX_CONNECTIONS          (default 50)
+- ANTHROPIC_MAX_KEEPALIVE            (default 20)
+- ANTHROPIC_PROMPT_CACHE             ("true"/"false", default true)
+"""
+
+import os
+from typing import Optional, List, Dict, Any
+
+import anthropic
+
+
+ANTHROPIC_TIMEOUT_SECONDS = float(os.getenv("ANTHROPIC_TIMEOUT_SECONDS", "60"))
+ANTHROPIC_CONNECT_TIMEOUT_SECONDS = float(os.getenv("ANTHROPIC_CONNECT_TIMEOUT_SECONDS", "10"))
+ANTHROPIC_MAX_RETRIES = int(os.getenv("ANTHROPIC_MAX_RETRIES", "2"))
+ANTHROPIC_MAX_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", "50"))
+ANTHROPIC_MAX_KEEPALIVE = int(os.getenv("ANTHROPIC_MAX_KEEPALIVE", "20"))
+ANTHROPIC_PROMPT_CACHE = os.getenv("ANTHROPIC_PROMPT_CACHE", "true").lower() not in ("0", "false", "no")
+
+_client: Optional[anthropic.AsyncAnthropic] = None
+
+
+def get_anthropic_client() -> anthropic.AsyncAnthropic:
+    """Return the shared AsyncAnthropic client, creating it lazily."""
+    global _client
+    if _client is None:
+        # Build Limits from the SDK's own HTTP package (httpx or httpx2 depending on version)
+        limits_cls = type(anthropic.DEFAULT_CONNECTION_LIMITS)
+        _client = anthropic.AsyncAnthropic(
+            api_key=os.getenv("ANTHROPIC_API_KEY"),
+            timeout=anthropic.Timeout(ANTHROPIC_TIMEOUT_SECONDS, connect=ANTHROPIC_CONNECT_TIMEOUT_SECONDS),
+            max_retries=ANTHROPIC_MAX_RETRIES,
+            http_client=anthropic.DefaultAsyncHttpxClient(
+                limits=limits_cls(
+                    max_connections=ANTHROPIC_MAX_CONNECTIONS,
+                    max_keepalive_connections=ANTHROPIC_MAX_KEEPALIVE,
+                ),
+            ),
+        )
+        print(
+            f"[Anthropic] Shared async client created (timeout={ANTHROPIC_TIMEOUT_SECONDS}s, "
+            f"max_retries={ANTHROPIC_MAX_RETRIES}, max_connections={ANTHROPIC_MAX_CONNECTIONS})"
+        )
+    return _client
+
+
+async def close_anthropic_client() -> None:
+    """Close the shared client (called on app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+# ============================================
+# Prompt Caching
+# ============================================
+
+_cache_stats = {
+    "requests": 0,
+    "cache_hits": 0,
+    "cache_writes": 0,
+    "input_tokens": 0,
+    "cache_read_input_tokens": 0,
+    "cache_creation_input_tokens": 0,
+}
+
+
+def build_system_blocks(stable_prefix: str, volatile_suffix: str) -> List[Dict[str, Any]]:
+    """System prompt as content blocks, with a cache breakpoint after the stable prefix.
+
+    Prefixes shorter than the model's minimum cacheable length are simply not
+    cached by the API, so this is safe to use unconditionally.
+    """
+    blocks: List[Dict[str, Any]] = []
+    if stable_prefix:
+        block: Dict[str, Any] = {"type": "text", "text": stable_prefix}
+        if ANTHROPIC_PROMPT_CACHE:
+            block["cache_control"] = {"type": "ephemeral"}
+        blocks.append(block)
+    if volatile_suffix:
+        blocks.append({"type": "text", "text": volatile_suffix})
+    return blocks
+
+
+def record_usage(usage: Any) -> None:
+    """Accumulate prompt-cache accounting from a Message.usage block."""
+    if usage is None:
+        return
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+    cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+
+    _cache_stats["requests"] += 1
+    _cache_stats["input_tokens"] += getattr(usage, "input_tokens", None) or 0
+    _cache_stats["cache_read_input_tokens"] += cache_read
+    _cache_stats["cache_creation_input_tokens"] += cache_write
+    if cache_read:
+        _cache_stats["cache_hits"] += 1
+    if cache_write:
+        _cache_stats["cache_writes"] += 1
+
+
+def get_prompt_cache_stats() -> Dict[str, Any]:
+    """Prompt cache hit rate and token split (cached reads vs uncached input)."""
+    requests = _cache_stats["requests"]
+    total_input = (
+        _cache_stats["input_tokens"]
+        + _cache_stats["cache_read_input_tokens"]
+        + _cache_stats["cache_creation_input_tokens"]
+    )
+    return {
+        "enabled": ANTHROPIC_PROMPT_CACHE,
+        **_cache_stats,
+        "hit_rate": round(_cache_stats["cache_hits"] / requests, 4) if requests else 0.0,
+        "cached_token_ratio": round(_cache_stats["cache_read_input_tokens"] / total_input, 4) if total_input else 0.0,
+    }
@@ -0,0 +1 @@
+"""Offline benchmarks for the RLM service (see query_bench.py)."""
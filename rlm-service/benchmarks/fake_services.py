@@ -0,0 +1,281 @@
+"""
+Local Stand-ins for Benchmarks
+
+One FastAPI app that impersonates every upstream /query talks to, so the
+service can be load-tested with no network access or credentials:
+
+- Supabase PostgREST: conversation_chunks reads, match_conversation_chunks
+  (+ _hybrid) RPCs, user_profiles reads/updates
+- AWS Bedrock runtime: Titan Embed v2 invoke_model (768-dim embeddings)
+- Anthropic Messages API: plain and streamed (SSE) responses, optionally
+  asking for the web_search tool on a fraction of turns
+
+Each upstream sleeps for a latency drawn from a log-normal distribution
+given as median and p95 in ms, so tail behaviour can be modelled as well
+as the typical case. Chunk text is synthetic but realistically sized.
+
+Usage (normally started by benchmarks/query_bench.py):
+    python -m benchmarks.fake_services --port 8765 \\
+        --latency supabase=15:60 --latency bedrock=40:150 \\
+        --latency anthropic_ttft=600:1800 --latency anthropic_token=12:25
+"""
+
+import math
+import json
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import Dict, Tuple, List
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+# name -> (median_ms, p95_ms)
+DEFAULT_LATENCY: Dict[str, Tuple[float, float]] = {
+    "supabase": (15, 60),
+    "bedrock": (40, 150),
+    "anthropic_ttft": (600, 1800),
+    "anthropic_token": (12, 25),
+}
+
+EMBEDDING_DIMENSIONS = 768
+CHUNK_CHARS = 1800
+RESPONSE_WORDS = 60
+
+WORDS = (
+    "we talked about the trip to lisbon and the new job offer then my sister called about "
+    "the wedding plans budget spreadsheet running training plan dinner with sam golf on "
+    "saturday the project deadline moved again and I started reading about stoicism"
+).split()
+
+
+class LatencyModel:
+    """Log-normal latency with the given median and 95th percentile."""
+
+    def __init__(self, median_ms: float, p95_ms: float):
+        self.median_ms = median_ms
+        self.p95_ms = max(p95_ms, median_ms)
+        # p95 of a log-normal is median * exp(1.645 * sigma)
+        self.sigma = math.log(self.p95_ms / median_ms) / 1.645 if median_ms > 0 else 0.0
+
+    def sample_seconds(self) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.median_ms), self.sigma) / 1000
+
+    async def sleep(self) -> None:
+        delay = self.sample_seconds()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def parse_latency(specs: List[str]) -> Dict[str, LatencyModel]:
+    """Parse ["name=median:p95", ...] over DEFAULT_LATENCY."""
+    table = dict(DEFAULT_LATENCY)
+    for spec in specs or []:
+        name, _, value = spec.partition("=")
+        if name not in table:
+            raise ValueError(f"Unknown latency target {name!r} (expected one of {sorted(table)})")
+        median, _, p95 = value.partition(":")
+        table[name] = (float(median), float(p95 or median))
+    return {name: LatencyModel(*values) for name, values in table.items()}
+
+
+def _seeded(*parts: str) -> random.Random:
+    digest = hashlib.sha1("|".join(parts).encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _text(rng: random.Random, chars: int) -> str:
+    words = []
+    length = 0
+    while length < chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:chars]
+
+
+def _chunk(user_id: str, index: int, similarity: float = None) -> dict:
+    rng = _seeded(user_id, str(index))
+    chunk = {
+        "id": f"00000000-0000-0000-0000-{index:012d}",
+        "user_id": user_id,
+        "conversation_id": f"conv-{index // 4}",
+        "title": f"Conversation {index // 4}",
+        "content": _text(rng, CHUNK_CHARS),
+        "chunk_tier": "medium",
+        "message_count": rng.randint(4, 40),
+        "created_at": f"2025-{1 + index % 12:02d}-{1 + index % 28:02d}T12:00:00+00:00",
+    }
+    if similarity is not None:
+        chunk["similarity"] = similarity
+    return chunk
+
+
+def create_app(latency: Dict[str, LatencyModel], tool_use_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="SoulPrint benchmark stand-ins")
+    stats = {"supabase": 0, "bedrock": 0, "anthropic": 0}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    # ---------------- Supabase PostgREST ----------------
+
+    @app.get("/rest/v1/conversation_chunks")
+    async def conversation_chunks(request: Request):
+        stats["supabase"] += 1
+        await latency["supabase"].sleep()
+        user_id = request.query_params.get("user_id", "eq.anon")[3:]
+        limit = int(request.query_params.get("limit", "100"))
+        return [_chunk(user_id, i) for i in range(min(limit, 100))]
+
+    @app.post("/rest/v1/rpc/match_conversation_chunks")
+    @app.post("/rest/v1/rpc/match_conversation_chunks_hybrid")
+    async def match_chunks(request: Request):
+        stats["supabase"] += 1
+        body = await request.json()
+        await latency["supabase"].sleep()
+        user_id = body.get("match_user_id", "anon")
+        rng = _seeded(user_id, str(body.get("query_embedding", [0])[:4]))
+        picks = rng.sample(range(200), body.get("match_count", 8))
+        chunks = []
+        for rank, index in enumerate(picks):
+            chunk = _chunk(user_id, index, similarity=round(0.8 - rank * 0.04, 4))
+            if "query_text" in body:
+                chunk["lexical_rank"] = 0.0
+                chunk["rrf_score"] = 1 / (60 + rank + 1)
+            chunks.append(chunk)
+        return chunks
+
+    @app.get("/rest/v1/user_profiles")
+    async def get_profiles():
+        stats["supabase"] += 1
+        await latency["supabase"].sleep()
+        return []
+
+    @app.patch("/rest/v1/user_profiles")
+    async def patch_profiles():
+        stats["supabase"] += 1
+        await latency["supabase"].sleep()
+        return Response(status_code=204)
+
+    # ---------------- Bedrock runtime ----------------
+
+    @app.post("/model/{model_id}/invoke")
+    async def invoke_model(model_id: str, request: Request):
+        stats["bedrock"] += 1
+        body = json.loads(await request.body())
+        await latency["bedrock"].sleep()
+        rng = _seeded(body.get("inputText", ""))
+        dimensions = body.get("dimensions", EMBEDDING_DIMENSIONS)
+        return {
+            "embedding": [rng.gauss(0, 1) for _ in range(dimensions)],
+            "inputTextTokenCount": len(body.get("inputText", "")) // 4,
+        }
+
+    # ---------------- Anthropic Messages ----------------
+
+    def _wants_tool(body: dict) -> bool:
+        last = body["messages"][-1]
+        already_searched = isinstance(last.get("content"), list) and any(
+            isinstance(block, dict) and block.get("type") == "tool_result" for block in last["content"]
+        )
+        return bool(body.get("tools")) and not already_searched and random.random() < tool_use_rate
+
+    def _usage() -> dict:
+        return {
+            "input_tokens": 1200,
+            "output_tokens": RESPONSE_WORDS,
+            "cache_read_input_tokens": 900,
+            "cache_creation_input_tokens": 0,
+        }
+
+    @app.get("/v1/models")
+    async def models():
+        return {"data": [], "has_more": False, "first_id": None, "last_id": None}
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        stats["anthropic"] += 1
+        body = await request.json()
+        tool = _wants_tool(body)
+        words = [] if tool else [(" " if i else "") + random.choice(WORDS) for i in range(RESPONSE_WORDS)]
+        content = []
+        if tool:
+            content.append({
+                "type": "tool_use",
+                "id": f"toolu_{random.randrange(1 << 30)}",
+                "name": "web_search",
+                "input": {"query": "latest news"},
+            })
+        message = {
+            "id": f"msg_{random.randrange(1 << 30)}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model"),
+            "content": [],
+            "stop_reason": None,
+            "stop_sequence": None,
+            "usage": _usage(),
+        }
+
+        if not body.get("stream"):
+            await latency["anthropic_ttft"].sleep()
+            for _ in words:
+                await latency["anthropic_token"].sleep()
+            message["content"] = content or [{"type": "text", "text": "".join(words)}]
+            message["stop_reason"] = "tool_use" if tool else "end_turn"
+            return JSONResponse(message)
+
+        def event(kind: str, data: dict) -> str:
+            return f"event: {kind}\ndata: {json.dumps({'type': kind, **data})}\n\n"
+
+        async def stream():
+            await latency["anthropic_ttft"].sleep()
+            yield event("message_start", {"message": message})
+            if tool:
+                yield event("content_block_start", {"index": 0, "content_block": {**content[0], "input": {}}})
+                yield event("content_block_delta", {
+                    "index": 0,
+                    "delta": {"type": "input_json_delta", "partial_json": json.dumps(content[0]["input"])},
+                })
+            else:
+                yield event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+                for word in words:
+                    await latency["anthropic_token"].sleep()
+                    yield event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": word}})
+            yield event("content_block_stop", {"index": 0})
+            yield event("message_delta", {
+                "delta": {"stop_reason": "tool_use" if tool else "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": len(words) or 10},
+            })
+            yield event("message_stop", {})
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", action="append", default=[], help="name=median_ms:p95_ms")
+    parser.add_argument("--tool-use-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    import uvicorn
+    app = create_app(parse_latency(args.latency), tool_use_rate=args.tool_use_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
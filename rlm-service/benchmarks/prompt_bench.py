@@ -0,0 +1,131 @@
+"""
+Prompt Build Microbenchmark
+
+Times PromptBuilder.build_cacheable_prompt for a realistic profile (five
+JSON sections as the app stores them plus a MEMORY section) with the
+compiled persona cache off and on, for every prompt version. Each call
+varies the retrieved context and time like consecutive /query turns do,
+so only the persona part can be reused.
+
+Usage (from rlm-service/):
+    python -m benchmarks.prompt_bench
+    python -m benchmarks.prompt_bench --iterations 5000 --memory-bullets 200 --json prompt.json
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+from typing import List, Dict, Any, Optional
+
+import prompt_builder
+from prompt_builder import PromptBuilder, VALID_VERSIONS
+
+
+def build_profile(memory_bullets: int) -> Dict[str, Any]:
+    memory = "\n".join(
+        f"- Fact {i}: talked about the trip to lisbon, the training plan and the project deadline"
+        for i in range(memory_bullets)
+    )
+    return {
+        "soulprint_text": "Curious, direct, a little dry. Cares about family and running.",
+        "soul_md": json.dumps({
+            "personality_traits": ["curious", "dry", "loyal", "stubborn"],
+            "communication_style": "Short and direct",
+            "tone_preferences": "Warm but blunt",
+            "humor_style": "Deadpan",
+            "boundaries": "Doesn't want unsolicited health advice",
+        }),
+        "identity_md": json.dumps({"archetype": "The Builder", "vibe": "Calm under pressure"}),
+        "user_md": json.dumps({
+            "name": "Alex",
+            "location": "Lisbon",
+            "occupation": "Product designer",
+            "life_context": "Training for a half marathon in April.",
+            "relationships": ["Sister Maya (getting married in June)", "Sam (running partner)"],
+            "interests": ["golf", "stoicism", "running", "design systems"],
+        }),
+        "agents_md": json.dumps({
+            "response_style": "Brief",
+            "behavioral_rules": ["Be honest", "Skip pleasantries", "Ask before assuming"],
+            "do_not": ["Lecture", "Use corporate speak"],
+            "context_adaptation": "More detail for work questions.",
+            "memory_directives": "Bring up the marathon when relevant.",
+        }),
+        "tools_md": json.dumps({"output_preferences": "Bullets for lists", "depth_preference": "Go deep on design"}),
+        "memory_md": memory,
+    }
+
+
+def time_builds(version: str, profile: Dict[str, Any], iterations: int) -> List[float]:
+    """Per-call microseconds over `iterations` consecutive turns."""
+    builder = PromptBuilder(version)
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        builder.build_cacheable_prompt(
+            profile=profile,
+            ai_name="Nova",
+            memory_context=f"\n---\n**Conversation {i}** (relevance: 0.80)\nWent to Lisbon",
+            current_date="Monday, January 05, 2026",
+            current_time=f"{1 + i % 12}:00 PM UTC",
+            emotional_state={"primary": "confused", "confidence": 0.9, "cues": []},
+            relationship_arc={"stage": "developing", "messageCount": i},
+        )
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def run(iterations: int, memory_bullets: int) -> Dict[str, Any]:
+    profile = build_profile(memory_bullets)
+    report: Dict[str, Any] = {"iterations": iterations, "memory_bullets": memory_bullets, "versions": {}}
+    original = prompt_builder.PERSONA_CACHE_ENABLED
+    try:
+        for version in VALID_VERSIONS:
+            prompt_builder.clear_persona_cache()
+            prompt_builder.PERSONA_CACHE_ENABLED = False
+            uncached = time_builds(version, profile, iterations)
+            prompt_builder.PERSONA_CACHE_ENABLED = True
+            cached = time_builds(version, profile, iterations)
+            uncached_us = statistics.median(uncached)
+            cached_us = statistics.median(cached)
+            report["versions"][version] = {
+                "uncached_us_p50": round(uncached_us, 1),
+                "cached_us_p50": round(cached_us, 1),
+                "speedup": round(uncached_us / cached_us, 1) if cached_us else 0.0,
+            }
+    finally:
+        prompt_builder.PERSONA_CACHE_ENABLED = original
+        prompt_builder.clear_persona_cache()
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\nPrompt build: {report['iterations']} turns, {report['memory_bullets']} MEMORY bullets")
+    print(f"{'version':<20}{'uncached p50':>15}{'cached p50':>13}{'speedup':>10}")
+    for version, row in report["versions"].items():
+        print(
+            f"{version:<20}{row['uncached_us_p50']:>13.1f}us{row['cached_us_p50']:>11.1f}us"
+            f"{row['speedup']:>9.1f}x"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--memory-bullets", type=int, default=80)
+    parser.add_argument("--json", default=None, help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    report = run(args.iterations, args.memory_bullets)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
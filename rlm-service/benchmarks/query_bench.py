@@ -0,0 +1,416 @@
+"""
+Offline /query Benchmark
+
+Boots the RLM service against local stand-ins (benchmarks/fake_services.py)
+for Supabase, Bedrock and Anthropic -- web search uses the built-in stub
+backend -- and drives N concurrent simulated users through /query or
+/query/stream over real HTTP.
+
+Each simulated user keeps a growing chat history, sends a MEMORY section
+and soulprint text like the Next.js app does, and optionally pauses between
+turns. The report covers:
+
+- Latency p50/p95/p99/max (and time to first token for /query/stream)
+- Throughput (completed requests per second) and status code counts
+- Event-loop lag of the service's loop (a 10ms ticker measuring how late it
+  wakes up), which is where blocking calls on the hot path show up
+- Per-stage server timings from each response's `timings`
+
+The service runs in a thread of this process with its own event loop; the
+stand-ins run in a subprocess so their work doesn't skew the numbers.
+
+Usage (from rlm-service/):
+    python -m benchmarks.query_bench --users 20 --turns 5
+    python -m benchmarks.query_bench --endpoint stream --users 50 --turns 3 \\
+        --latency anthropic_ttft=300:900 --json results.json
+    python -m benchmarks.query_bench --users 5 --turns 2 --max-p95-ms 5000   # CI gate
+    python -m benchmarks.query_bench --profile-etag   # profile sent once, then by ETag
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+import threading
+from typing import List, Dict, Any, Optional
+
+import httpx
+
+
+LAG_INTERVAL_SECONDS = 0.01
+
+MESSAGES = [
+    "How did the Lisbon trip planning go last time we talked?",
+    "Remind me what Sam said about the wedding budget",
+    "I can't decide whether to take the new job offer",
+    "What's my training plan for this week?",
+    "Any thoughts on what I should read next?",
+    "What was the deadline for the project again?",
+    "I'm feeling a bit overwhelmed today",
+    "What's the latest news on the housing market?",
+]
+
+MEMORY_MD = "\n".join(
+    f"- {fact}" for fact in (
+        "Works as a product designer",
+        "Training for a half marathon in April",
+        "Sister Maya is getting married in June",
+        "Prefers short, direct answers",
+        "Reading about stoicism",
+    )
+)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(max(values), 2) if values else 0.0,
+        "mean": round(statistics.fmean(values), 2) if values else 0.0,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+
+# ============================================
+# Service under test
+# ============================================
+
+class ServiceThread:
+    """Runs the FastAPI app under uvicorn in a background thread, sampling its loop lag."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.lag_ms: List[float] = []
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._measure = threading.Event()
+
+    def start(self) -> None:
+        import uvicorn
+        from main import app
+
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._serve()), daemon=True)
+        self._thread.start()
+        wait_for_port(self.port)
+
+    async def _serve(self) -> None:
+        probe = asyncio.create_task(self._probe_lag())
+        try:
+            await self._server.serve()
+        finally:
+            probe.cancel()
+
+    async def _probe_lag(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL_SECONDS)
+            late = (time.perf_counter() - started - LAG_INTERVAL_SECONDS) * 1000
+            if self._measure.is_set():
+                self.lag_ms.append(max(late, 0.0))
+
+    def measure(self, on: bool) -> None:
+        if on:
+            self._measure.set()
+        else:
+            self._measure.clear()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=15)
+
+
+def configure_environment(fake_url: str, args: argparse.Namespace) -> None:
+    """Point every upstream at the stand-ins (overrides real credentials on purpose)."""
+    os.environ.update({
+        "SUPABASE_URL": fake_url,
+        "SUPABASE_SERVICE_KEY": "bench-service-key",
+        "ANTHROPIC_API_KEY": "bench-anthropic-key",
+        "ANTHROPIC_BASE_URL": fake_url,
+        "BEDROCK_ENDPOINT_URL": fake_url,
+        "AWS_ACCESS_KEY_ID": "bench",
+        "AWS_SECRET_ACCESS_KEY": "bench",
+        "AWS_REGION": "us-east-1",
+        "WEB_SEARCH_BACKEND": "stub",
+    })
+    os.environ.pop("ALERT_WEBHOOK", None)
+    for assignment in args.env:
+        name, _, value = assignment.partition("=")
+        os.environ[name] = value
+
+
+# ============================================
+# Load generator
+# ============================================
+
+def build_request(user_id: str, history: List[dict], rng: random.Random) -> dict:
+    return {
+        "user_id": user_id,
+        "message": rng.choice(MESSAGES),
+        "soulprint_text": "Curious, direct, a little dry. Cares about family and running.",
+        "history": list(history),
+        "ai_name": "Nova",
+        "sections": {
+            "soul": {"communication_style": "Short and direct", "personality_traits": ["curious", "dry"]},
+            "identity": {"archetype": "The Builder"},
+            "user": {"name": "Alex"},
+            "agents": {"response_style": "Brief"},
+            "tools": {},
+            "memory": MEMORY_MD,
+        },
+        "emotional_state": {"primary": rng.choice(["neutral", "curious", "stressed"]), "confidence": 0.7, "cues": []},
+        "relationship_arc": {"stage": "developing", "messageCount": len(history)},
+    }
+
+
+async def run_user(
+    client: httpx.AsyncClient,
+    index: int,
+    args: argparse.Namespace,
+    results: List[Dict[str, Any]],
+) -> None:
+    rng = random.Random(args.seed * 1000 + index)
+    user_id = f"bench-user-{index:04d}"
+    history: List[dict] = []
+    for _ in range(args.history_turns):
+        history.append({"role": "user", "content": rng.choice(MESSAGES)})
+        history.append({"role": "assistant", "content": "Sure -- " + rng.choice(MESSAGES).lower()})
+
+    profile_etag = None
+    for _ in range(args.turns):
+        body = build_request(user_id, history, rng)
+        if args.profile_etag and profile_etag:
+            # Server already holds this profile -- send its ETag instead
+            del body["sections"], body["soulprint_text"]
+            body["profile_etag"] = profile_etag
+        started = time.perf_counter()
+        result: Dict[str, Any] = {"status": None, "latency_ms": None, "ttft_ms": None, "timings": None}
+        reply = ""
+        try:
+            if args.endpoint == "stream":
+                async with client.stream("POST", "/query/stream", json=body) as response:
+                    result["status"] = response.status_code
+                    event = None
+                    async for line in response.aiter_lines():
+                        if line.startswith("event: "):
+                            event = line[7:]
+                        elif line.startswith("data: "):
+                            data = json.loads(line[6:])
+                            if event == "token":
+                                if result["ttft_ms"] is None:
+                                    result["ttft_ms"] = (time.perf_counter() - started) * 1000
+                                reply += data["text"]
+                            elif event == "done":
+                                result["timings"] = data.get("timings")
+                                profile_etag = data.get("profile_etag")
+                            elif event == "error":
+                                result["status"] = "stream_error"
+            else:
+                response = await client.post("/query", json=body)
+                result["status"] = response.status_code
+                if response.status_code == 200:
+                    data = response.json()
+                    reply = data["response"]
+                    result["timings"] = data.get("timings")
+                    profile_etag = data.get("profile_etag")
+        except httpx.HTTPError as e:
+            result["status"] = type(e).__name__
+        result["latency_ms"] = (time.perf_counter() - started) * 1000
+        results.append(result)
+        if result["status"] == 409:
+            # Server couldn't load the profile the ETag names -- resend it in full next turn
+            profile_etag = None
+
+        history.append({"role": "user", "content": body["message"]})
+        history.append({"role": "assistant", "content": reply or "..."})
+        if args.think_ms:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000)
+
+
+async def drive(base_url: str, args: argparse.Namespace, service: ServiceThread) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.users + 10, max_keepalive_connections=args.users + 10)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        # Same gate Render uses before routing traffic
+        while (await client.get("/ready")).status_code != 200:
+            await asyncio.sleep(0.05)
+
+        # Warm-up turn per user is not measured (first-use client setup, cold caches)
+        if args.warmup:
+            warm_args = argparse.Namespace(**{**vars(args), "turns": 1, "think_ms": 0})
+            await asyncio.gather(*[run_user(client, i, warm_args, []) for i in range(min(args.users, 4))])
+
+        results: List[Dict[str, Any]] = []
+        service.measure(True)
+        started = time.perf_counter()
+        await asyncio.gather(*[run_user(client, i, args, results) for i in range(args.users)])
+        elapsed = time.perf_counter() - started
+        service.measure(False)
+
+        health = (await client.get("/health")).json()
+
+    return build_report(results, elapsed, service.lag_ms, health, args)
+
+
+def build_report(
+    results: List[Dict[str, Any]],
+    elapsed: float,
+    lag_ms: List[float],
+    health: Dict[str, Any],
+    args: argparse.Namespace,
+) -> Dict[str, Any]:
+    ok = [r for r in results if r["status"] == 200]
+    statuses: Dict[str, int] = {}
+    for r in results:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+
+    stages: Dict[str, List[float]] = {}
+    for r in ok:
+        for name, ms in (r["timings"] or {}).items():
+            stages.setdefault(name, []).append(ms)
+
+    report = {
+        "config": {
+            "endpoint": args.endpoint,
+            "users": args.users,
+            "turns": args.turns,
+            "history_turns": args.history_turns,
+            "think_ms": args.think_ms,
+            "latency": args.latency,
+            "tool_use_rate": args.tool_use_rate,
+        },
+        "requests": len(results),
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize([r["latency_ms"] for r in ok]),
+        "loop_lag_ms": summarize(lag_ms),
+        "stage_ms_p50": {name: round(percentile(values, 50), 1) for name, values in sorted(stages.items())},
+        "stage_ms_p95": {name: round(percentile(values, 95), 1) for name, values in sorted(stages.items())},
+        "service": {
+            key: health.get(key)
+            for key in ("admission", "retrieval_cache", "query_embedding_cache", "embedding_executor", "prompt_cache")
+        },
+    }
+    if args.endpoint == "stream":
+        report["ttft_ms"] = summarize([r["ttft_ms"] for r in ok if r["ttft_ms"] is not None])
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    config = report["config"]
+    print()
+    print(f"=== /query{'/stream' if config['endpoint'] == 'stream' else ''} benchmark: "
+          f"{config['users']} users x {config['turns']} turns ===")
+    print(f"requests: {report['requests']}  statuses: {report['statuses']}")
+    print(f"elapsed: {report['elapsed_s']}s  throughput: {report['throughput_rps']} req/s")
+
+    def line(label: str, stats: Dict[str, float]) -> None:
+        print(f"{label:<14} p50={stats['p50']:>9.1f}  p95={stats['p95']:>9.1f}  "
+              f"p99={stats['p99']:>9.1f}  max={stats['max']:>9.1f}  (n={stats['count']})")
+
+    line("latency ms", report["latency_ms"])
+    if "ttft_ms" in report:
+        line("ttft ms", report["ttft_ms"])
+    line("loop lag ms", report["loop_lag_ms"])
+    if report["stage_ms_p50"]:
+        print("stage ms (p50 / p95):")
+        for name, p50 in report["stage_ms_p50"].items():
+            print(f"  {name:<22} {p50:>8.1f} / {report['stage_ms_p95'][name]:>8.1f}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline /query benchmark against local stand-ins")
+    parser.add_argument("--endpoint", choices=("query", "stream"), default="query")
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--turns", type=int, default=3, help="requests per user")
+    parser.add_argument("--history-turns", type=int, default=6, help="prior exchanges per user")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a user's turns")
+    parser.add_argument("--latency", action="append", default=[],
+                        help="upstream latency name=median_ms:p95_ms (supabase, bedrock, anthropic_ttft, anthropic_token)")
+    parser.add_argument("--tool-use-rate", type=float, default=0.1, help="fraction of LLM turns that call web_search")
+    parser.add_argument("--profile-etag", action="store_true",
+                        help="after the first turn send profile_etag instead of sections")
+    parser.add_argument("--env", action="append", default=[], help="extra NAME=value for the service")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="exit non-zero if p95 latency exceeds this")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    fake_port, service_port = free_port(), free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+
+    fake_cmd = [sys.executable, "-m", "benchmarks.fake_services", "--port", str(fake_port),
+                "--tool-use-rate", str(args.tool_use_rate), "--seed", str(args.seed)]
+    for spec in args.latency:
+        fake_cmd += ["--latency", spec]
+    fakes = subprocess.Popen(fake_cmd, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    service = ServiceThread(service_port)
+    try:
+        wait_for_port(fake_port)
+        configure_environment(fake_url, args)
+        service.start()
+        report = asyncio.run(drive(f"http://127.0.0.1:{service_port}", args, service))
+    finally:
+        service.stop()
+        fakes.terminate()
+        fakes.wait(timeout=10)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+    failures = report["requests"] - report["statuses"].get("200", 0)
+    if failures:
+        print(f"\n{failures} request(s) failed")
+        return 1
+    if args.max_p95_ms is not None and report["latency_ms"]["p95"] > args.max_p95_ms:
+        print(f"\np95 latency {report['latency_ms']['p95']}ms exceeds --max-p95-ms {args.max_p95_ms}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Context Packer
+
+Fits retrieved conversation chunks into a token budget for the ## CONTEXT
+block instead of blindly taking the top 10 chunks truncated to 2000 chars.
+
+- Orders chunks by relevance -- the fused rank score for hybrid retrieval,
+  otherwise similarity (stable, so un-scored fallback chunks keep their
+  recency order)
+- Removes text repeated between chunks of the same conversation: the chunker
+  starts every chunk with the last ~800 chars of the previous one, so when
+  neighbouring chunks are both retrieved that overlap is only sent once
+- Drops exact/contained duplicates outright
+- Packs greedily into the budget, truncating the last chunk that partly fits
+  at a word boundary, and skipping chunks that don't fit at all
+- Reports packed vs dropped tokens so the saving is visible per turn
+
+The budget covers MEMORY plus retrieved context, so a large MEMORY section
+shrinks the room left for chunks (never below CONTEXT_MIN_TOKENS).
+
+Config (env):
+- CONTEXT_TOKEN_BUDGET      (MEMORY + retrieved chunks, default 8000)
+- CONTEXT_MIN_TOKENS        (floor for retrieved chunks, default 1500)
+- CONTEXT_MAX_CHUNK_TOKENS  (per-chunk cap, default 500 == old 2000 chars)
+"""
+
+import os
+from typing import List, Dict, Any, Optional, Tuple
+
+from processors.conversation_chunker import estimate_tokens
+
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+CONTEXT_MIN_TOKENS = int(os.getenv("CONTEXT_MIN_TOKENS", "1500"))
+CONTEXT_MAX_CHUNK_TOKENS = int(os.getenv("CONTEXT_MAX_CHUNK_TOKENS", "500"))
+
+# Shortest repeated run treated as chunker overlap rather than coincidence
+MIN_OVERLAP_CHARS = 64
+# Don't bother packing a truncated tail smaller than this
+MIN_PARTIAL_TOKENS = 50
+
+
+def _format_chunk(title: str, similarity: float, content: str) -> str:
+    return f"\n---\n**{title}** (relevance: {similarity:.2f})\n{content}"
+
+
+def _relevance(chunk: dict) -> float:
+    # Hybrid results are ranked by rrf_score; a lexical-only hit can have low similarity
+    if chunk.get("rrf_score") is not None:
+        return chunk["rrf_score"]
+    return chunk.get("similarity") or 0
+
+
+def _overlap_length(earlier: str, later: str) -> int:
+    """Length of the longest suffix of `earlier` that is a prefix of `later`."""
+    if len(earlier) < MIN_OVERLAP_CHARS or len(later) < MIN_OVERLAP_CHARS:
+        return 0
+
+    probe = later[:MIN_OVERLAP_CHARS]
+    start = max(0, len(earlier) - len(later))
+    pos = earlier.find(probe, start)
+    while pos != -1:
+        length = len(earlier) - pos
+        if later.startswith(earlier[pos:]):
+            return length
+        pos = earlier.find(probe, pos + 1)
+    return 0
+
+
+def _strip_overlap(content: str, packed: List[str]) -> Tuple[Optional[str], int]:
+    """Remove text already present in packed chunks of the same conversation.
+
+    Returns (remaining_content, chars_removed); remaining_content is None when
+    the chunk is entirely duplicated.
+    """
+    removed = 0
+    for other in packed:
+        if content in other:
+            return None, len(content)
+
+        # Packed chunk precedes this one: drop our repeated prefix
+        prefix = _overlap_length(other, content)
+        if prefix:
+            content = content[prefix:]
+            removed += prefix
+            continue
+
+        # Packed chunk follows this one: drop our repeated suffix
+        suffix = _overlap_length(content, other)
+        if suffix:
+            content = content[:-suffix]
+            removed += suffix
+
+    content = content.strip()
+    if not content:
+        return None, removed
+    return content, removed
+
+
+def _truncate(content: str, max_tokens: int) -> str:
+    """Cut content to roughly max_tokens, preferring a word boundary."""
+    max_chars = max_tokens * 4
+    if len(content) <= max_chars:
+        return content
+    cut = content[:max_chars]
+    space = cut.rfind(" ")
+    if space > max_chars // 2:
+        cut = cut[:space]
+    return cut
+
+
+def pack_context(
+    chunks: List[dict],
+    memory_text: Optional[str] = None,
+    token_budget: Optional[int] = None,
+    max_chunk_tokens: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Pack retrieved chunks into the ## CONTEXT block within a token budget.
+
+    Args:
+        chunks: Retrieved chunks (title, content, similarity, conversation_id)
+        memory_text: MEMORY section that shares the budget (may be None)
+        token_budget: Override CONTEXT_TOKEN_BUDGET
+        max_chunk_tokens: Override CONTEXT_MAX_CHUNK_TOKENS
+
+    Returns:
+        (context_text, report) where report has packed/dropped/deduped token
+        counts and chunk counts
+    """
+    budget = token_budget if token_budget is not None else CONTEXT_TOKEN_BUDGET
+    per_chunk = max_chunk_tokens if max_chunk_tokens is not None else CONTEXT_MAX_CHUNK_TOKENS
+    memory_tokens = estimate_tokens(memory_text) if memory_text else 0
+    available = max(budget - memory_tokens, min(CONTEXT_MIN_TOKENS, budget))
+
+    ordered = sorted(chunks, key=_relevance, reverse=True)
+
+    parts: List[str] = []
+    packed_by_conversation: Dict[str, List[str]] = {}
+    used_chars = 0
+    report = {
+        "token_budget": available,
+        "memory_tokens": memory_tokens,
+        "chunks_in": len(chunks),
+        "chunks_packed": 0,
+        "chunks_truncated": 0,
+        "chunks_dropped": 0,
+        "duplicates_removed": 0,
+        "tokens_in": 0,
+        "tokens_packed": 0,
+        "tokens_deduped": 0,
+        "tokens_dropped": 0,
+    }
+
+    for chunk in ordered:
+        title = chunk.get("title") or "Untitled"
+        similarity = chunk.get("similarity") or 0
+        content = chunk.get("content") or ""
+        report["tokens_in"] += estimate_tokens(content)
+
+        conversation_id = chunk.get("conversation_id")
+        if conversation_id:
+            siblings = packed_by_conversation.get(conversation_id, [])
+            deduped, removed = _strip_overlap(content, siblings)
+            report["tokens_deduped"] += removed // 4
+            if deduped is None:
+                report["duplicates_removed"] += 1
+                continue
+            content = deduped
+
+        header = _format_chunk(title, similarity, "")
+        room = min(per_chunk, (available * 4 - used_chars - len(header)) // 4)
+        content_tokens = estimate_tokens(content)
+
+        if room < min(content_tokens, MIN_PARTIAL_TOKENS):
+            report["chunks_dropped"] += 1
+            report["tokens_dropped"] += content_tokens
+            continue
+
+        if content_tokens > room:
+            truncated = _truncate(content, room)
+            report["chunks_truncated"] += 1
+            report["tokens_dropped"] += content_tokens - estimate_tokens(truncated)
+            content = truncated
+
+        text = _format_chunk(title, similarity, content)
+        parts.append(text)
+        used_chars += len(text)
+        report["chunks_packed"] += 1
+        report["tokens_packed"] += estimate_tokens(content)
+
+        if conversation_id:
+            # Only the text actually sent can make a later neighbour's text redundant
+            packed_by_conversation.setdefault(conversation_id, []).append(content)
+
+    return "".join(parts), report
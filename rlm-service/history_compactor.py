@@ -0,0 +1,252 @@
+"""
+History Compactor
+
+Fits the chat history sent with each query into a token budget instead of a
+fixed turn count. Previously the direct path sent the last 10 turns verbatim
+and the RLM path embedded the last 5 as indented JSON, so one long paste
+blew up input tokens while short chats left the window unused.
+
+- Newest turns are kept first until HISTORY_TOKEN_BUDGET is reached
+- Any single message over HISTORY_MAX_MESSAGE_TOKENS (a pasted document,
+  a long code block) keeps its head and tail with an elision marker
+- The RLM context gets a compact "User: ... / Assistant: ..." transcript
+  within RLM_HISTORY_TOKEN_BUDGET instead of pretty-printed JSON
+- Optional rolling summary: with HISTORY_SUMMARY on and a conversation_id,
+  turns that no longer fit are summarized in the background by a small
+  model and cached per conversation; later turns reuse (and extend) it.
+  Summaries never block a query -- until one exists the older turns are
+  simply dropped.
+
+Config (env):
+- HISTORY_TOKEN_BUDGET          (direct API path, default 3000)
+- RLM_HISTORY_TOKEN_BUDGET      (RLM context transcript, default 1500)
+- HISTORY_MAX_MESSAGE_TOKENS    (per-message cap, default 800)
+- HISTORY_SUMMARY               ("true"/"false", default false)
+- HISTORY_SUMMARY_MIN_TOKENS    (dropped tokens before summarizing, default 600)
+- HISTORY_SUMMARY_MODEL         (default claude-3-5-haiku-20241022)
+- HISTORY_SUMMARY_CACHE_SIZE    (conversations, default 1000)
+- HISTORY_SUMMARY_TTL_SECONDS   (default 86400)
+"""
+
+import os
+import hashlib
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
+
+from ttl_cache import TTLCache
+from metrics import counter
+from processors.conversation_chunker import estimate_tokens
+
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+RLM_HISTORY_TOKEN_BUDGET = int(os.getenv("RLM_HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_MAX_MESSAGE_TOKENS = int(os.getenv("HISTORY_MAX_MESSAGE_TOKENS", "800"))
+HISTORY_SUMMARY = os.getenv("HISTORY_SUMMARY", "false").lower() not in ("0", "false", "no")
+HISTORY_SUMMARY_MIN_TOKENS = int(os.getenv("HISTORY_SUMMARY_MIN_TOKENS", "600"))
+HISTORY_SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", "claude-3-5-haiku-20241022")
+HISTORY_SUMMARY_CACHE_SIZE = int(os.getenv("HISTORY_SUMMARY_CACHE_SIZE", "1000"))
+HISTORY_SUMMARY_TTL_SECONDS = float(os.getenv("HISTORY_SUMMARY_TTL_SECONDS", "86400"))
+
+ELISION = "\n[... {tokens} tokens omitted ...]\n"
+SUMMARY_MAX_TOKENS = 300
+# Older turns fed to one summary call (the rest are already in the previous summary)
+SUMMARY_INPUT_TOKENS = 4000
+
+HISTORY_TOKENS = counter("soulprint_history_tokens_total", "Chat history tokens by outcome (kept, trimmed, dropped)")
+
+# (user_id, conversation_id) -> {"covered": n, "fingerprint": str, "summary": str}
+_summaries = TTLCache(max_size=HISTORY_SUMMARY_CACHE_SIZE, default_ttl=HISTORY_SUMMARY_TTL_SECONDS)
+_in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+_summary_stats = {"generated": 0, "errors": 0, "served": 0}
+
+
+def _content_text(message: dict) -> str:
+    content = message.get("content", "")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(
+            block.get("text", "") for block in content if isinstance(block, dict) and block.get("type") == "text"
+        )
+    return str(content)
+
+
+def _cap_message(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of an oversized message."""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    keep_chars = max_tokens * 4
+    head = text[: keep_chars * 2 // 3]
+    tail = text[-(keep_chars // 3):]
+    return head + ELISION.format(tokens=tokens - max_tokens) + tail
+
+
+def compact_history(
+    history: Optional[List[dict]],
+    token_budget: Optional[int] = None,
+    max_message_tokens: Optional[int] = None,
+) -> Tuple[List[dict], List[dict], Dict[str, Any]]:
+    """Keep the newest messages that fit the budget.
+
+    Returns:
+        (kept, dropped, report) -- kept is in chronological order with
+        oversized messages capped; dropped is the older remainder, untouched
+    """
+    budget = token_budget if token_budget is not None else HISTORY_TOKEN_BUDGET
+    per_message = max_message_tokens if max_message_tokens is not None else HISTORY_MAX_MESSAGE_TOKENS
+    history = [h for h in (history or []) if h.get("role") in ("user", "assistant")]
+
+    kept: List[dict] = []
+    used = 0
+    trimmed = 0
+    split = 0
+    for index in range(len(history) - 1, -1, -1):
+        message = history[index]
+        original = _content_text(message)
+        text = _cap_message(original, per_message)
+        tokens = estimate_tokens(text)
+        if used + tokens > budget and kept:
+            split = index + 1
+            break
+        kept.append({"role": message["role"], "content": text})
+        used += tokens
+        trimmed += estimate_tokens(original) - tokens
+
+    kept.reverse()
+    dropped = history[:split]
+    report = {
+        "messages_in": len(history),
+        "messages_kept": len(kept),
+        "tokens_kept": used,
+        "tokens_trimmed": trimmed,
+        "tokens_dropped": sum(estimate_tokens(_content_text(m)) for m in dropped),
+        "token_budget": budget,
+    }
+    return kept, dropped, report
+
+
+def format_history_for_rlm(messages: List[dict], token_budget: Optional[int] = None) -> str:
+    """Compact transcript for the RLM context (newest turns that fit the budget)."""
+    budget = token_budget if token_budget is not None else RLM_HISTORY_TOKEN_BUDGET
+    kept, _, _ = compact_history(messages, token_budget=budget)
+    return "\n".join(
+        f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['content']}" for m in kept
+    )
+
+
+# ============================================
+# Rolling summary
+# ============================================
+
+def _fingerprint(messages: List[dict]) -> str:
+    digest = hashlib.sha1()
+    for message in messages:
+        digest.update(message.get("role", "").encode("utf-8"))
+        digest.update(_content_text(message).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+async def _summarize(previous: Optional[str], messages: List[dict]) -> str:
+    from anthropic_client import get_anthropic_client
+
+    transcript = format_history_for_rlm(messages, token_budget=SUMMARY_INPUT_TOKENS)
+    prompt = (
+        "Summarize this earlier part of a chat so the assistant can continue it. Keep names, "
+        "dates, decisions, open questions and anything the user asked to remember. Plain prose, "
+        "under 200 words.\n\n"
+    )
+    if previous:
+        prompt += f"Summary of the conversation before this part:\n{previous}\n\n"
+    prompt += f"Conversation:\n{transcript}"
+
+    response = await get_anthropic_client().messages.create(
+        model=HISTORY_SUMMARY_MODEL,
+        max_tokens=SUMMARY_MAX_TOKENS,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    return "".join(block.text for block in response.content if hasattr(block, "text")).strip()
+
+
+async def _refresh_summary(key: Tuple[str, str], dropped: List[dict]) -> None:
+    try:
+        cached = _summaries.get(key)
+        previous = None
+        new_messages = dropped
+        # Extend the previous summary when it covers a prefix of what is dropped now
+        if cached and cached["covered"] <= len(dropped) and cached["fingerprint"] == _fingerprint(dropped[: cached["covered"]]):
+            previous = cached["summary"]
+            new_messages = dropped[cached["covered"]:]
+
+        summary = await _summarize(previous, new_messages)
+        _summaries.set(key, {"covered": len(dropped), "fingerprint": _fingerprint(dropped), "summary": summary})
+        _summary_stats["generated"] += 1
+        print(f"[History] Summarized {len(dropped)} older messages for conversation {key[1]}")
+    except Exception as e:
+        _summary_stats["errors"] += 1
+        print(f"[History] Summary failed for conversation {key[1]}: {e}")
+    finally:
+        _in_flight.pop(key, None)
+
+
+def get_history_summary(user_id: str, conversation_id: Optional[str], dropped: List[dict]) -> Optional[str]:
+    """Cached summary of the dropped turns (None if unavailable); refreshes in the background.
+
+    A summary covering only part of the dropped turns is still returned -- it
+    is extended asynchronously and picked up by a later query.
+    """
+    if not HISTORY_SUMMARY or not conversation_id or not dropped:
+        return None
+
+    key = (user_id, conversation_id)
+    cached = _summaries.get(key)
+    fresh = cached is not None and cached["covered"] == len(dropped)
+
+    if not fresh and key not in _in_flight:
+        dropped_tokens = sum(estimate_tokens(_content_text(m)) for m in dropped)
+        if dropped_tokens >= HISTORY_SUMMARY_MIN_TOKENS:
+            task = asyncio.create_task(_refresh_summary(key, list(dropped)))
+            _in_flight[key] = task
+
+    if cached is None or cached["covered"] > len(dropped):
+        return None
+    if cached["fingerprint"] != _fingerprint(dropped[: cached["covered"]]):
+        return None  # History was edited -- the summary describes other turns
+    _summary_stats["served"] += 1
+    return cached["summary"]
+
+
+def prepare_history(
+    user_id: str,
+    conversation_id: Optional[str],
+    history: Optional[List[dict]],
+) -> Tuple[List[dict], Optional[str]]:
+    """Budget-trim a request's history and attach the rolling summary if any.
+
+    Returns:
+        (messages, summary) -- messages fit HISTORY_TOKEN_BUDGET
+    """
+    kept, dropped, report = compact_history(history)
+    summary = get_history_summary(user_id, conversation_id, dropped)
+
+    HISTORY_TOKENS.inc(report["tokens_kept"], kind="kept")
+    HISTORY_TOKENS.inc(report["tokens_trimmed"], kind="trimmed")
+    HISTORY_TOKENS.inc(report["tokens_dropped"], kind="dropped")
+    if report["tokens_trimmed"] or report["tokens_dropped"]:
+        print(
+            f"[History] Kept {report['messages_kept']}/{report['messages_in']} messages, "
+            f"{report['tokens_kept']} tokens (trimmed {report['tokens_trimmed']}, "
+            f"dropped {report['tokens_dropped']}{', summarized' if summary else ''})"
+        )
+    return kept, summary
+
+
+def get_history_summary_stats() -> Dict[str, Any]:
+    """Rolling summary cache size and generated/served/error counters."""
+    return {
+        "enabled": HISTORY_SUMMARY,
+        "conversations": len(_summaries),
+        "in_flight": len(_in_flight),
+        **_summary_stats,
+    }
@@ -4,23 +4,116 @@ Provides memory-enhanced chat using Recursive Language Models
 """
 import os
 import json
-import httpx
 import asyncio
 import gzip
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Optional, List
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Response
-from fastapi.responses import JSONResponse
+from typing import Optional, List, Dict, Tuple, AsyncIterator
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from prompt_helpers import clean_section, format_section
-from prompt_builder import PromptBuilder
+from prompt_builder import PromptBuilder, get_persona_cache_stats
+from context_packer import pack_context
+from supabase_client import (
+    get_supabase_client,
+    start_supabase_client,
+    close_supabase_client,
+    get_pool_stats,
+)
+from anthropic_client import (
+    get_anthropic_client,
+    close_anthropic_client,
+    build_system_blocks,
+    record_usage,
+    get_prompt_cache_stats,
+)
+from warmup import start_warmup, stop_warmup, is_ready, get_warmup_report
+from history_compactor import prepare_history, format_history_for_rlm, get_history_summary_stats
+from profile_cache import PROFILE_COLUMNS, ProfileUnavailable, resolve_profile, invalidate_profile, get_profile_cache_stats
+from memory_slicer import slice_memory, preload_memory, get_memory_slice_stats
+from alerts import alert_failure, start_alert_dispatcher, stop_alert_dispatcher, get_alert_stats
+from web_search import execute_web_search, close_web_search_client, get_web_search_stats
+from rlm_pool import start_rlm_pool, shutdown_rlm_pool, rlm_completion, get_rlm_pool_stats
+from admission import (
+    AdmissionRejected,
+    Reservation,
+    admit,
+    acquire as admission_acquire,
+    release as admission_release,
+    reserve as admission_reserve,
+    get_admission_stats,
+)
+from vector_index import (
+    VECTOR_INDEX_MODE,
+    note_query,
+    is_loaded as vector_index_loaded,
+    search as local_vector_search,
+    get_vector_index_stats,
+)
+from retrieval_cache import (
+    make_retrieval_key,
+    get_cached_chunks,
+    cache_chunks,
+    invalidate_user,
+    get_retrieval_cache_stats,
+)
+from metrics import (
+    stage,
+    start_timings,
+    counter,
+    histogram,
+    register_stats_collector,
+    render_prometheus,
+)
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="SoulPrint RLM Service")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create long-lived clients on startup, drain them on shutdown."""
+    await start_supabase_client()
+    await start_rlm_pool()
+    start_alert_dispatcher()
+    start_warmup()
+    yield
+    await stop_warmup()
+    await stop_alert_dispatcher()
+    await close_supabase_client()
+    await close_anthropic_client()
+    await close_web_search_client()
+    shutdown_rlm_pool()
+
+    from processors.embedding_generator import shutdown_embed_executor
+    shutdown_embed_executor()
+
+
+app = FastAPI(title="SoulPrint RLM Service", lifespan=lifespan)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    """Saturated lane: fail fast with Retry-After instead of piling on more work."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc), "lane": exc.lane, "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(ProfileUnavailable)
+async def profile_unavailable_handler(request, exc: ProfileUnavailable):
+    """ETag-only query whose profile couldn't be loaded: ask the client to resend it in full."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc), "reason": exc.reason},
+    )
+
 
 # CORS for Next.js
 app.add_middleware(
@@ -35,7 +128,41 @@ app.add_middleware(
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-ALERT_WEBHOOK = os.getenv("ALERT_WEBHOOK")  # Optional: for failure alerts
+
+# Latency-budget mode: if RLM hasn't answered within this many ms, start the
+# direct fallback speculatively and take whichever answers first. 0 = disabled
+# (fallback only starts after RLM fails).
+RLM_HEDGE_DELAY_MS = int(os.getenv("RLM_HEDGE_DELAY_MS", "0"))
+
+# Start fetching the recent-chunks fallback set once semantic search has run
+# for PREFETCH_FALLBACK_DELAY_MS without answering (slow Bedrock or RPC), so a
+# late failure doesn't add a round trip. Searches that finish sooner (the
+# normal case) never issue the fallback GET; a search that fails early
+# fetches it right away.
+PREFETCH_FALLBACK_CHUNKS = os.getenv("PREFETCH_FALLBACK_CHUNKS", "true").lower() not in ("0", "false", "no")
+PREFETCH_FALLBACK_DELAY_MS = int(os.getenv("PREFETCH_FALLBACK_DELAY_MS", "750"))
+
+# "vector" (default): vector match only.
+# "hybrid": vector + full-text match fused server-side by reciprocal rank
+# (match_conversation_chunks_hybrid, supabase/migrations/20260212_hybrid_search.sql).
+# Opt-in until the fused ranking has been checked on real chat messages.
+# Hybrid drops to vector for the life of the process if the RPC isn't deployed.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector").lower()
+HYBRID_CANDIDATE_COUNT = int(os.getenv("HYBRID_CANDIDATE_COUNT", "40"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+_hybrid_rpc_available = True
+
+# Most tool calls (web searches) one model turn may run at once; further
+# tool_use blocks in that turn get a "skipped" tool_result instead of
+# fanning out against the search backend.
+WEB_SEARCH_MAX_CONCURRENCY = int(os.getenv("WEB_SEARCH_MAX_CONCURRENCY", "4"))
+
+# Request-level metrics (stage-level timings go to soulprint_stage_seconds)
+QUERY_REQUESTS = counter("soulprint_query_requests_total", "Query requests by endpoint, answer method and outcome")
+QUERY_SECONDS = histogram("soulprint_query_seconds", "End-to-end query latency by endpoint")
+QUERY_TTFT_SECONDS = histogram("soulprint_query_ttft_seconds", "Time to first streamed token")
+CONTEXT_TOKENS = counter("soulprint_context_tokens_total", "Retrieved-context tokens by outcome (packed, deduped, dropped)")
+PROMPT_TRIMMED_TOKENS = counter("soulprint_prompt_trimmed_tokens_total", "System prompt tokens cut to fit PROMPT_TOKEN_BUDGET by section")
 
 
 class QueryRequest(BaseModel):
@@ -43,8 +170,10 @@ class QueryRequest(BaseModel):
     message: str
     soulprint_text: Optional[str] = None
     history: Optional[List[dict]] = []
+    conversation_id: Optional[str] = None  # Enables the cached rolling history summary
     ai_name: Optional[str] = None
     sections: Optional[dict] = None  # {soul, identity, user, agents, tools, memory}
+    profile_etag: Optional[str] = None  # Send instead of sections/soulprint_text once known (profile_cache)
     web_search_context: Optional[str] = None
     emotional_state: Optional[dict] = None
     relationship_arc: Optional[dict] = None
@@ -55,6 +184,8 @@ class QueryResponse(BaseModel):
     chunks_used: int
     method: str  # "rlm" or "fallback"
     latency_ms: int
+    timings: Optional[Dict[str, int]] = None  # per-stage ms: embed, vector_rpc, prompt_build, rlm, llm, web_search...
+    profile_etag: Optional[str] = None  # ETag of the profile used; send it back instead of the sections
 
 
 class ProcessFullRequest(BaseModel):
@@ -80,110 +211,204 @@ class RetryFullPassRequest(BaseModel):
 
 async def get_conversation_chunks(user_id: str, recent_only: bool = True) -> List[dict]:
     """Fetch conversation chunks from Supabase"""
-    async with httpx.AsyncClient() as client:
-        query = f"{SUPABASE_URL}/rest/v1/conversation_chunks"
-        params = {
-            "user_id": f"eq.{user_id}",
-            "select": "conversation_id,title,content,message_count,created_at",
-            "order": "created_at.desc",
-            "limit": "100",
-        }
-        if recent_only:
-            params["is_recent"] = "eq.true"
+    client = get_supabase_client()
+    query = f"{SUPABASE_URL}/rest/v1/conversation_chunks"
+    params = {
+        "user_id": f"eq.{user_id}",
+        "select": "conversation_id,title,content,message_count,created_at",
+        "order": "created_at.desc",
+        "limit": "100",
+    }
+    if recent_only:
+        params["is_recent"] = "eq.true"
 
-        response = await client.get(
-            query,
-            params=params,
-            headers={
-                "apikey": SUPABASE_SERVICE_KEY,
-                "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+    response = await client.get(query, params=params)
+
+    if response.status_code != 200:
+        raise Exception(f"Supabase error: {response.text}")
+
+    return response.json()
+
+
+async def _match_chunks_vector(user_id: str, query_embedding: List[float], match_count: int, threshold: float):
+    """Call the match_conversation_chunks RPC (vector similarity only)."""
+    client = get_supabase_client()
+    with stage("query", "vector_rpc"):
+        return await client.post(
+            f"{SUPABASE_URL}/rest/v1/rpc/match_conversation_chunks",
+            json={
+                "query_embedding": query_embedding,
+                "match_user_id": user_id,
+                "match_count": match_count,
+                "match_threshold": threshold,
             },
+            headers={"Content-Type": "application/json"},
+            timeout=15.0,
         )
-        
-        if response.status_code != 200:
-            raise Exception(f"Supabase error: {response.text}")
 
-        return response.json()
+
+async def _match_chunks_hybrid(user_id: str, query: str, query_embedding: List[float], match_count: int, threshold: float):
+    """Call the match_conversation_chunks_hybrid RPC (vector + full-text, RRF fused).
+
+    Returns None if the RPC isn't deployed (PostgREST 404); hybrid mode is then
+    switched off for this process so later queries go straight to the vector RPC.
+    """
+    global _hybrid_rpc_available
+    client = get_supabase_client()
+    with stage("query", "hybrid_rpc"):
+        response = await client.post(
+            f"{SUPABASE_URL}/rest/v1/rpc/match_conversation_chunks_hybrid",
+            json={
+                "query_embedding": query_embedding,
+                "query_text": query,
+                "match_user_id": user_id,
+                "match_count": match_count,
+                "match_threshold": threshold,
+                "candidate_count": max(HYBRID_CANDIDATE_COUNT, match_count),
+                "rrf_k": HYBRID_RRF_K,
+            },
+            headers={"Content-Type": "application/json"},
+            timeout=15.0,
+        )
+
+    if response.status_code == 404:
+        _hybrid_rpc_available = False
+        print("[SemanticSearch] Hybrid RPC not deployed -- using vector-only retrieval")
+        return None
+    return response
 
 
 async def search_chunks_semantic(user_id: str, query: str, match_count: int = 8, threshold: float = 0.3) -> List[dict]:
     """Search conversation chunks by semantic similarity using Titan Embed v2 embeddings.
 
-    Uses the embed_text() function from embedding_generator to create a query embedding,
-    then calls the match_conversation_chunks Supabase RPC function for cosine similarity search.
-
-    Falls back to get_conversation_chunks() (timestamp sort) if embedding or RPC fails.
+    Uses embed_query() from embedding_generator to create a query embedding (served from
+    the query embedding cache, or computed on the bounded embedding executor so the event
+    loop never blocks), then calls the match_conversation_chunks Supabase RPC function
+    for cosine similarity search. With RETRIEVAL_MODE=hybrid the same round trip goes to
+    match_conversation_chunks_hybrid instead, which also full-text matches the message
+    (exact names, codenames, dates) and fuses both rankings (rrf_score). RPC results are
+    cached per user (retrieval_cache) until the user's chunks are rewritten.
+
+    With the local vector index (vector_index) in "primary" mode and vector-only
+    retrieval, hot users whose index is loaded are searched in-process instead of via
+    the RPC (hybrid retrieval always uses the RPC). If the RPC fails, the local
+    index is tried (in "fallback" or "primary" mode) so results stay relevance-ranked.
+
+    Falls back to get_conversation_chunks() (timestamp sort) if embedding fails or no
+    semantic search is available. With PREFETCH_FALLBACK_CHUNKS on, that fallback set
+    starts loading once semantic search has taken PREFETCH_FALLBACK_DELAY_MS, and is
+    cancelled if semantic search then succeeds; fast searches never fetch it.
     """
-    try:
-        from processors.embedding_generator import embed_text
-
-        # Generate query embedding (768-dim Titan Embed v2)
-        query_embedding = embed_text(query)
-
-        # Call Supabase RPC for vector similarity search
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{SUPABASE_URL}/rest/v1/rpc/match_conversation_chunks",
-                json={
-                    "query_embedding": query_embedding,
-                    "match_user_id": user_id,
-                    "match_count": match_count,
-                    "match_threshold": threshold,
-                },
-                headers={
-                    "apikey": SUPABASE_SERVICE_KEY,
-                    "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                    "Content-Type": "application/json",
-                },
-                timeout=15.0,
-            )
+    fallback_task: Optional[asyncio.Task] = None
+    fetch_fallback_now = asyncio.Event()
 
-            if response.status_code != 200:
-                print(f"[SemanticSearch] RPC error {response.status_code}: {response.text[:200]}")
-                # Fall back to timestamp sort
-                return await get_conversation_chunks(user_id, recent_only=True)
+    async def _prefetch_fallback() -> List[dict]:
+        try:
+            await asyncio.wait_for(fetch_fallback_now.wait(), timeout=PREFETCH_FALLBACK_DELAY_MS / 1000)
+        except asyncio.TimeoutError:
+            pass
+        return await get_conversation_chunks(user_id, recent_only=True)
 
-            chunks = response.json()
-            print(f"[SemanticSearch] Found {len(chunks)} relevant chunks for user {user_id}")
-            return chunks
+    if PREFETCH_FALLBACK_CHUNKS:
+        fallback_task = asyncio.create_task(_prefetch_fallback())
+        # Failure only matters if we end up needing it -- don't warn about it otherwise
+        fallback_task.add_done_callback(lambda t: t.cancelled() or t.exception())
 
-    except Exception as e:
-        print(f"[SemanticSearch] Failed, falling back to timestamp sort: {e}")
-        return await get_conversation_chunks(user_id, recent_only=True)
+    async def _fallback() -> List[dict]:
+        if fallback_task is None:
+            with stage("query", "fallback_fetch"):
+                return await get_conversation_chunks(user_id, recent_only=True)
+        # Skip whatever is left of the delay -- the fallback is needed now
+        fetch_fallback_now.set()
+        with stage("query", "fallback_wait"):
+            return await fallback_task
+
+    async def _local_search() -> Optional[List[dict]]:
+        if query_embedding is None:
+            return None
+        with stage("query", "local_vector_search"):
+            chunks = await local_vector_search(user_id, query_embedding, match_count, threshold)
+        if chunks is not None:
+            print(f"[SemanticSearch] Local index served {len(chunks)} chunks for user {user_id}")
+        return chunks
+
+    query_embedding: Optional[List[float]] = None
+    try:
+        from processors.embedding_generator import embed_query
 
+        # Generate query embedding (768-dim Titan Embed v2), cached per normalized message
+        with stage("query", "embed"):
+            query_embedding = await embed_query(query)
 
-async def alert_failure(error: str, user_id: str, message: str):
-    """Alert Drew about failures"""
-    if not ALERT_WEBHOOK:
-        print(f"[ALERT] RLM failure for user {user_id}: {error}")
-        return
+        hybrid = RETRIEVAL_MODE == "hybrid" and _hybrid_rpc_available
+        cache_key = make_retrieval_key(
+            query_embedding, match_count, threshold, query_text=query if hybrid else ""
+        )
+        cached = get_cached_chunks(user_id, cache_key)
+        if cached is not None:
+            print(f"[SemanticSearch] Cache hit: {len(cached)} chunks for user {user_id}")
+            return cached
+
+        note_query(user_id)
+        # The local index is vector-only -- with hybrid on it would drop the full-text leg
+        if VECTOR_INDEX_MODE == "primary" and not hybrid and vector_index_loaded(user_id):
+            chunks = await _local_search()
+            if chunks is not None:
+                cache_chunks(user_id, cache_key, chunks)
+                return chunks
+
+        response = None
+        if hybrid:
+            response = await _match_chunks_hybrid(user_id, query, query_embedding, match_count, threshold)
+        if response is None:
+            response = await _match_chunks_vector(user_id, query_embedding, match_count, threshold)
+
+        if response.status_code != 200:
+            print(f"[SemanticSearch] RPC error {response.status_code}: {response.text[:200]}")
+            chunks = await _local_search()
+            if chunks is not None:
+                return chunks
+            # Fall back to timestamp sort
+            return await _fallback()
+
+        chunks = response.json()
+        cache_chunks(user_id, cache_key, chunks)
+        print(f"[SemanticSearch] Found {len(chunks)} relevant chunks for user {user_id}")
+        return chunks
 
-    try:
-        async with httpx.AsyncClient() as client:
-            await client.post(ALERT_WEBHOOK, json={
-                "text": f"🚨 SoulPrint RLM Failure\nUser: {user_id}\nError: {error}\nMessage: {message[:100]}",
-            })
     except Exception as e:
-        print(f"Failed to send alert: {e}")
+        print(f"[SemanticSearch] Failed, falling back: {e}")
+        try:
+            chunks = await _local_search()
+        except Exception as local_error:
+            print(f"[SemanticSearch] Local index failed: {local_error}")
+            chunks = None
+        if chunks is not None:
+            return chunks
+        return await _fallback()
+
+    finally:
+        if fallback_task is not None and not fallback_task.done():
+            fallback_task.cancel()
 
 
 async def update_user_profile(user_id: str, updates: dict):
     """Update user_profiles table via Supabase REST API (best-effort)"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(
-                f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
-                json=updates,
-                headers={
-                    "apikey": SUPABASE_SERVICE_KEY,
-                    "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                    "Content-Type": "application/json",
-                    "Prefer": "return=minimal",
-                },
-            )
+        client = get_supabase_client()
+        response = await client.patch(
+            f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
+            json=updates,
+            headers={
+                "Content-Type": "application/json",
+                "Prefer": "return=minimal",
+            },
+        )
 
-            if response.status_code not in (200, 204):
-                print(f"[WARN] Failed to update user_profile for {user_id}: {response.text}")
+        if response.status_code not in (200, 204):
+            print(f"[WARN] Failed to update user_profile for {user_id}: {response.text}")
+        elif any(column in updates for column in PROFILE_COLUMNS):
+            invalidate_profile(user_id, "profile updated")
     except Exception as e:
         print(f"[ERROR] update_user_profile failed for {user_id}: {e}")
 
@@ -205,15 +430,13 @@ async def download_conversations(storage_path: str, file_type: str = 'json') ->
         os.close(fd)
 
         url = f"{SUPABASE_URL}/storage/v1/object/{storage_path}"
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            async with client.stream("GET", url, headers={
-                "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-            }) as response:
-                if response.status_code != 200:
-                    raise Exception(f"Failed to download from storage: {response.status_code}")
-                with open(temp_path, "wb") as f:
-                    async for chunk in response.aiter_bytes():
-                        f.write(chunk)
+        client = get_supabase_client()
+        async with client.stream("GET", url, timeout=300.0) as response:
+            if response.status_code != 200:
+                raise Exception(f"Failed to download from storage: {response.status_code}")
+            with open(temp_path, "wb") as f:
+                async for chunk in response.aiter_bytes():
+                    f.write(chunk)
 
         print(f"[download_conversations] Downloaded to temp file: {temp_path}")
 
@@ -266,8 +489,17 @@ async def download_conversations(storage_path: str, file_type: str = 'json') ->
                 pass
 
 
-async def run_full_pass(request: ProcessFullRequest):
-    """Background task: run the complete full pass pipeline."""
+async def run_full_pass(request: ProcessFullRequest, reservation: Optional[Reservation] = None):
+    """Background task: run the complete full pass pipeline (in the "full_pass" admission lane).
+
+    reservation is the lane slot or queue position /process-full reserved
+    before answering 202.
+    """
+    async with admit("full_pass", reservation=reservation):
+        await _run_full_pass(request)
+
+
+async def _run_full_pass(request: ProcessFullRequest):
     try:
         await update_user_profile(request.user_id, {
             "full_pass_status": "processing",
@@ -287,6 +519,7 @@ async def run_full_pass(request: ProcessFullRequest):
             "full_pass_status": "complete",
             "full_pass_completed_at": datetime.utcnow().isoformat(),
         })
+        invalidate_user(request.user_id, "full pass complete")
 
         print(f"[FullPass] Complete for user {request.user_id}")
 
@@ -298,7 +531,7 @@ async def run_full_pass(request: ProcessFullRequest):
             "full_pass_status": "failed",
             "full_pass_error": str(e)[:500],
         })
-        await alert_failure(str(e), request.user_id, "Full pass failed")
+        alert_failure(str(e), request.user_id, "Full pass failed")
 
 
 def build_rlm_system_prompt(
@@ -372,6 +605,95 @@ Today is {date_str}, {time_str}."""
     return prompt
 
 
+def build_conversation_context(chunks: List[dict], memory_text: Optional[str] = None) -> str:
+    """Pack semantically-matched chunks into the ## CONTEXT block.
+
+    Chunks are ordered by relevance, de-overlapped within each conversation and
+    fit into CONTEXT_TOKEN_BUDGET alongside the MEMORY section (context_packer).
+    """
+    conversation_context, report = pack_context(chunks, memory_text=memory_text)
+    CONTEXT_TOKENS.inc(report["tokens_packed"], kind="packed")
+    CONTEXT_TOKENS.inc(report["tokens_deduped"], kind="deduped")
+    CONTEXT_TOKENS.inc(report["tokens_dropped"], kind="dropped")
+    print(
+        f"[Context] Packed {report['chunks_packed']}/{report['chunks_in']} chunks, "
+        f"{report['tokens_packed']} tokens (deduped {report['tokens_deduped']}, "
+        f"dropped {report['tokens_dropped']}, budget {report['token_budget']})"
+    )
+    return conversation_context
+
+
+def _record_prompt_budget(report: Optional[dict]) -> None:
+    """Count and log the sections PromptBuilder trimmed to fit PROMPT_TOKEN_BUDGET."""
+    if not report or not report["trimmed"]:
+        return
+    for section, tokens in report["trimmed"].items():
+        PROMPT_TRIMMED_TOKENS.inc(tokens, section=section)
+    cuts = ", ".join(f"{section} -{tokens}" for section, tokens in report["trimmed"].items())
+    print(
+        f"[PromptBudget] Trimmed {report['tokens_in']} -> {report['tokens_out']} tokens "
+        f"(budget {report['token_budget']}): {cuts}"
+    )
+
+
+def _memory_text(sections: Optional[dict], memory_slice: Optional[str] = None) -> Optional[str]:
+    memory = sections.get("memory") if sections else None
+    memory = memory if isinstance(memory, str) else None
+    if memory_slice:
+        return f"{memory}\n\n{memory_slice}" if memory else memory_slice
+    return memory
+
+
+async def _slice_memory(user_id: str, sections: Optional[dict], message: str) -> Tuple[Optional[dict], Optional[str]]:
+    """Swap MEMORY for its core bullets plus the bullets relevant to message (memory_slicer).
+
+    Returns:
+        (sections, memory_slice) -- sections unchanged and memory_slice None
+        when MEMORY is injected whole
+    """
+    memory = _memory_text(sections)
+    if not memory:
+        return sections, None
+    core, relevant = await slice_memory(user_id, memory, message)
+    if relevant is None and core == memory:
+        return sections, None
+    return {**sections, "memory": core}, relevant
+
+
+async def _profile_and_chunks(request: QueryRequest) -> Tuple[tuple, List[dict]]:
+    """Resolve the request's profile and search its chunks concurrently.
+
+    Neither needs the other, so a profile reload (ETag miss) overlaps
+    retrieval instead of adding a round trip before it. If either fails the
+    other is cancelled. A cold MEMORY bullet load (memory_slicer) starts here
+    too, since it only needs user_id; _slice_memory then just scores.
+
+    Returns:
+        (resolve_profile result, chunks)
+    """
+    async def _profile() -> tuple:
+        with stage("query", "profile"):
+            return await resolve_profile(
+                request.user_id, request.sections, request.soulprint_text, request.ai_name, request.profile_etag,
+            )
+
+    async def _retrieval() -> List[dict]:
+        with stage("query", "retrieval"):
+            return await search_chunks_semantic(request.user_id, request.message, match_count=8, threshold=0.3)
+
+    # A request that carries its sections also tells us whether MEMORY is worth slicing
+    memory_md = (request.sections.get("memory") or "") if request.sections is not None else None
+    preload_memory(request.user_id, memory_md)
+    tasks = [asyncio.create_task(_profile()), asyncio.create_task(_retrieval())]
+    try:
+        profile, chunks = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return profile, chunks
+
+
 def _sections_to_profile(
     sections: Optional[dict],
     soulprint_text: Optional[str] = None,
@@ -412,20 +734,16 @@ async def query_with_rlm(
     web_search_context: Optional[str] = None,
     emotional_state: Optional[dict] = None,
     relationship_arc: Optional[dict] = None,
+    history_summary: Optional[str] = None,
+    memory_slice: Optional[str] = None,
 ) -> str:
-    """Query using RLM for recursive memory exploration"""
-    try:
-        from rlm import RLM
-
-        rlm = RLM(
-            backend="anthropic",
-            backend_kwargs={
-                "model_name": "claude-sonnet-4-20250514",
-                "api_key": ANTHROPIC_API_KEY,
-            },
-            verbose=False,
-        )
+    """Query using RLM for recursive memory exploration.
 
+    Runs on the pre-built RLM pool (rlm_pool) so the blocking completion never
+    touches the event loop. Raises RLMUnavailable if rlm is not installed and
+    asyncio.TimeoutError past RLM_TIMEOUT_SECONDS -- both trigger the fallback.
+    """
+    with stage("query", "prompt_build"):
         builder = PromptBuilder()
         profile = _sections_to_profile(sections, soulprint_text)
         system_prompt = builder.build_emotionally_intelligent_prompt(
@@ -435,64 +753,27 @@ async def query_with_rlm(
             web_search_context=web_search_context,
             emotional_state=emotional_state,
             relationship_arc=relationship_arc,
+            memory_slice=memory_slice,
         )
+        _record_prompt_budget(builder.last_budget_report)
 
-        # Build context for RLM with system prompt + conversation
-        context = f"""{system_prompt}
+        # Build context for RLM with system prompt + compact conversation transcript
+        context = f"""{_with_history_summary(system_prompt, history_summary)}
 
 ## Current Conversation
-{json.dumps(history[-5:] if history else [], indent=2)}
+{format_history_for_rlm(history or [])}
 
 User message: {message}"""
 
-        result = rlm.completion(context)
-        return result.response
+    with stage("query", "rlm"):
+        return await rlm_completion(context)
 
-    except ImportError:
-        # RLM not installed, use direct Anthropic
-        raise Exception("RLM library not available")
 
-
-async def execute_web_search(query: str) -> str:
-    """Execute web search using Tavily API"""
-    tavily_key = os.getenv("TAVILY_API_KEY")
-    if not tavily_key:
-        return "[Search unavailable - no API key]"
-    
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.tavily.com/search",
-                json={
-                    "api_key": tavily_key,
-                    "query": query,
-                    "max_results": 5,
-                    "include_answer": True,
-                    "search_depth": "basic",
-                },
-                timeout=10.0,
-            )
-            
-            if response.status_code != 200:
-                return f"[Search error: {response.status_code}]"
-            
-            data = response.json()
-            
-            # Format results
-            lines = []
-            if data.get("answer"):
-                lines.append(f"**Quick Answer:** {data['answer']}\n")
-            
-            for result in data.get("results", [])[:5]:
-                lines.append(f"• **{result.get('title', 'Untitled')}**")
-                lines.append(f"  {result.get('content', '')[:300]}...")
-                lines.append(f"  Source: {result.get('url', '')}\n")
-            
-            return "\n".join(lines) if lines else "[No results found]"
-            
-    except Exception as e:
-        print(f"[WebSearch] Error: {e}")
-        return f"[Search failed: {str(e)[:100]}]"
+def _with_history_summary(prompt: str, history_summary: Optional[str]) -> str:
+    """Append the rolling summary of turns that no longer fit the history budget."""
+    if not history_summary:
+        return prompt
+    return f"{prompt}\n\n## EARLIER IN THIS CONVERSATION\n{history_summary}"
 
 
 # Tool definitions for Claude
@@ -512,7 +793,50 @@ WEB_SEARCH_TOOL = {
 }
 
 
-async def query_fallback(
+async def _run_tool(tool_use_block, message: str) -> str:
+    print(f"[ToolCall] {tool_use_block.name}: {tool_use_block.input}")
+    if tool_use_block.name == "web_search":
+        search_query = tool_use_block.input.get("query", message)
+        return await execute_web_search(search_query)
+    return "[Unknown tool]"
+
+
+async def execute_tool_calls(tool_use_blocks: list, message: str) -> List[dict]:
+    """Run every tool_use block from one model turn concurrently.
+
+    Returns one tool_result block per tool_use block, in the same order, so
+    the model gets all results back in a single round trip. Only the first
+    WEB_SEARCH_MAX_CONCURRENCY blocks run; the rest are answered as skipped.
+    """
+    limit = max(WEB_SEARCH_MAX_CONCURRENCY, 1)
+    run, skipped = tool_use_blocks[:limit], tool_use_blocks[limit:]
+    if skipped:
+        print(f"[ToolCall] Skipping {len(skipped)} of {len(tool_use_blocks)} tool calls (limit {limit} per turn)")
+
+    with stage("query", "web_search"):
+        results = await asyncio.gather(*[_run_tool(block, message) for block in run])
+    results += [
+        f"[Skipped: at most {limit} searches run per turn -- combine or narrow the queries]"
+        for _ in skipped
+    ]
+
+    return [
+        {
+            "type": "tool_result",
+            "tool_use_id": block.id,
+            "content": result,
+        }
+        for block, result in zip(tool_use_blocks, results)
+    ]
+
+
+FALLBACK_MODEL = "claude-sonnet-4-20250514"
+FALLBACK_MAX_TOKENS = 4096
+# All tool calls in a round run concurrently (execute_tool_calls)
+MAX_TOOL_ROUNDS = 3
+
+
+def _build_fallback_request(
     message: str,
     conversation_context: str,
     soulprint_text: str,
@@ -522,96 +846,211 @@ async def query_fallback(
     web_search_context: Optional[str] = None,
     emotional_state: Optional[dict] = None,
     relationship_arc: Optional[dict] = None,
-) -> str:
-    """Query with tool calling - LLM decides when to search"""
-    import anthropic
-
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-
-    builder = PromptBuilder()
-    profile = _sections_to_profile(sections, soulprint_text)
-    system_prompt = builder.build_emotionally_intelligent_prompt(
-        profile=profile,
-        ai_name=ai_name,
-        memory_context=conversation_context,
-        web_search_context=web_search_context,
-        emotional_state=emotional_state,
-        relationship_arc=relationship_arc,
-    )
+    history_summary: Optional[str] = None,
+    memory_slice: Optional[str] = None,
+) -> dict:
+    """Messages API kwargs shared by query_fallback and query_fallback_stream.
 
-    messages = []
-    for h in (history or [])[-10:]:
-        messages.append({"role": h["role"], "content": h["content"]})
+    The returned messages list is extended in place by _run_tool_round.
+    """
+    with stage("query", "prompt_build"):
+        builder = PromptBuilder()
+        profile = _sections_to_profile(sections, soulprint_text)
+        # Stable persona + MEMORY prefix is cached; date, context and tone vary per turn
+        stable_prefix, volatile_suffix = builder.build_cacheable_prompt(
+            profile=profile,
+            ai_name=ai_name,
+            memory_context=conversation_context,
+            web_search_context=web_search_context,
+            emotional_state=emotional_state,
+            relationship_arc=relationship_arc,
+            memory_slice=memory_slice,
+        )
+        _record_prompt_budget(builder.last_budget_report)
+        system_blocks = build_system_blocks(stable_prefix, _with_history_summary(volatile_suffix, history_summary))
+
+    # History arrives budget-trimmed (history_compactor.prepare_history)
+    messages = [{"role": h["role"], "content": h["content"]} for h in (history or [])]
     messages.append({"role": "user", "content": message})
 
-    # First call - let LLM decide if it needs to search
-    response = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=4096,
-        system=system_prompt,
-        messages=messages,
-        tools=[WEB_SEARCH_TOOL],
-    )
+    return {
+        "model": FALLBACK_MODEL,
+        "max_tokens": FALLBACK_MAX_TOKENS,
+        "system": system_blocks,
+        "messages": messages,
+        "tools": [WEB_SEARCH_TOOL],
+    }
 
-    # Handle tool use loop (max 3 searches per query)
-    max_tool_calls = 3
-    tool_calls = 0
-    
-    while response.stop_reason == "tool_use" and tool_calls < max_tool_calls:
-        tool_calls += 1
-        
-        # Find tool use block
-        tool_use_block = None
-        text_blocks = []
-        for block in response.content:
-            if block.type == "tool_use":
-                tool_use_block = block
-            elif block.type == "text":
-                text_blocks.append(block.text)
-        
-        if not tool_use_block:
+
+async def _run_tool_round(response, request: dict, message: str, tool_rounds: int) -> bool:
+    """Run the tool calls a model turn asked for and append them to the conversation.
+
+    Returns:
+        True if the model should be called again with the tool results, False
+        if the turn was final (no tool use, or MAX_TOOL_ROUNDS reached)
+    """
+    if response.stop_reason != "tool_use" or tool_rounds >= MAX_TOOL_ROUNDS:
+        return False
+
+    tool_use_blocks = [block for block in response.content if block.type == "tool_use"]
+    if not tool_use_blocks:
+        return False
+
+    # Add assistant response and every tool result to messages
+    request["messages"].append({"role": "assistant", "content": response.content})
+    request["messages"].append({
+        "role": "user",
+        "content": await execute_tool_calls(tool_use_blocks, message),
+    })
+    return True
+
+
+async def query_fallback(message: str, **prompt_kwargs) -> str:
+    """Query with tool calling - LLM decides when to search
+
+    prompt_kwargs are _build_fallback_request's (context, profile, history, ...).
+    """
+    client = get_anthropic_client()
+    request = _build_fallback_request(message, **prompt_kwargs)
+
+    tool_rounds = 0
+    while True:
+        with stage("query", "llm"):
+            response = await client.messages.create(**request)
+        record_usage(response.usage)
+
+        if not await _run_tool_round(response, request, message, tool_rounds):
             break
-            
-        print(f"[ToolCall] {tool_use_block.name}: {tool_use_block.input}")
-        
-        # Execute the search
-        if tool_use_block.name == "web_search":
-            search_query = tool_use_block.input.get("query", message)
-            search_results = await execute_web_search(search_query)
-        else:
-            search_results = "[Unknown tool]"
-        
-        # Add assistant response and tool result to messages
-        messages.append({"role": "assistant", "content": response.content})
-        messages.append({
-            "role": "user",
-            "content": [{
-                "type": "tool_result",
-                "tool_use_id": tool_use_block.id,
-                "content": search_results,
-            }]
-        })
-        
-        # Continue conversation with search results
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4096,
-            system=system_prompt,
-            messages=messages,
-            tools=[WEB_SEARCH_TOOL],
-        )
-    
+        tool_rounds += 1
+
     # Extract final text response
     final_text = ""
     for block in response.content:
         if hasattr(block, "text"):
             final_text += block.text
-    
+
     return final_text
 
 
+async def query_fallback_stream(message: str, **prompt_kwargs) -> AsyncIterator[str]:
+    """Streaming variant of query_fallback - yields text deltas as they arrive.
+
+    Same prompt and tool loop as query_fallback, but each model turn uses the
+    Anthropic streaming API so the first tokens reach the client immediately.
+    """
+    client = get_anthropic_client()
+    request = _build_fallback_request(message, **prompt_kwargs)
+
+    tool_rounds = 0
+    while True:
+        async with client.messages.stream(**request) as stream:
+            async for text in stream.text_stream:
+                yield text
+            response = await stream.get_final_message()
+        record_usage(response.usage)
+
+        if not await _run_tool_round(response, request, message, tool_rounds):
+            return
+        tool_rounds += 1
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one server-sent event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+_hedge_stats = {
+    "queries": 0,
+    "hedged": 0,
+    "wins_rlm": 0,
+    "wins_fallback": 0,
+    "rlm_failures": 0,
+}
+
+
+def get_hedge_stats() -> dict:
+    """Hedge rate and per-method win rates for /query."""
+    queries = _hedge_stats["queries"]
+    hedged = _hedge_stats["hedged"]
+    return {
+        **_hedge_stats,
+        "hedge_delay_ms": RLM_HEDGE_DELAY_MS,
+        "hedge_rate": round(hedged / queries, 4) if queries else 0.0,
+        "rlm_win_rate": round(_hedge_stats["wins_rlm"] / queries, 4) if queries else 0.0,
+        "fallback_win_rate": round(_hedge_stats["wins_fallback"] / queries, 4) if queries else 0.0,
+    }
+
+
+async def answer_query(user_id: str, message: str, **query_kwargs) -> tuple:
+    """Answer via RLM with the direct fallback, optionally hedged.
+
+    Without hedging (RLM_HEDGE_DELAY_MS=0) the fallback only runs after RLM
+    fails. With hedging, the fallback starts speculatively once RLM has been
+    running for RLM_HEDGE_DELAY_MS; the first successful answer wins and the
+    other task is cancelled.
+
+    Returns:
+        (response_text, method) where method is "rlm" or "fallback"
+    """
+    _hedge_stats["queries"] += 1
+
+    async def _fallback() -> str:
+        return await query_fallback(message=message, **query_kwargs)
+
+    rlm_task = asyncio.create_task(query_with_rlm(message=message, **query_kwargs))
+    hedge_delay = RLM_HEDGE_DELAY_MS / 1000 if RLM_HEDGE_DELAY_MS > 0 else None
+    tasks = {rlm_task}
+
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+
+        if rlm_task in done:
+            try:
+                response = rlm_task.result()
+                _hedge_stats["wins_rlm"] += 1
+                return response, "rlm"
+            except Exception as rlm_error:
+                # Log and alert on RLM failure, then fall back to direct API
+                _hedge_stats["rlm_failures"] += 1
+                print(f"[RLM] Falling back due to: {rlm_error}")
+                alert_failure(str(rlm_error), user_id, message)
+                response = await _fallback()
+                _hedge_stats["wins_fallback"] += 1
+                return response, "fallback"
+
+        # RLM is slow -- hedge with the direct path and race them
+        _hedge_stats["hedged"] += 1
+        print(f"[Hedge] RLM exceeded {RLM_HEDGE_DELAY_MS}ms for user {user_id}, starting fallback")
+        fallback_task = asyncio.create_task(_fallback())
+        tasks.add(fallback_task)
+
+        pending = set(tasks)
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    method = "rlm" if task is rlm_task else "fallback"
+                    _hedge_stats[f"wins_{method}"] += 1
+                    return task.result(), method
+
+                last_error = error
+                if task is rlm_task:
+                    _hedge_stats["rlm_failures"] += 1
+                    print(f"[Hedge] RLM failed while hedged: {error}")
+                    alert_failure(str(error), user_id, message)
+
+        raise last_error
+    finally:
+        # Cancel the loser (or both, if the request itself was cancelled)
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
 @app.post("/process-full")
-async def process_full(request: ProcessFullRequest, background_tasks: BackgroundTasks, response: Response):
+async def process_full(request: ProcessFullRequest, response: Response):
     """
     DEPRECATED: Use /process-full-v2 instead.
 
@@ -626,8 +1065,12 @@ async def process_full(request: ProcessFullRequest, background_tasks: Background
     # Log deprecation usage
     print(f"[DEPRECATED] /process-full called by user {request.user_id}")
 
-    # Dispatch background task
-    background_tasks.add_task(run_full_pass, request)
+    # Reserve the lane slot now so an accepted job can't be rejected once it starts
+    reservation = admission_reserve("full_pass")
+
+    # Dispatch background task (a task rather than BackgroundTasks, which is
+    # skipped if sending the response fails -- that would leak the reservation)
+    asyncio.create_task(run_full_pass(request, reservation))
 
     return {
         "status": "accepted",
@@ -648,11 +1091,15 @@ async def import_full(request: ImportFullRequest):
     """
     from processors.streaming_import import process_import_streaming
 
+    # Reserve the lane slot now so an accepted job can't be rejected once it starts
+    reservation = admission_reserve("import")
+
     # Fire-and-forget long-running job
     asyncio.create_task(process_import_streaming(
         user_id=request.user_id,
         storage_path=request.storage_path,
         file_type=request.file_type,
+        reservation=reservation,
     ))
 
     print(f"[import-full] Accepted import job for user {request.user_id}: {request.storage_path}")
@@ -672,19 +1119,24 @@ async def retry_full_pass(request: RetryFullPassRequest):
     Returns 202 Accepted immediately -- processing happens in background."""
     from processors.streaming_import import trigger_full_pass
 
-    # Reset status
-    await update_user_profile(request.user_id, {
-        "full_pass_status": "processing",
-        "full_pass_error": None,
-    })
+    # Reserve the lane slot before writing "processing" -- a rejected retry leaves the status alone
+    reservation = admission_reserve("full_pass")
 
-    # Fire-and-forget
-    asyncio.create_task(trigger_full_pass(
-        user_id=request.user_id,
-        storage_path=request.storage_path,
-        conversation_count=0,  # Unknown on retry, full_pass will re-download and count
-        file_type=request.file_type,
-    ))
+    try:
+        # Reset status
+        await update_user_profile(request.user_id, {
+            "full_pass_status": "processing",
+            "full_pass_error": None,
+        })
+    finally:
+        # Fire-and-forget (always started, so the reservation is always consumed)
+        asyncio.create_task(trigger_full_pass(
+            user_id=request.user_id,
+            storage_path=request.storage_path,
+            conversation_count=0,  # Unknown on retry, full_pass will re-download and count
+            file_type=request.file_type,
+            reservation=reservation,
+        ))
 
     print(f"[retry-full-pass] Accepted retry for user {request.user_id}")
 
@@ -694,83 +1146,250 @@ async def retry_full_pass(request: RetryFullPassRequest):
     )
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness check: 503 until startup warm-up (warmup.py) has finished."""
+    report = get_warmup_report()
+    if not is_ready():
+        return JSONResponse(status_code=503, content={"status": "warming", "warmup": report})
+    return {"status": "ready", "warmup": report}
+
+
 @app.get("/health")
 async def health():
-    """Health check endpoint"""
-    return {"status": "ok", "service": "soulprint-rlm"}
+    """Health check endpoint (liveness -- see /ready for readiness)"""
+    from processors.embedding_generator import (
+        get_embed_executor_stats,
+        get_query_embedding_cache_stats,
+    )
+
+    return {
+        "status": "ok",
+        "service": "soulprint-rlm",
+        "supabase_pool": get_pool_stats(),
+        "embedding_executor": get_embed_executor_stats(),
+        "query_embedding_cache": get_query_embedding_cache_stats(),
+        "retrieval_cache": get_retrieval_cache_stats(),
+        "rlm_pool": get_rlm_pool_stats(),
+        "hedging": get_hedge_stats(),
+        "web_search": get_web_search_stats(),
+        "prompt_cache": get_prompt_cache_stats(),
+        "persona_cache": get_persona_cache_stats(),
+        "profile_cache": get_profile_cache_stats(),
+        "memory_slice": get_memory_slice_stats(),
+        "alerts": get_alert_stats(),
+        "vector_index": get_vector_index_stats(),
+        "retrieval_mode": RETRIEVAL_MODE if _hybrid_rpc_available else "vector",
+        "admission": get_admission_stats(),
+        "warmup": get_warmup_report(),
+        "history_summary": get_history_summary_stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (stage histograms, request counters, pool/cache gauges)"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def _embedding_executor_stats() -> dict:
+    from processors.embedding_generator import get_embed_executor_stats
+    return get_embed_executor_stats()
+
+
+def _query_embedding_cache_stats() -> dict:
+    from processors.embedding_generator import get_query_embedding_cache_stats
+    return get_query_embedding_cache_stats()
+
+
+register_stats_collector("supabase_pool", get_pool_stats)
+register_stats_collector("embedding_executor", _embedding_executor_stats)
+register_stats_collector("query_embedding_cache", _query_embedding_cache_stats)
+register_stats_collector("retrieval_cache", get_retrieval_cache_stats)
+register_stats_collector("rlm_pool", get_rlm_pool_stats)
+register_stats_collector("hedging", get_hedge_stats)
+register_stats_collector("web_search", get_web_search_stats)
+register_stats_collector("prompt_cache", get_prompt_cache_stats)
+register_stats_collector("persona_cache", get_persona_cache_stats)
+register_stats_collector("profile_cache", get_profile_cache_stats)
+register_stats_collector("memory_slice", get_memory_slice_stats)
+register_stats_collector("alerts", get_alert_stats)
+register_stats_collector("vector_index", get_vector_index_stats)
+register_stats_collector("admission", get_admission_stats)
+register_stats_collector("warmup", get_warmup_report)
+register_stats_collector("history_summary", get_history_summary_stats)
 
 
 @app.post("/query", response_model=QueryResponse)
 async def query(request: QueryRequest):
-    """Main query endpoint - uses RLM with fallback"""
-    import time
+    """Main query endpoint - uses RLM with fallback.
+
+    Runs in the "interactive" admission lane: when saturated, responds 503
+    (or 429 for a user over their in-flight limit) with Retry-After.
+    """
+    admitted_at = await admission_acquire("interactive", request.user_id)
     start = time.time()
+    timings = start_timings()
     
     try:
-        # Fetch conversation chunks via semantic search
-        chunks = await search_chunks_semantic(request.user_id, request.message, match_count=8, threshold=0.3)
+        # Profile (from the request, or the server-side copy its ETag names)
+        # and semantic search for conversation chunks, run together
+        (sections, soulprint_text, ai_name, profile_etag), chunks = await _profile_and_chunks(request)
+
+        # Core MEMORY bullets plus the ones relevant to this message (reuses the query embedding)
+        with stage("query", "memory_slice"):
+            sections, memory_slice = await _slice_memory(request.user_id, sections, request.message)
 
         # Build context from semantically-matched chunks
-        conversation_context = ""
-        for chunk in chunks[:10]:  # Top 10 most relevant
-            title = chunk.get('title', 'Untitled')
-            similarity = chunk.get('similarity', 0)
-            content = chunk.get('content', '')[:2000]  # Truncate long chunks
-            conversation_context += f"\n---\n**{title}** (relevance: {similarity:.2f})\n{content}"
+        with stage("query", "context_build"):
+            conversation_context = build_conversation_context(chunks, _memory_text(sections, memory_slice))
 
         # Resolve AI name
-        ai_name = request.ai_name or "SoulPrint"
+        ai_name = ai_name or "SoulPrint"
 
         # Log memory availability for debugging
-        has_memory_md = bool(request.sections and request.sections.get("memory"))
+        has_memory_md = bool(sections and sections.get("memory"))
         print(f"[Query] user={request.user_id}, has_memory_md={has_memory_md}, chunks={len(chunks)}")
 
-        # Try RLM first
-        try:
-            response = await query_with_rlm(
-                message=request.message,
-                conversation_context=conversation_context,
-                soulprint_text=request.soulprint_text or "",
-                history=request.history or [],
-                ai_name=ai_name,
-                sections=request.sections,
-                web_search_context=request.web_search_context,
-                emotional_state=request.emotional_state,
-                relationship_arc=request.relationship_arc,
-            )
-            method = "rlm"
-        except Exception as rlm_error:
-            # Log and alert on RLM failure
-            print(f"[RLM] Falling back due to: {rlm_error}")
-            await alert_failure(str(rlm_error), request.user_id, request.message)
-
-            # Fallback to direct API
-            response = await query_fallback(
-                message=request.message,
-                conversation_context=conversation_context,
-                soulprint_text=request.soulprint_text or "",
-                history=request.history or [],
-                ai_name=ai_name,
-                sections=request.sections,
-                web_search_context=request.web_search_context,
-                emotional_state=request.emotional_state,
-                relationship_arc=request.relationship_arc,
-            )
-            method = "fallback"
-        
+        history, history_summary = prepare_history(request.user_id, request.conversation_id, request.history)
+
+        # Try RLM first, falling back (or hedging) to the direct API
+        response, method = await answer_query(
+            request.user_id,
+            request.message,
+            conversation_context=conversation_context,
+            soulprint_text=soulprint_text or "",
+            history=history,
+            history_summary=history_summary,
+            ai_name=ai_name,
+            sections=sections,
+            web_search_context=request.web_search_context,
+            emotional_state=request.emotional_state,
+            relationship_arc=request.relationship_arc,
+            memory_slice=memory_slice,
+        )
+
         latency_ms = int((time.time() - start) * 1000)
+        QUERY_REQUESTS.inc(endpoint="query", method=method, status="ok")
+        QUERY_SECONDS.observe(latency_ms / 1000, endpoint="query")
         
         return QueryResponse(
             response=response,
             chunks_used=len(chunks),
             method=method,
             latency_ms=latency_ms,
+            timings=timings,
+            profile_etag=profile_etag,
         )
-        
+
+    except ProfileUnavailable:
+        QUERY_REQUESTS.inc(endpoint="query", method="none", status="resend_profile")
+        raise
+
     except Exception as e:
-        await alert_failure(str(e), request.user_id, request.message)
+        QUERY_REQUESTS.inc(endpoint="query", method="none", status="error")
+        alert_failure(str(e), request.user_id, request.message)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    finally:
+        admission_release("interactive", request.user_id, admitted_at)
+
+
+@app.post("/query/stream")
+async def query_stream(request: QueryRequest):
+    """Streaming query endpoint - server-sent events.
+
+    Emits `token` events ({"text": ...}) as the model generates, then one
+    `done` event with chunks_used, method, latency_ms, ttft_ms
+    (time to first token) and per-stage timings. Errors after streaming starts
+    are reported as an `error` event since the 200 status has already been sent.
+
+    Holds an "interactive" admission slot (see /query) until the stream ends.
+    """
+    admitted_at = await admission_acquire("interactive", request.user_id)
+    released = False
+
+    def release_slot():
+        nonlocal released
+        if not released:
+            released = True
+            admission_release("interactive", request.user_id, admitted_at)
+
+    start = time.time()
+    timings = start_timings()
+
+    try:
+        (sections, soulprint_text, ai_name, profile_etag), chunks = await _profile_and_chunks(request)
+        with stage("query", "memory_slice"):
+            sections, memory_slice = await _slice_memory(request.user_id, sections, request.message)
+        with stage("query", "context_build"):
+            conversation_context = build_conversation_context(chunks, _memory_text(sections, memory_slice))
+        ai_name = ai_name or "SoulPrint"
+        history, history_summary = prepare_history(request.user_id, request.conversation_id, request.history)
+    except BaseException as e:
+        # Nothing owns the slot until the StreamingResponse exists
+        release_slot()
+        if not isinstance(e, Exception):
+            raise
+        if isinstance(e, ProfileUnavailable):
+            QUERY_REQUESTS.inc(endpoint="query_stream", method="stream", status="resend_profile")
+            raise
+        QUERY_REQUESTS.inc(endpoint="query_stream", method="stream", status="error")
+        alert_failure(str(e), request.user_id, request.message)
         raise HTTPException(status_code=500, detail=str(e))
 
+    print(f"[QueryStream] user={request.user_id}, chunks={len(chunks)}")
+
+    async def event_stream():
+        ttft_ms = None
+        try:
+            async for text in query_fallback_stream(
+                message=request.message,
+                conversation_context=conversation_context,
+                soulprint_text=soulprint_text or "",
+                history=history,
+                history_summary=history_summary,
+                ai_name=ai_name,
+                sections=sections,
+                web_search_context=request.web_search_context,
+                emotional_state=request.emotional_state,
+                relationship_arc=request.relationship_arc,
+                memory_slice=memory_slice,
+            ):
+                if ttft_ms is None:
+                    ttft_ms = int((time.time() - start) * 1000)
+                    QUERY_TTFT_SECONDS.observe(ttft_ms / 1000, endpoint="query_stream")
+                yield _sse("token", {"text": text})
+
+            latency_ms = int((time.time() - start) * 1000)
+            QUERY_REQUESTS.inc(endpoint="query_stream", method="stream", status="ok")
+            QUERY_SECONDS.observe(latency_ms / 1000, endpoint="query_stream")
+            yield _sse("done", {
+                "chunks_used": len(chunks),
+                "method": "stream",
+                "latency_ms": latency_ms,
+                "ttft_ms": ttft_ms,
+                "timings": timings,
+                "profile_etag": profile_etag,
+            })
+        except Exception as e:
+            QUERY_REQUESTS.inc(endpoint="query_stream", method="stream", status="error")
+            print(f"[QueryStream] Failed for user {request.user_id}: {e}")
+            alert_failure(str(e), request.user_id, request.message)
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            release_slot()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+        background=BackgroundTask(release_slot),
+    )
+
 
 if __name__ == "__main__":
     import uvicorn
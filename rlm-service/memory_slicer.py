@@ -0,0 +1,401 @@
+"""
+MEMORY Slicer
+
+Injects the MEMORY bullets relevant to the current message instead of the
+whole memory_md section on every turn, so prompt size (and time to first
+token) stays flat as MEMORY grows.
+
+- Full pass (index_memory): memory_md is split into bullets under their
+  "## " headings, each bullet is embedded with Titan v2 and stored in
+  memory_bullets with the hash of the memory_md it came from and the number
+  of bullets written for it; a partially written set (a later batch failed)
+  is treated as unindexed
+- Per turn (slice_memory): the user's bullets are loaded once (cached,
+  single-flight; preload_memory starts the load alongside retrieval) and scored against the query embedding retrieval already
+  computed (served from the embed_query cache), then split into:
+  - core: the first MEMORY_CORE_BULLETS bullets under MEMORY_CORE_SECTIONS,
+    identical every turn, so they replace memory_md in the cached prompt
+    prefix without breaking prompt caching
+  - relevant: the MEMORY_SLICE_TOP_K best-matching other bullets, rendered
+    as ## RELEVANT MEMORY in the per-turn part of the prompt
+- Small MEMORY sections (under MEMORY_SLICE_MIN_TOKENS), users without
+  bullets, or bullets built from a different memory_md (hash mismatch, e.g.
+  the migration isn't applied or indexing failed) get the whole section as
+  before
+
+Embeddings are parsed once per load, off the event loop, into a NumPy matrix
+so a turn's scoring is a single matrix-vector product. Without numpy the
+bullets are scored in pure Python, in a worker thread once there are
+MEMORY_SLICE_THREAD_MIN or more of them (1000 bullets x 768 dims is ~45 ms).
+
+Config (env):
+- MEMORY_SLICE                  ("true"/"false", default true)
+- MEMORY_SLICE_TOP_K            (relevant bullets per turn, default 12)
+- MEMORY_SLICE_MIN_TOKENS       (inject whole MEMORY below this, default 800)
+- MEMORY_CORE_SECTIONS          (comma-separated headings, default "Preferences")
+- MEMORY_CORE_BULLETS           (default 8)
+- MEMORY_SLICE_CACHE_SIZE       (users, default 500)
+- MEMORY_SLICE_TTL_SECONDS      (default 1800)
+- MEMORY_SLICE_THREAD_MIN       (bullets before pure-Python scoring leaves the loop, default 200)
+"""
+
+import os
+import json
+import asyncio
+import heapq
+import hashlib
+import operator
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+
+from ttl_cache import TTLCache
+from metrics import counter
+from supabase_client import get_supabase_client
+from processors.conversation_chunker import estimate_tokens
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+if TYPE_CHECKING:
+    from processors.cost_tracker import CostTracker
+
+
+MEMORY_SLICE = os.getenv("MEMORY_SLICE", "true").lower() not in ("0", "false", "no")
+MEMORY_SLICE_TOP_K = int(os.getenv("MEMORY_SLICE_TOP_K", "12"))
+MEMORY_SLICE_MIN_TOKENS = int(os.getenv("MEMORY_SLICE_MIN_TOKENS", "800"))
+MEMORY_CORE_SECTIONS = [
+    s.strip().lower() for s in os.getenv("MEMORY_CORE_SECTIONS", "Preferences").split(",") if s.strip()
+]
+MEMORY_CORE_BULLETS = int(os.getenv("MEMORY_CORE_BULLETS", "8"))
+MEMORY_SLICE_CACHE_SIZE = int(os.getenv("MEMORY_SLICE_CACHE_SIZE", "500"))
+MEMORY_SLICE_TTL_SECONDS = float(os.getenv("MEMORY_SLICE_TTL_SECONDS", "1800"))
+MEMORY_SLICE_THREAD_MIN = int(os.getenv("MEMORY_SLICE_THREAD_MIN", "200"))
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+INSERT_BATCH_SIZE = 100
+MAX_BULLETS = 1000
+# Placeholder lines the MEMORY generator emits for empty headings
+SKIP_LINES = {"no data yet."}
+
+MEMORY_TOKENS = counter("soulprint_memory_tokens_total", "MEMORY tokens per turn by outcome (injected, skipped)")
+
+# user_id -> {"hash": str | None, "core": [bullet], "others": [bullet], "matrix": np.ndarray | None}
+# (bullet = {position, section, content, is_core}; others keep "embedding" only without numpy)
+_bullets = TTLCache(max_size=MEMORY_SLICE_CACHE_SIZE, default_ttl=MEMORY_SLICE_TTL_SECONDS)
+_loading: Dict[str, asyncio.Task] = {}
+
+_stats = {
+    "sliced": 0,
+    "whole_small": 0,
+    "whole_unindexed": 0,
+    "errors": 0,
+    "loads": 0,
+    "indexed_users": 0,
+    "invalidations": 0,
+}
+
+
+# ============================================
+# Parsing
+# ============================================
+
+def memory_hash(memory_md: str) -> str:
+    return hashlib.sha1(memory_md.encode("utf-8")).hexdigest()
+
+
+def parse_memory(memory_md: Optional[str]) -> List[Dict[str, Any]]:
+    """Split a MEMORY section into bullets under their "## " headings.
+
+    Indented lines continue the previous bullet; plain paragraph lines count
+    as bullets of their own. Top-level "# " titles and "No data yet."
+    placeholders are skipped.
+    """
+    bullets: List[Dict[str, Any]] = []
+    section = None
+    for raw in (memory_md or "").splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            heading = line.lstrip("#").strip()
+            section = heading if line.startswith("##") else None
+            continue
+        if raw[:1] in (" ", "\t") and bullets and bullets[-1]["section"] == section:
+            bullets[-1]["content"] += "\n" + line
+            continue
+        content = line[2:].strip() if line[:2] in ("- ", "* ") else line
+        if content.lower() in SKIP_LINES:
+            continue
+        bullets.append({"position": len(bullets), "section": section, "content": content})
+
+    core_left = MEMORY_CORE_BULLETS
+    for bullet in bullets:
+        is_core = core_left > 0 and (bullet["section"] or "").lower() in MEMORY_CORE_SECTIONS
+        bullet["is_core"] = is_core
+        core_left -= int(is_core)
+    return bullets
+
+
+def render_bullets(bullets: List[Dict[str, Any]]) -> str:
+    """Render bullets back to MEMORY markdown, grouped under their headings in original order."""
+    lines: List[str] = []
+    current: Any = object()
+    for bullet in sorted(bullets, key=lambda b: b["position"]):
+        if bullet["section"] != current:
+            if lines:
+                lines.append("")
+            if bullet["section"]:
+                lines.append(f"## {bullet['section']}")
+            current = bullet["section"]
+        lines.append(f"- {bullet['content']}")
+    return "\n".join(lines)
+
+
+# ============================================
+# Full pass: embed and store bullets
+# ============================================
+
+async def index_memory(user_id: str, memory_md: str, cost_tracker: Optional['CostTracker'] = None) -> int:
+    """Embed memory_md's bullets and replace the user's memory_bullets rows.
+
+    Raises on failure -- the full pass treats this step as non-fatal (the
+    whole MEMORY section keeps being injected until indexing succeeds).
+
+    Returns:
+        Number of bullets stored
+    """
+    from processors.embedding_generator import embed_text_async
+
+    bullets = parse_memory(memory_md)[:MAX_BULLETS]
+    digest = memory_hash(memory_md)
+    embeddings = await asyncio.gather(*(
+        embed_text_async(f"{b['section']}: {b['content']}" if b["section"] else b["content"], cost_tracker=cost_tracker)
+        for b in bullets
+    ))
+
+    client = get_supabase_client()
+    response = await client.delete(
+        f"{SUPABASE_URL}/rest/v1/memory_bullets?user_id=eq.{user_id}",
+        timeout=30.0,
+    )
+    if response.status_code not in (200, 204):
+        raise RuntimeError(f"Failed to delete memory bullets ({response.status_code}): {response.text[:200]}")
+
+    rows = [
+        {
+            "user_id": user_id,
+            "position": b["position"],
+            "section": b["section"],
+            "content": b["content"],
+            "is_core": b["is_core"],
+            "memory_hash": digest,
+            "bullet_count": len(bullets),
+            "embedding": embedding,
+        }
+        for b, embedding in zip(bullets, embeddings)
+    ]
+    try:
+        for i in range(0, len(rows), INSERT_BATCH_SIZE):
+            response = await client.post(
+                f"{SUPABASE_URL}/rest/v1/memory_bullets",
+                json=rows[i:i + INSERT_BATCH_SIZE],
+                headers={"Content-Type": "application/json", "Prefer": "return=minimal"},
+                timeout=30.0,
+            )
+            if response.status_code not in (200, 201, 204):
+                raise RuntimeError(f"Failed to save memory bullets ({response.status_code}): {response.text[:200]}")
+    finally:
+        # Earlier batches may be stored either way; cached bullets are stale
+        invalidate_memory(user_id, "memory re-indexed")
+    _stats["indexed_users"] += 1
+    return len(rows)
+
+
+# ============================================
+# Per turn: load and slice
+# ============================================
+
+async def _fetch_bullets(user_id: str) -> List[dict]:
+    response = await get_supabase_client().get(
+        f"{SUPABASE_URL}/rest/v1/memory_bullets",
+        params={
+            "user_id": f"eq.{user_id}",
+            "select": "position,section,content,is_core,memory_hash,bullet_count,embedding",
+            "order": "position.asc",
+            "limit": str(MAX_BULLETS),
+        },
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to load memory bullets ({response.status_code}): {response.text[:200]}")
+    return response.json()
+
+
+def _complete_hash(rows: List[dict]) -> Optional[str]:
+    """memory_hash of the stored bullets, or None unless all bullet_count rows of one hash are there."""
+    if not rows:
+        return None
+    digest = rows[0]["memory_hash"]
+    expected = rows[0].get("bullet_count")
+    if len(rows) != expected or any(row["memory_hash"] != digest for row in rows):
+        print(f"[MemorySlice] Incomplete memory bullets ({len(rows)} rows, expected {expected}) -- not slicing")
+        return None
+    return digest
+
+
+def _prepare(rows: List[dict]) -> dict:
+    """Parse embeddings and split core/other bullets (CPU-bound, runs in a worker thread)."""
+    core: List[dict] = []
+    others: List[dict] = []
+    embeddings: List[List[float]] = []
+    for row in rows:
+        embedding = row.pop("embedding", None)
+        # PostgREST returns pgvector columns as "[0.1,0.2,...]" strings
+        if isinstance(embedding, str):
+            embedding = json.loads(embedding)
+        if not embedding:
+            continue
+        if row["is_core"]:
+            core.append(row)
+        else:
+            others.append(row)
+            embeddings.append(embedding)
+
+    matrix = None
+    if np is not None and others:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+    else:
+        for bullet, embedding in zip(others, embeddings):
+            bullet["embedding"] = embedding
+    return {
+        "hash": _complete_hash(rows),
+        "core": core,
+        "others": others,
+        "matrix": matrix,
+    }
+
+
+async def _load(user_id: str) -> dict:
+    try:
+        rows = await _fetch_bullets(user_id)
+        entry = await asyncio.to_thread(_prepare, rows)
+        # Cached even when empty, so unindexed users don't cost a fetch per turn
+        _bullets.set(user_id, entry)
+        _stats["loads"] += 1
+        return entry
+    finally:
+        _loading.pop(user_id, None)
+
+
+def _start_load(user_id: str) -> asyncio.Task:
+    task = _loading.get(user_id)
+    if task is None:
+        task = asyncio.create_task(_load(user_id))
+        _loading[user_id] = task
+        # A failure is counted by the slice_memory that awaits it, if any
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return task
+
+
+async def _get_bullets(user_id: str) -> dict:
+    entry = _bullets.get(user_id)
+    if entry is not None:
+        return entry
+    return await asyncio.shield(_start_load(user_id))
+
+
+def preload_memory(user_id: str, memory_md: Optional[str] = None) -> None:
+    """Start loading the user's bullets without waiting, so the fetch overlaps retrieval.
+
+    memory_md, when the request carried it, skips the load for MEMORY
+    sections too small to be sliced.
+    """
+    if not MEMORY_SLICE or user_id in _bullets:
+        return
+    if memory_md is not None and estimate_tokens(memory_md) < MEMORY_SLICE_MIN_TOKENS:
+        return
+    _start_load(user_id)
+
+
+def _dot(a: List[float], b: List[float]) -> float:
+    # Titan v2 embeddings are normalized, so the dot product is cosine similarity
+    return sum(map(operator.mul, a, b))
+
+
+def _top_bullets(entry: dict, query_embedding: List[float], k: int) -> List[dict]:
+    """The k non-core bullets most similar to the query, best first."""
+    others = entry["others"]
+    if k <= 0 or not others:
+        return []
+    if entry["matrix"] is not None:
+        scores = entry["matrix"] @ np.asarray(query_embedding, dtype=np.float32)
+        if k < len(others):
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+        else:
+            top = np.argsort(-scores, kind="stable")
+        return [others[i] for i in top]
+    return heapq.nlargest(k, others, key=lambda b: _dot(query_embedding, b["embedding"]))
+
+
+async def slice_memory(user_id: str, memory_md: Optional[str], query_text: str) -> Tuple[Optional[str], Optional[str]]:
+    """MEMORY to inject for this turn.
+
+    Returns:
+        (memory, relevant) -- memory replaces memory_md (the whole section, or
+        just the core bullets when sliced); relevant is the per-turn
+        ## RELEVANT MEMORY text, None when not sliced
+    """
+    if not MEMORY_SLICE or not memory_md:
+        return memory_md, None
+
+    total_tokens = estimate_tokens(memory_md)
+    if total_tokens < MEMORY_SLICE_MIN_TOKENS:
+        _stats["whole_small"] += 1
+        MEMORY_TOKENS.inc(total_tokens, kind="injected")
+        return memory_md, None
+
+    try:
+        entry = await _get_bullets(user_id)
+        if not (entry["core"] or entry["others"]) or entry["hash"] != memory_hash(memory_md):
+            _stats["whole_unindexed"] += 1
+            MEMORY_TOKENS.inc(total_tokens, kind="injected")
+            return memory_md, None
+
+        from processors.embedding_generator import embed_query
+        query_embedding = await embed_query(query_text)
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"[MemorySlice] Falling back to whole MEMORY for user {user_id}: {e}")
+        MEMORY_TOKENS.inc(total_tokens, kind="injected")
+        return memory_md, None
+
+    if entry["matrix"] is None and len(entry["others"]) >= MEMORY_SLICE_THREAD_MIN:
+        relevant = await asyncio.to_thread(_top_bullets, entry, query_embedding, MEMORY_SLICE_TOP_K)
+    else:
+        relevant = _top_bullets(entry, query_embedding, MEMORY_SLICE_TOP_K)
+
+    core_md = render_bullets(entry["core"])
+    relevant_md = render_bullets(relevant)
+    injected = estimate_tokens(core_md) + estimate_tokens(relevant_md)
+    MEMORY_TOKENS.inc(injected, kind="injected")
+    MEMORY_TOKENS.inc(max(0, total_tokens - injected), kind="skipped")
+    _stats["sliced"] += 1
+    return core_md, relevant_md or None
+
+
+def invalidate_memory(user_id: str, reason: str = "") -> None:
+    """Drop a user's cached bullets after they were rewritten."""
+    if _bullets.delete(user_id):
+        _stats["invalidations"] += 1
+        print(f"[MemorySlice] Invalidated user {user_id}" + (f" ({reason})" if reason else ""))
+
+
+def get_memory_slice_stats() -> Dict[str, Any]:
+    """Slice outcomes plus bullet cache counters."""
+    return {
+        "enabled": MEMORY_SLICE,
+        "users_cached": len(_bullets),
+        "loading": len(_loading),
+        **_stats,
+    }
@@ -0,0 +1,209 @@
+"""
+Metrics - Stage Timers and Prometheus Exposition
+
+Minimal in-process metrics registry (no prometheus_client dependency):
+- Counter / Histogram with label support, rendered in Prometheus text format
+- stage(): context manager that times one pipeline stage, records it in the
+  soulprint_stage_seconds histogram, and adds it to the current request's
+  timings dict (so /query can return a per-stage breakdown)
+- register_stats_collector(): exposes existing get_*_stats() dicts (pool,
+  caches, executors) as gauges at scrape time
+
+Per-request timings travel in a ContextVar, so tasks spawned while handling
+a request (hedged RLM/fallback, prefetches) record into the same dict.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Any
+
+
+# ============================================
+# Metric Types
+# ============================================
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0,
+)
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: _LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = [
+        f'{k}="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in pairs
+    ]
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[_LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[_LabelKey, Dict[str, Any]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            self._series[key] = series
+
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][i] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_key(labels))
+        return series["count"] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            for bound, bucket_count in zip(self.buckets, series["counts"]):
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {bucket_count}"
+                )
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+# ============================================
+# Registry
+# ============================================
+
+_metrics: List[Any] = []
+_collectors: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+
+
+def counter(name: str, help_text: str) -> Counter:
+    metric = Counter(name, help_text)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    metric = Histogram(name, help_text, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def register_stats_collector(prefix: str, fn: Callable[[], Dict[str, Any]]) -> None:
+    """Expose a get_*_stats() dict as gauges named soulprint_<prefix>_<key>.
+
+    Only numeric and boolean values are exported; everything else is skipped.
+    """
+    _collectors.append((prefix, fn))
+
+
+def _render_collectors() -> List[str]:
+    lines = []
+    for prefix, fn in _collectors:
+        try:
+            stats = fn()
+        except Exception as e:
+            print(f"[Metrics] Collector {prefix} failed: {e}")
+            continue
+
+        for key, value in stats.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if not isinstance(value, (int, float)):
+                continue
+            name = f"soulprint_{prefix}_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+    return lines
+
+
+def render_prometheus() -> str:
+    """Render all metrics in Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    lines.extend(_render_collectors())
+    return "\n".join(lines) + "\n"
+
+
+# ============================================
+# Stage Timers
+# ============================================
+
+STAGE_SECONDS = histogram(
+    "soulprint_stage_seconds",
+    "Duration of individual pipeline stages",
+)
+
+_current_timings: ContextVar[Optional[Dict[str, int]]] = ContextVar("current_timings", default=None)
+
+
+def start_timings() -> Dict[str, int]:
+    """Begin collecting per-stage timings (ms) for the current request."""
+    timings: Dict[str, int] = {}
+    _current_timings.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(pipeline: str, name: str) -> Iterator[None]:
+    """Time one stage of a pipeline ("query", "import", "full_pass").
+
+    Records into soulprint_stage_seconds and, if a request is collecting
+    timings, adds the elapsed milliseconds under `name` (summed if the stage
+    runs more than once, e.g. multiple LLM calls in the tool loop).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, pipeline=pipeline, stage=name)
+
+        timings = _current_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0) + int(elapsed * 1000)
@@ -3,17 +3,48 @@ Embedding Generator
 Generates Titan Embed v2 embeddings (768 dims) for conversation chunks via AWS Bedrock.
 """
 import os
+import re
 import json
+import time
+import hashlib
+import asyncio
 import boto3
-import httpx
-from typing import List, Dict, Optional
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Any
+
+from supabase_client import get_supabase_client
+from ttl_cache import TTLCache
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+
+# Bounded thread pool for off-loop embedding calls (boto3 is synchronous)
+EMBED_EXECUTOR_WORKERS = int(os.getenv("EMBED_EXECUTOR_WORKERS", "8"))
+
+# Query embedding cache: repeated/retried chat messages skip the Bedrock round trip
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "2048"))
+QUERY_EMBED_CACHE_TTL_SECONDS = float(os.getenv("QUERY_EMBED_CACHE_TTL_SECONDS", "3600"))
 
 # Lazy-init Bedrock client
 _bedrock_client = None
 
+_query_embedding_cache = TTLCache(
+    max_size=QUERY_EMBED_CACHE_SIZE,
+    default_ttl=QUERY_EMBED_CACHE_TTL_SECONDS,
+)
+
+# Lazy-init embedding executor
+_embed_executor: Optional[ThreadPoolExecutor] = None
+_embed_stats = {
+    "calls": 0,
+    "errors": 0,
+    "pending": 0,
+    "peak_pending": 0,
+    "queue_wait_total_ms": 0.0,
+    "queue_wait_max_ms": 0.0,
+    "run_total_ms": 0.0,
+}
+
 
 def get_bedrock_client():
     global _bedrock_client
@@ -23,10 +54,32 @@ def get_bedrock_client():
             region_name=os.environ.get('AWS_REGION', 'us-east-1'),
             aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
             aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
+            # Local stand-in for Bedrock (benchmarks/fake_services.py); unset in production
+            endpoint_url=os.environ.get('BEDROCK_ENDPOINT_URL') or None,
+            # One pooled connection per executor thread so workers never queue on urllib3
+            config=Config(max_pool_connections=max(10, EMBED_EXECUTOR_WORKERS)),
         )
     return _bedrock_client
 
 
+def get_embed_executor() -> ThreadPoolExecutor:
+    global _embed_executor
+    if _embed_executor is None:
+        _embed_executor = ThreadPoolExecutor(
+            max_workers=EMBED_EXECUTOR_WORKERS,
+            thread_name_prefix="titan-embed",
+        )
+    return _embed_executor
+
+
+def shutdown_embed_executor():
+    """Stop the embedding executor (called on app shutdown)."""
+    global _embed_executor
+    if _embed_executor is not None:
+        _embed_executor.shutdown(wait=False, cancel_futures=True)
+        _embed_executor = None
+
+
 def embed_text(text: str, dimensions: int = 768, cost_tracker: Optional['CostTracker'] = None) -> List[float]:
     """Generate a single embedding using Titan Embed v2.
 
@@ -61,6 +114,84 @@ def embed_text(text: str, dimensions: int = 768, cost_tracker: Optional['CostTra
     return result['embedding']
 
 
+async def embed_text_async(text: str, dimensions: int = 768, cost_tracker: Optional['CostTracker'] = None) -> List[float]:
+    """Generate a single embedding without blocking the event loop.
+
+    Runs embed_text() on the bounded embedding executor so a slow Bedrock
+    round trip only occupies a worker thread, not the whole event loop.
+    Records queue wait (time spent waiting for a free worker) and run time.
+    """
+    loop = asyncio.get_running_loop()
+    submitted = time.perf_counter()
+
+    def _run():
+        started = time.perf_counter()
+        embedding = embed_text(text, dimensions, cost_tracker)
+        return embedding, started
+
+    _embed_stats["calls"] += 1
+    _embed_stats["pending"] += 1
+    _embed_stats["peak_pending"] = max(_embed_stats["peak_pending"], _embed_stats["pending"])
+    try:
+        embedding, started = await loop.run_in_executor(get_embed_executor(), _run)
+    except Exception:
+        _embed_stats["errors"] += 1
+        raise
+    finally:
+        _embed_stats["pending"] -= 1
+
+    finished = time.perf_counter()
+    queue_wait_ms = (started - submitted) * 1000
+    _embed_stats["queue_wait_total_ms"] += queue_wait_ms
+    _embed_stats["queue_wait_max_ms"] = max(_embed_stats["queue_wait_max_ms"], queue_wait_ms)
+    _embed_stats["run_total_ms"] += (finished - started) * 1000
+
+    return embedding
+
+
+def normalize_query_text(text: str) -> str:
+    """Normalize a chat message for cache keying: trim, collapse whitespace, lowercase."""
+    return re.sub(r"\s+", " ", text[:8000]).strip().lower()
+
+
+async def embed_query(text: str, dimensions: int = 768) -> List[float]:
+    """Embed a chat query, served from the TTL/LRU cache when possible.
+
+    Keyed by normalized message text plus dimensions, so client retries and
+    whitespace/case variants of the same message reuse one embedding.
+    """
+    digest = hashlib.sha1(normalize_query_text(text).encode("utf-8")).hexdigest()
+    key = (dimensions, digest)
+
+    cached = _query_embedding_cache.get(key)
+    if cached is not None:
+        return cached
+
+    embedding = await embed_text_async(text, dimensions)
+    _query_embedding_cache.set(key, embedding)
+    return embedding
+
+
+def get_query_embedding_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for the query embedding cache."""
+    return _query_embedding_cache.stats()
+
+
+def get_embed_executor_stats() -> Dict[str, Any]:
+    """Snapshot of embedding executor load and queue-wait timings."""
+    calls = _embed_stats["calls"]
+    return {
+        "workers": EMBED_EXECUTOR_WORKERS,
+        "calls": calls,
+        "errors": _embed_stats["errors"],
+        "pending": _embed_stats["pending"],
+        "peak_pending": _embed_stats["peak_pending"],
+        "queue_wait_avg_ms": round(_embed_stats["queue_wait_total_ms"] / calls, 2) if calls else 0.0,
+        "queue_wait_max_ms": round(_embed_stats["queue_wait_max_ms"], 2),
+        "run_avg_ms": round(_embed_stats["run_total_ms"] / calls, 2) if calls else 0.0,
+    }
+
+
 def embed_batch(texts: List[str], dimensions: int = 768, cost_tracker: Optional['CostTracker'] = None) -> List[List[float]]:
     """Generate embeddings for a batch of texts.
 
@@ -89,20 +220,18 @@ async def update_chunk_embedding(chunk_id: str, embedding: List[float]):
     Uses Supabase REST API PATCH to set the embedding column.
     The embedding is sent as a JSON array which PostgREST converts to vector.
     """
-    async with httpx.AsyncClient() as client:
-        response = await client.patch(
-            f"{SUPABASE_URL}/rest/v1/conversation_chunks?id=eq.{chunk_id}",
-            json={"embedding": embedding},
-            headers={
-                "apikey": SUPABASE_SERVICE_KEY,
-                "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                "Content-Type": "application/json",
-                "Prefer": "return=minimal",
-            },
-            timeout=30.0,
-        )
-        if response.status_code not in (200, 204):
-            raise RuntimeError(f"Failed to update embedding for chunk {chunk_id}: {response.status_code}")
+    client = get_supabase_client()
+    response = await client.patch(
+        f"{SUPABASE_URL}/rest/v1/conversation_chunks?id=eq.{chunk_id}",
+        json={"embedding": embedding},
+        headers={
+            "Content-Type": "application/json",
+            "Prefer": "return=minimal",
+        },
+        timeout=30.0,
+    )
+    if response.status_code not in (200, 204):
+        raise RuntimeError(f"Failed to update embedding for chunk {chunk_id}: {response.status_code}")
 
 
 async def generate_embeddings_for_chunks(user_id: str, batch_size: int = 50, cost_tracker: Optional['CostTracker'] = None):
@@ -124,27 +253,23 @@ async def generate_embeddings_for_chunks(user_id: str, batch_size: int = 50, cos
 
     while True:
         # Fetch chunks without embeddings
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{SUPABASE_URL}/rest/v1/conversation_chunks",
-                params={
-                    "user_id": f"eq.{user_id}",
-                    "embedding": "is.null",
-                    "select": "id,content",
-                    "limit": str(batch_size),
-                    "offset": str(offset),
-                },
-                headers={
-                    "apikey": SUPABASE_SERVICE_KEY,
-                    "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                },
-                timeout=30.0,
-            )
-            if response.status_code != 200:
-                print(f"[Embeddings] Failed to fetch chunks: {response.status_code}")
-                break
-
-            chunks = response.json()
+        client = get_supabase_client()
+        response = await client.get(
+            f"{SUPABASE_URL}/rest/v1/conversation_chunks",
+            params={
+                "user_id": f"eq.{user_id}",
+                "embedding": "is.null",
+                "select": "id,content",
+                "limit": str(batch_size),
+                "offset": str(offset),
+            },
+            timeout=30.0,
+        )
+        if response.status_code != 200:
+            print(f"[Embeddings] Failed to fetch chunks: {response.status_code}")
+            break
+
+        chunks = response.json()
 
         if not chunks:
             break  # No more chunks to process
@@ -4,15 +4,17 @@ Downloads conversations, chunks them, extracts facts, generates MEMORY section
 """
 import os
 import json
-import httpx
 import anthropic
 from datetime import datetime, timedelta
 from typing import List, Dict
 
+from supabase_client import get_supabase_client
+from retrieval_cache import invalidate_user
+from metrics import stage, start_timings
+
 
 # Supabase config from environment
 SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
 
 async def delete_user_chunks(user_id: str):
@@ -25,20 +27,19 @@ async def delete_user_chunks(user_id: str):
     Raises:
         RuntimeError: If delete fails (errors propagate to caller)
     """
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(
-            f"{SUPABASE_URL}/rest/v1/conversation_chunks?user_id=eq.{user_id}",
-            headers={
-                "apikey": SUPABASE_SERVICE_KEY,
-                "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-            },
-            timeout=30.0,
-        )
+    client = get_supabase_client()
+    response = await client.delete(
+        f"{SUPABASE_URL}/rest/v1/conversation_chunks?user_id=eq.{user_id}",
+        timeout=30.0,
+    )
 
-        if response.status_code not in (200, 204):
-            raise RuntimeError(f"Failed to delete existing chunks ({response.status_code}): {response.text[:200]}")
+    if response.status_code not in (200, 204):
+        raise RuntimeError(f"Failed to delete existing chunks ({response.status_code}): {response.text[:200]}")
 
-        print(f"[FullPass] Deleted existing chunks for user {user_id}")
+    # Cached retrievals point at rows that no longer exist
+    invalidate_user(user_id, "chunks deleted")
+
+    print(f"[FullPass] Deleted existing chunks for user {user_id}")
 
 
 async def save_chunks_batch(user_id: str, chunks: List[dict]):
@@ -91,23 +92,21 @@ async def save_chunks_batch(user_id: str, chunks: List[dict]):
             chunk["message_count"] = 0
 
     # POST batch to Supabase
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{SUPABASE_URL}/rest/v1/conversation_chunks",
-            json=chunks,
-            headers={
-                "apikey": SUPABASE_SERVICE_KEY,
-                "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                "Content-Type": "application/json",
-                "Prefer": "return=minimal",
-            },
-            timeout=60.0,
-        )
+    client = get_supabase_client()
+    response = await client.post(
+        f"{SUPABASE_URL}/rest/v1/conversation_chunks",
+        json=chunks,
+        headers={
+            "Content-Type": "application/json",
+            "Prefer": "return=minimal",
+        },
+        timeout=60.0,
+    )
 
-        if response.status_code not in (200, 201):
-            raise RuntimeError(f"Failed to save chunk batch ({response.status_code}): {response.text[:200]}")
+    if response.status_code not in (200, 201):
+        raise RuntimeError(f"Failed to save chunk batch ({response.status_code}): {response.text[:200]}")
 
-        print(f"[FullPass] Saved batch of {len(chunks)} chunks")
+    print(f"[FullPass] Saved batch of {len(chunks)} chunks")
 
 
 async def run_full_pass_pipeline(
@@ -127,6 +126,7 @@ async def run_full_pass_pipeline(
     5. Consolidate and reduce facts if needed
     6. Generate MEMORY section from facts
     7. Save MEMORY to user_profiles.memory_md
+    8. Embed MEMORY bullets for per-turn slicing (memory_slicer)
 
     Args:
         user_id: User ID for the full pass
@@ -139,6 +139,7 @@ async def run_full_pass_pipeline(
     print(f"[FullPass] Starting pipeline for user {user_id}")
     print(f"[FullPass] Storage path: {storage_path}")
     print(f"[FullPass] Expected conversations: {conversation_count}")
+    timings = start_timings()
 
     # Initialize Anthropic client
     client = anthropic.AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
@@ -149,12 +150,14 @@ async def run_full_pass_pipeline(
 
     # Step 1: Download conversations
     from main import download_conversations
-    conversations = await download_conversations(storage_path, file_type=file_type)
+    with stage("full_pass", "download"):
+        conversations = await download_conversations(storage_path, file_type=file_type)
     print(f"[FullPass] Downloaded {len(conversations)} conversations")
 
     # Step 2: Chunk conversations
     from processors.conversation_chunker import chunk_conversations
-    chunks = chunk_conversations(conversations, target_tokens=2000, overlap_tokens=200)
+    with stage("full_pass", "chunk"):
+        chunks = chunk_conversations(conversations, target_tokens=2000, overlap_tokens=200)
     print(f"[FullPass] Created {len(chunks)} chunks from {len(conversations)} conversations")
 
     # Free raw conversations — chunks and v2 regen will use sampled subset
@@ -172,21 +175,23 @@ async def run_full_pass_pipeline(
 
     # Step 3: Save chunks to database (in batches to avoid request size limits)
     batch_size = 100
-    for i in range(0, len(chunks), batch_size):
-        batch = chunks[i:i+batch_size]
+    with stage("full_pass", "save_chunks"):
+        for i in range(0, len(chunks), batch_size):
+            batch = chunks[i:i+batch_size]
 
-        # Delete existing chunks on first batch
-        if i == 0:
-            await delete_user_chunks(user_id)
+            # Delete existing chunks on first batch
+            if i == 0:
+                await delete_user_chunks(user_id)
 
-        await save_chunks_batch(user_id, batch)
+            await save_chunks_batch(user_id, batch)
 
     print(f"[FullPass] Saved {len(chunks)} chunks to database")
 
     # Step 3.5: Generate embeddings for saved chunks
     try:
         from processors.embedding_generator import generate_embeddings_for_chunks
-        embedded_count = await generate_embeddings_for_chunks(user_id, cost_tracker=tracker)
+        with stage("full_pass", "embeddings"):
+            embedded_count = await generate_embeddings_for_chunks(user_id, cost_tracker=tracker)
         print(f"[FullPass] Generated embeddings for {embedded_count} chunks")
     except Exception as e:
         # Non-fatal: embeddings can be regenerated later, don't fail the pipeline
@@ -200,7 +205,8 @@ async def run_full_pass_pipeline(
         hierarchical_reduce
     )
 
-    all_facts = await extract_facts_parallel(chunks, client, cost_tracker=tracker)
+    with stage("full_pass", "fact_extraction"):
+        all_facts = await extract_facts_parallel(chunks, client, cost_tracker=tracker)
     print(f"[FullPass] Extracted facts from {len(chunks)} chunks")
 
     # Step 5: Consolidate facts
@@ -208,11 +214,13 @@ async def run_full_pass_pipeline(
     print(f"[FullPass] Consolidated {consolidated['total_count']} unique facts")
 
     # Step 6: Reduce if too large (over 200K tokens)
-    reduced = await hierarchical_reduce(consolidated, client, max_tokens=200000, cost_tracker=tracker)
+    with stage("full_pass", "reduce"):
+        reduced = await hierarchical_reduce(consolidated, client, max_tokens=200000, cost_tracker=tracker)
 
     # Step 7: Generate MEMORY section
     from processors.memory_generator import generate_memory_section
-    memory_md = await generate_memory_section(reduced, client, cost_tracker=tracker)
+    with stage("full_pass", "memory_generation"):
+        memory_md = await generate_memory_section(reduced, client, cost_tracker=tracker)
     print(f"[FullPass] Generated MEMORY section ({len(memory_md)} chars)")
 
     # Step 8: Save MEMORY to database (early save so user benefits even if v2 regen fails)
@@ -220,6 +228,16 @@ async def run_full_pass_pipeline(
     await update_user_profile(user_id, {"memory_md": memory_md})
     print(f"[FullPass] Saved MEMORY section to database")
 
+    # Step 8.5: Embed MEMORY bullets so queries inject only the relevant ones
+    try:
+        from memory_slicer import index_memory
+        with stage("full_pass", "memory_index"):
+            bullet_count = await index_memory(user_id, memory_md, cost_tracker=tracker)
+        print(f"[FullPass] Indexed {bullet_count} MEMORY bullets")
+    except Exception as e:
+        # Non-fatal: without bullets the whole MEMORY section is injected
+        print(f"[FullPass] WARNING: MEMORY bullet indexing failed: {e}")
+
     # Free chunks and facts before v2 regen
     del chunks, all_facts, consolidated, reduced
     gc.collect()
@@ -228,7 +246,8 @@ async def run_full_pass_pipeline(
     from processors.v2_regenerator import regenerate_sections_v2, sections_to_soulprint_text
 
     print(f"[FullPass] Starting v2 section regeneration for user {user_id}")
-    v2_sections = await regenerate_sections_v2(conversations_light, memory_md, client, cost_tracker=tracker)
+    with stage("full_pass", "v2_regeneration"):
+        v2_sections = await regenerate_sections_v2(conversations_light, memory_md, client, cost_tracker=tracker)
 
     if v2_sections:
         # Build soulprint_text from v2 sections + MEMORY
@@ -254,6 +273,7 @@ async def run_full_pass_pipeline(
           f"(LLM: ${cost_summary['llm_cost_usd']:.4f}, Embed: ${cost_summary['embedding_cost_usd']:.4f})")
     await update_user_profile(user_id, {"import_cost_json": json.dumps(cost_summary)})
 
+    print(f"[FullPass] Stage timings (ms): {timings}")
     print(f"[FullPass] Pipeline complete for user {user_id}")
 
     return memory_md
@@ -22,13 +22,16 @@ import zipfile
 from datetime import datetime, timezone
 from typing import Optional
 
-import httpx
 import ijson
 
+from supabase_client import get_supabase_client
+from retrieval_cache import invalidate_user
+from profile_cache import invalidate_profile
+from metrics import stage, start_timings
+from admission import AdmissionRejected, Reservation, admit, acquire as admission_acquire, release as admission_release
 from .dag_parser import extract_active_path
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
 
 async def update_progress(user_id: str, percent: int, stage: str):
@@ -38,23 +41,21 @@ async def update_progress(user_id: str, percent: int, stage: str):
     real-time progress to the user.
     """
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(
-                f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
-                json={
-                    "progress_percent": percent,
-                    "import_stage": stage,
-                    "updated_at": datetime.now(timezone.utc).isoformat(),
-                },
-                headers={
-                    "apikey": SUPABASE_SERVICE_KEY,
-                    "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                    "Content-Type": "application/json",
-                    "Prefer": "return=minimal",
-                },
-            )
-            if response.status_code not in (200, 204):
-                print(f"[streaming_import] WARN: progress update failed for {user_id}: {response.text}")
+        client = get_supabase_client()
+        response = await client.patch(
+            f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
+            json={
+                "progress_percent": percent,
+                "import_stage": stage,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            },
+            headers={
+                "Content-Type": "application/json",
+                "Prefer": "return=minimal",
+            },
+        )
+        if response.status_code not in (200, 204):
+            print(f"[streaming_import] WARN: progress update failed for {user_id}: {response.text}")
     except Exception as e:
         # Best-effort progress updates -- never block the pipeline
         print(f"[streaming_import] WARN: progress update error for {user_id}: {e}")
@@ -74,16 +75,14 @@ async def download_streaming(storage_path: str, temp_file_path: str):
     # Supabase Storage URL: /storage/v1/object/{bucket}/{path}
     url = f"{SUPABASE_URL}/storage/v1/object/{storage_path}"
 
-    async with httpx.AsyncClient(timeout=300.0) as client:
-        async with client.stream("GET", url, headers={
-            "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-        }) as response:
-            response.raise_for_status()
+    client = get_supabase_client()
+    async with client.stream("GET", url, timeout=300.0) as response:
+        response.raise_for_status()
 
-            # Write chunks directly to disk (constant memory)
-            with open(temp_file_path, "wb") as f:
-                async for chunk in response.aiter_bytes():
-                    f.write(chunk)  # Immediately write to disk, don't accumulate
+        # Write chunks directly to disk (constant memory)
+        with open(temp_file_path, "wb") as f:
+            async for chunk in response.aiter_bytes():
+                f.write(chunk)  # Immediately write to disk, don't accumulate
 
     print(f"[streaming_import] Downloaded to temp file: {temp_file_path}")
 
@@ -182,31 +181,67 @@ def parse_conversations_streaming(file_path: str) -> list:
 FULL_PASS_TIMEOUT_SECONDS = 30 * 60  # 30 minutes max for full pass
 
 
-async def trigger_full_pass(user_id: str, storage_path: str, conversation_count: int, file_type: str = 'json'):
+async def _mark_full_pass_failed(user_id: str, error_msg: str) -> None:
+    """Record a failed full pass on user_profiles (best-effort)."""
+    try:
+        client = get_supabase_client()
+        await client.patch(
+            f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
+            json={
+                "full_pass_status": "failed",
+                "full_pass_error": error_msg,
+            },
+            headers={
+                "Content-Type": "application/json",
+                "Prefer": "return=minimal",
+            },
+        )
+    except Exception:
+        pass
+
+
+async def trigger_full_pass(
+    user_id: str,
+    storage_path: str,
+    conversation_count: int,
+    file_type: str = 'json',
+    reservation: Optional[Reservation] = None,
+):
     """Fire-and-forget full pass after quick pass succeeds.
 
     Runs asynchronously — does not block chat access.
     Creates conversation chunks, extracts facts, generates MEMORY section,
     and regenerates v2 soulprint sections.
 
-    Hard timeout of 30 minutes prevents runaway processes.
+    Waits for a slot in the "full_pass" admission lane first; the hard
+    timeout of 30 minutes (which prevents runaway processes) starts once
+    admitted. /retry-full-pass passes the reservation it made before
+    answering 202. Without one (after a quick pass) a full lane queue marks
+    the full pass failed rather than dropping it silently.
     """
+    try:
+        async with admit("full_pass", reservation=reservation):
+            await _run_full_pass(user_id, storage_path, conversation_count, file_type)
+    except AdmissionRejected as e:
+        print(f"[streaming_import] Full pass rejected for user {user_id}: {e}")
+        await _mark_full_pass_failed(user_id, f"Full pass not started: {e} (retry later)")
+
+
+async def _run_full_pass(user_id: str, storage_path: str, conversation_count: int, file_type: str):
     try:
         # Mark full pass as processing
-        async with httpx.AsyncClient() as client:
-            await client.patch(
-                f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
-                json={
-                    "full_pass_status": "processing",
-                    "full_pass_error": None,
-                },
-                headers={
-                    "apikey": SUPABASE_SERVICE_KEY,
-                    "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                    "Content-Type": "application/json",
-                    "Prefer": "return=minimal",
-                },
-            )
+        client = get_supabase_client()
+        await client.patch(
+            f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
+            json={
+                "full_pass_status": "processing",
+                "full_pass_error": None,
+            },
+            headers={
+                "Content-Type": "application/json",
+                "Prefer": "return=minimal",
+            },
+        )
 
         from .full_pass import run_full_pass_pipeline
         await asyncio.wait_for(
@@ -220,67 +255,39 @@ async def trigger_full_pass(user_id: str, storage_path: str, conversation_count:
         )
 
         # Mark complete
-        async with httpx.AsyncClient() as client:
-            await client.patch(
-                f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
-                json={
-                    "full_pass_status": "complete",
-                    "full_pass_completed_at": datetime.now(timezone.utc).isoformat(),
-                },
-                headers={
-                    "apikey": SUPABASE_SERVICE_KEY,
-                    "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                    "Content-Type": "application/json",
-                    "Prefer": "return=minimal",
-                },
-            )
+        client = get_supabase_client()
+        await client.patch(
+            f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
+            json={
+                "full_pass_status": "complete",
+                "full_pass_completed_at": datetime.now(timezone.utc).isoformat(),
+            },
+            headers={
+                "Content-Type": "application/json",
+                "Prefer": "return=minimal",
+            },
+        )
+        invalidate_user(user_id, "full pass complete")
         print(f"[streaming_import] Full pass complete for user {user_id}")
 
     except asyncio.TimeoutError:
         error_msg = f"Full pass timed out after {FULL_PASS_TIMEOUT_SECONDS}s"
         print(f"[streaming_import] TIMEOUT: {error_msg} for user {user_id}")
-        try:
-            async with httpx.AsyncClient() as client:
-                await client.patch(
-                    f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
-                    json={
-                        "full_pass_status": "failed",
-                        "full_pass_error": error_msg,
-                    },
-                    headers={
-                        "apikey": SUPABASE_SERVICE_KEY,
-                        "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                        "Content-Type": "application/json",
-                        "Prefer": "return=minimal",
-                    },
-                )
-        except Exception:
-            pass
+        await _mark_full_pass_failed(user_id, error_msg)
 
     except Exception as e:
         error_msg = str(e)[:500]
         print(f"[streaming_import] Full pass failed for user {user_id}: {error_msg}")
         traceback.print_exc()
-        try:
-            async with httpx.AsyncClient() as client:
-                await client.patch(
-                    f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
-                    json={
-                        "full_pass_status": "failed",
-                        "full_pass_error": error_msg,
-                    },
-                    headers={
-                        "apikey": SUPABASE_SERVICE_KEY,
-                        "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                        "Content-Type": "application/json",
-                        "Prefer": "return=minimal",
-                    },
-                )
-        except Exception:
-            pass
-
-
-async def process_import_streaming(user_id: str, storage_path: str, file_type: str = 'json'):
+        await _mark_full_pass_failed(user_id, error_msg)
+
+
+async def process_import_streaming(
+    user_id: str,
+    storage_path: str,
+    file_type: str = 'json',
+    reservation: Optional[Reservation] = None,
+):
     """Complete streaming import pipeline with TRUE constant memory.
 
     Uses temporary file approach:
@@ -300,8 +307,12 @@ async def process_import_streaming(user_id: str, storage_path: str, file_type: s
         user_id: The user's ID
         storage_path: Full Supabase Storage path (e.g. "user-imports/uid/raw-123.json")
         file_type: 'json' or 'zip' — if 'zip', extract conversations.json server-side
+        reservation: "import" lane slot or queue position /import-full reserved
+            before answering 202 (admission.reserve)
     """
     temp_file_path: Optional[str] = None
+    admitted_at = await admission_acquire("import", reservation=reservation)
+    timings = start_timings()
 
     try:
         # Create temporary file
@@ -312,15 +323,18 @@ async def process_import_streaming(user_id: str, storage_path: str, file_type: s
         # Stage 1: Download to temp file (0-20%)
         await update_progress(user_id, 0, "Downloading export")
         print(f"[streaming_import] Starting download for user {user_id}: {storage_path} (file_type={file_type})")
-        await download_streaming(storage_path, temp_file_path)
+        with stage("import", "download"):
+            await download_streaming(storage_path, temp_file_path)
 
         # Stage 1.5: Extract if ZIP
-        temp_file_path = extract_if_zip(temp_file_path, file_type)
+        with stage("import", "extract"):
+            temp_file_path = extract_if_zip(temp_file_path, file_type)
         await update_progress(user_id, 20, "Parsing conversations")
 
         # Stage 2: Parse from temp file (20-50%)
         print(f"[streaming_import] Parsing conversations for user {user_id}")
-        conversations = parse_conversations_streaming(temp_file_path)
+        with stage("import", "parse"):
+            conversations = parse_conversations_streaming(temp_file_path)
 
         if not conversations:
             raise ValueError("No conversations found in export file")
@@ -330,7 +344,8 @@ async def process_import_streaming(user_id: str, storage_path: str, file_type: s
         # Stage 3: Quick Pass (50-100%)
         print(f"[streaming_import] Generating quick pass for user {user_id} ({len(conversations)} conversations)")
         from .quick_pass import generate_quick_pass
-        quick_pass_result = generate_quick_pass(conversations)  # synchronous, raises on failure
+        with stage("import", "quick_pass"):
+            quick_pass_result = generate_quick_pass(conversations)  # synchronous, raises on failure
 
         # Save to database (matching process-server.ts structure)
         soul_md = json.dumps(quick_pass_result.get("soul", {}))
@@ -359,7 +374,8 @@ async def process_import_streaming(user_id: str, storage_path: str, file_type: s
 {tools_md}"""
 
         # Update user_profiles with quick pass results
-        async with httpx.AsyncClient() as client:
+        with stage("import", "save"):
+            client = get_supabase_client()
             await client.patch(
                 f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
                 json={
@@ -378,14 +394,14 @@ async def process_import_streaming(user_id: str, storage_path: str, file_type: s
                     "updated_at": datetime.now(timezone.utc).isoformat(),
                 },
                 headers={
-                    "apikey": SUPABASE_SERVICE_KEY,
-                    "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
                     "Content-Type": "application/json",
                     "Prefer": "return=minimal",
                 },
             )
 
+        invalidate_profile(user_id, "quick pass complete")
         print(f"[streaming_import] Quick pass complete for user {user_id}: ai_name={ai_name}, archetype={archetype}")
+        print(f"[streaming_import] Stage timings (ms): {timings}")
 
         # Fire-and-forget full pass (chunks, facts, memory, v2 sections)
         # User can chat immediately with quick pass results while this runs
@@ -399,27 +415,26 @@ async def process_import_streaming(user_id: str, storage_path: str, file_type: s
         traceback.print_exc()
 
         try:
-            async with httpx.AsyncClient() as client:
-                await client.patch(
-                    f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
-                    json={
-                        "import_status": "failed",
-                        "import_error": error_msg,
-                        "progress_percent": 100,
-                        "import_stage": "Failed",
-                        "updated_at": datetime.now(timezone.utc).isoformat(),
-                    },
-                    headers={
-                        "apikey": SUPABASE_SERVICE_KEY,
-                        "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                        "Content-Type": "application/json",
-                        "Prefer": "return=minimal",
-                    },
-                )
+            client = get_supabase_client()
+            await client.patch(
+                f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
+                json={
+                    "import_status": "failed",
+                    "import_error": error_msg,
+                    "progress_percent": 100,
+                    "import_stage": "Failed",
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                },
+                headers={
+                    "Content-Type": "application/json",
+                    "Prefer": "return=minimal",
+                },
+            )
         except Exception as update_err:
             print(f"[streaming_import] ERROR: Failed to update error status for {user_id}: {update_err}")
 
     finally:
+        admission_release("import", admitted_at=admitted_at)
         # Clean up temp files and any extraction directory
         if temp_file_path:
             import shutil
@@ -0,0 +1,184 @@
+"""
+Profile Cache
+
+Server-side cache of each user's prompt profile (the five JSON sections,
+MEMORY, soulprint_text and ai_name) so /query doesn't need the full profile
+in every request body. The Next.js app used to post tens of kilobytes of
+sections per turn that Pydantic validated and the prompt builder re-parsed.
+
+Protocol:
+- Every /query and /query/stream response carries `profile_etag`, a content
+  hash of the profile the answer was built from
+- A client that still has that ETag sends `profile_etag` and omits
+  `sections` / `soulprint_text`; the service uses its cached copy
+- On a miss (unknown or stale ETag, evicted entry, another instance) the
+  profile is loaded from user_profiles and the new ETag is returned
+- If that load fails the request is rejected with 409 and
+  reason "resend_profile" (ProfileUnavailable) -- the client retries with
+  the full profile rather than getting an answer built without one
+- Sending `sections` still works and refreshes the cache (legacy clients,
+  or a client that knows the profile just changed)
+
+Entries are dropped when this instance rewrites the profile (quick pass,
+full pass, v2 section regeneration). Other instances notice via
+PROFILE_CACHE_TTL_SECONDS, which bounds how long a stale copy can be served
+to a client that never resends its sections.
+
+Config (env):
+- PROFILE_CACHE_SIZE         (users, default 1000)
+- PROFILE_CACHE_TTL_SECONDS  (default 1800)
+"""
+
+import os
+import asyncio
+import hashlib
+from typing import Dict, Any, Optional, Tuple
+
+from ttl_cache import TTLCache
+from prompt_builder import profile_fingerprint
+from supabase_client import get_supabase_client
+
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "1000"))
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "1800"))
+
+# QueryRequest.sections key -> user_profiles column
+SECTION_COLUMNS = {
+    "soul": "soul_md",
+    "identity": "identity_md",
+    "user": "user_md",
+    "agents": "agents_md",
+    "tools": "tools_md",
+    "memory": "memory_md",
+}
+PROFILE_COLUMNS = (*SECTION_COLUMNS.values(), "soulprint_text", "ai_name")
+
+# user_id -> {"etag", "sections", "soulprint_text", "ai_name"}
+_profiles = TTLCache(max_size=PROFILE_CACHE_SIZE, default_ttl=PROFILE_CACHE_TTL_SECONDS)
+_loading: Dict[str, asyncio.Task] = {}
+
+_stats = {
+    "from_request": 0,
+    "etag_hits": 0,
+    "loads": 0,
+    "load_failures": 0,
+    "invalidations": 0,
+}
+
+
+class ProfileUnavailable(Exception):
+    """An ETag-only request whose profile couldn't be loaded; the client must resend it in full."""
+
+    status_code = 409
+    reason = "resend_profile"
+
+    def __init__(self, user_id: str):
+        super().__init__(f"Profile for user {user_id} is not cached and could not be loaded; resend sections")
+        self.user_id = user_id
+
+
+def make_profile_etag(
+    sections: Optional[dict],
+    soulprint_text: Optional[str],
+    ai_name: Optional[str],
+) -> str:
+    """Content hash of a profile -- same inputs, same ETag on every instance."""
+    profile = {column: (sections or {}).get(key) for key, column in SECTION_COLUMNS.items()}
+    profile["soulprint_text"] = soulprint_text
+    digest = hashlib.sha1(profile_fingerprint(profile).encode("utf-8"))
+    digest.update((ai_name or "").encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def _store(user_id: str, sections: Optional[dict], soulprint_text: Optional[str], ai_name: Optional[str]) -> dict:
+    entry = {
+        "etag": make_profile_etag(sections, soulprint_text, ai_name),
+        "sections": sections,
+        "soulprint_text": soulprint_text,
+        "ai_name": ai_name,
+    }
+    _profiles.set(user_id, entry)
+    return entry
+
+
+async def _fetch_profile(user_id: str) -> dict:
+    response = await get_supabase_client().get(
+        f"{SUPABASE_URL}/rest/v1/user_profiles",
+        params={"user_id": f"eq.{user_id}", "select": ",".join(PROFILE_COLUMNS), "limit": "1"},
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to load profile ({response.status_code}): {response.text[:200]}")
+    rows = response.json()
+    return rows[0] if rows else {}
+
+
+async def _load(user_id: str) -> dict:
+    try:
+        row = await _fetch_profile(user_id)
+        sections = {key: row.get(column) for key, column in SECTION_COLUMNS.items()}
+        if not any(sections.values()):
+            sections = None
+        _stats["loads"] += 1
+        return _store(user_id, sections, row.get("soulprint_text"), row.get("ai_name"))
+    finally:
+        _loading.pop(user_id, None)
+
+
+async def resolve_profile(
+    user_id: str,
+    sections: Optional[dict],
+    soulprint_text: Optional[str],
+    ai_name: Optional[str],
+    profile_etag: Optional[str],
+) -> Tuple[Optional[dict], Optional[str], Optional[str], Optional[str]]:
+    """Profile to answer a query with.
+
+    Returns:
+        (sections, soulprint_text, ai_name, etag) -- ai_name from the request
+        wins over the stored one; etag is None for a request without a profile
+
+    Raises:
+        ProfileUnavailable: only profile_etag was sent and the reload failed
+    """
+    if sections is not None or soulprint_text or profile_etag is None:
+        # Full profile in the request (or a legacy client that sends nothing)
+        if sections is None and not soulprint_text:
+            return None, None, ai_name, None
+        _stats["from_request"] += 1
+        entry = _store(user_id, sections, soulprint_text, ai_name)
+        return sections, soulprint_text, ai_name, entry["etag"]
+
+    entry = _profiles.get(user_id)
+    if entry is not None and entry["etag"] == profile_etag:
+        _stats["etag_hits"] += 1
+    else:
+        # Unknown or stale ETag -- user_profiles is the source of truth
+        task = _loading.get(user_id)
+        if task is None:
+            task = asyncio.create_task(_load(user_id))
+            _loading[user_id] = task
+        try:
+            entry = await asyncio.shield(task)
+        except Exception as e:
+            _stats["load_failures"] += 1
+            print(f"[ProfileCache] Failed to load profile for user {user_id}: {e}")
+            raise ProfileUnavailable(user_id) from e
+
+    return entry["sections"], entry["soulprint_text"], ai_name or entry["ai_name"], entry["etag"]
+
+
+def invalidate_profile(user_id: str, reason: str = "") -> None:
+    """Drop a user's cached profile after it was rewritten."""
+    if _profiles.delete(user_id):
+        _stats["invalidations"] += 1
+        print(f"[ProfileCache] Invalidated user {user_id}" + (f" ({reason})" if reason else ""))
+
+
+def get_profile_cache_stats() -> Dict[str, Any]:
+    """Cache size plus request/ETag/load counters."""
+    return {
+        **_profiles.stats(),
+        **_stats,
+        "loading": len(_loading),
+    }
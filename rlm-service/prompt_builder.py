@@ -14,15 +14,39 @@ Version selection via PROMPT_VERSION environment variable:
 - Default: 'v1-technical'
 - Invalid values fall back to 'v1-technical' with console warning (PRMT-02)
 
+The profile-dependent part of each prompt (persona + MEMORY) is compiled
+once per (profile content, version, ai_name) and memoized, since a profile
+only changes after an import; date, context, web search and emotional
+sections are spliced in per request.
+
+Owner prompts are kept within PROMPT_TOKEN_BUDGET by fit_sections, which
+trims per-turn sections lowest priority first (CONTEXT, web search, daily
+memory, RELEVANT MEMORY, then ABOUT THIS PERSON / MEMORY) and reports what
+was cut. Prompts under budget are unchanged; budgeting is Python-only (no
+TypeScript twin).
+
+When MEMORY is sliced (memory_slicer), profile memory_md holds only the core
+bullets and the bullets relevant to this turn arrive as memory_slice,
+rendered as ## RELEVANT MEMORY at the start of the per-turn tail.
+
+Config (env):
+- PERSONA_CACHE_ENABLED       ("true"/"false", default true)
+- PERSONA_CACHE_SIZE          (compiled personas kept, default 1000)
+- PERSONA_CACHE_TTL_SECONDS   (default 3600)
+- PROMPT_TOKEN_BUDGET         (whole system prompt, default 12000; 0 disables)
+
 Satisfies: PRMT-01, PRMT-02, PRMT-03, PRMT-04
 """
 
 import os
 import json
+import hashlib
 from datetime import datetime, timezone
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple
 
 from prompt_helpers import clean_section, format_section
+from ttl_cache import TTLCache
+from processors.conversation_chunker import estimate_tokens
 
 
 # ============================================
@@ -31,6 +55,146 @@ from prompt_helpers import clean_section, format_section
 
 VALID_VERSIONS = ["v1-technical", "v2-natural-voice", "v3-openclaw"]
 
+PERSONA_CACHE_ENABLED = os.getenv("PERSONA_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+PERSONA_CACHE_SIZE = int(os.getenv("PERSONA_CACHE_SIZE", "1000"))
+PERSONA_CACHE_TTL_SECONDS = float(os.getenv("PERSONA_CACHE_TTL_SECONDS", "3600"))
+
+# Profile fields the compiled persona depends on
+PERSONA_FIELDS = ("soul_md", "identity_md", "user_md", "agents_md", "tools_md", "memory_md", "soulprint_text")
+
+# (profile fingerprint, version, ai_name) -> compiled persona (PromptBuilder._persona)
+_persona_cache = TTLCache(max_size=PERSONA_CACHE_SIZE, default_ttl=PERSONA_CACHE_TTL_SECONDS)
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "12000"))
+
+# Sections fit_sections may cut, lowest priority first, each with the allowance
+# it keeps until every lower-priority section is down to its own. MEMORY goes
+# last: it sits in the cached prefix (build_cacheable_prompt), so cutting it
+# changes the prefix and costs a prompt-cache write.
+SECTION_BUDGETS = (
+    ("context", 1000),
+    ("web_search", 600),
+    ("daily_memory", 150),
+    ("memory_slice", 500),
+    ("about", 1500),
+    ("memory", 1500),
+)
+
+
+# ============================================
+# Persona Cache
+# ============================================
+
+def profile_fingerprint(profile: Dict[str, Any]) -> str:
+    """Content hash of the profile fields that shape the persona.
+
+    Hashing the raw section strings is far cheaper than parsing, cleaning
+    and formatting them, and changes whenever an import rewrites the profile.
+    """
+    digest = hashlib.sha1()
+    for field in PERSONA_FIELDS:
+        value = profile.get(field)
+        if value is not None and not isinstance(value, str):
+            value = json.dumps(value, sort_keys=True, default=str)
+        digest.update(field.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update((value or "").encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+# ============================================
+# Section Token Budget
+# ============================================
+
+def _section_tokens(value: Any) -> int:
+    if isinstance(value, list):
+        return sum(estimate_tokens(f"\n- [{fact['category']}] {fact['fact']}") for fact in value)
+    return estimate_tokens(value or "")
+
+
+def _trim_section(value: Any, max_tokens: int) -> Any:
+    """Keep the head of a section within max_tokens (whole facts, else whole lines)."""
+    if isinstance(value, list):
+        kept = []
+        used = 0
+        for fact in value:
+            cost = _section_tokens([fact])
+            if used + cost > max_tokens:
+                break
+            kept.append(fact)
+            used += cost
+        return kept
+
+    max_chars = max_tokens * 4
+    if len(value) <= max_chars:
+        return value
+    cut = value[:max_chars]
+    boundary = cut.rfind("\n")
+    if boundary <= 0:
+        boundary = cut.rfind(" ")
+    return cut[:boundary].rstrip() if boundary > 0 else cut
+
+
+def fit_sections(
+    sections: Dict[str, Any],
+    fixed_tokens: int,
+    token_budget: Optional[int] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Trim prompt sections so fixed_tokens + sections fit the token budget.
+
+    Sections are cut in SECTION_BUDGETS order: first each down to its
+    allowance, then (if still over) further in the same order. Text keeps
+    its head -- retrieved context is packed most relevant first -- and daily
+    memory keeps its leading facts.
+
+    Args:
+        sections: name -> text (daily_memory: list of fact dicts)
+        fixed_tokens: Prompt text that is never cut (persona, rules, emotional sections)
+        token_budget: Override PROMPT_TOKEN_BUDGET (0 disables)
+
+    Returns:
+        (sections, report) -- sections is returned as-is when under budget;
+        report has token_budget, tokens_in, tokens_out and trimmed
+        (section -> tokens cut, only sections that were cut)
+    """
+    budget = token_budget if token_budget is not None else PROMPT_TOKEN_BUDGET
+    sizes = {name: _section_tokens(value) for name, value in sections.items()}
+    total = fixed_tokens + sum(sizes.values())
+    report: Dict[str, Any] = {"token_budget": budget, "tokens_in": total, "tokens_out": total, "trimmed": {}}
+    if budget <= 0 or total <= budget:
+        return sections, report
+
+    fitted = dict(sections)
+    over = total - budget
+    for use_allowance in (True, False):
+        for name, allowance in SECTION_BUDGETS:
+            size = sizes.get(name, 0)
+            floor = allowance if use_allowance else 0
+            if over <= 0:
+                break
+            if size <= floor:
+                continue
+            fitted[name] = _trim_section(fitted[name], max(floor, size - over))
+            cut = size - _section_tokens(fitted[name])
+            sizes[name] = size - cut
+            over -= cut
+            report["trimmed"][name] = report["trimmed"].get(name, 0) + cut
+
+    report["tokens_out"] = fixed_tokens + sum(sizes.values())
+    return fitted, report
+
+
+def clear_persona_cache() -> None:
+    """Drop all compiled personas (tests, or after a bulk profile rewrite)."""
+    _persona_cache.clear()
+
+
+def get_persona_cache_stats() -> Dict[str, Any]:
+    """Compiled persona cache size and hit/miss counters."""
+    return {"enabled": PERSONA_CACHE_ENABLED, **_persona_cache.stats()}
+
 
 # ============================================
 # Version Detection
@@ -165,6 +329,8 @@ Respond with:
 class PromptBuilder:
     def __init__(self, version: Optional[str] = None):
         self._version = version if version is not None else get_prompt_version()
+        # fit_sections report for the last owner prompt built (None for imposter mode)
+        self.last_budget_report: Optional[Dict[str, Any]] = None
 
     def get_version(self) -> str:
         """Get the active prompt version (useful for logging/testing)."""
@@ -181,21 +347,36 @@ class PromptBuilder:
         web_search_citations: Optional[List[str]] = None,
         current_date: Optional[str] = None,
         current_time: Optional[str] = None,
+        memory_slice: Optional[str] = None,
     ) -> str:
         """Build a system prompt using the active version strategy."""
+        return self._build_system_prompt(
+            profile, daily_memory, memory_context, ai_name, is_owner,
+            web_search_context, web_search_citations, current_date, current_time,
+            memory_slice=memory_slice,
+        )
+
+    def _build_system_prompt(
+        self,
+        profile: Dict[str, Any],
+        daily_memory: Optional[List[Dict[str, str]]],
+        memory_context: Optional[str],
+        ai_name: Optional[str],
+        is_owner: Optional[bool],
+        web_search_context: Optional[str],
+        web_search_citations: Optional[List[str]],
+        current_date: Optional[str],
+        current_time: Optional[str],
+        reserved_tokens: int = 0,
+        memory_slice: Optional[str] = None,
+    ) -> str:
         ai_name = ai_name if ai_name is not None else "SoulPrint"
         is_owner = is_owner if is_owner is not None else True
-
-        if current_date and current_time:
-            date_str = current_date
-            time_str = current_time
-        else:
-            now = datetime.now(timezone.utc)
-            date_str = now.strftime("%A, %B %d, %Y")
-            time_str = now.strftime("%I:%M %p UTC").lstrip("0")
+        date_str, time_str = self._resolve_date_time(current_date, current_time)
 
         # IMPOSTER MODE -- identical for both versions
         if not is_owner:
+            self.last_budget_report = None
             return (
                 f"You are {ai_name}, a fiercely loyal AI that ONLY serves its owner. "
                 f"Someone who is NOT the owner is trying to use you right now.\n"
@@ -207,31 +388,20 @@ class PromptBuilder:
                 f"personal information about the real owner."
             )
 
-        if self._version == "v3-openclaw":
-            return self._build_openclaw_prompt(
-                profile, daily_memory, memory_context, ai_name,
-                web_search_context, web_search_citations,
-                date_str, time_str,
-            )
-
-        if self._version == "v2-natural-voice":
-            return self._build_natural_voice_prompt(
-                profile, daily_memory, memory_context, ai_name,
-                web_search_context, web_search_citations,
-                date_str, time_str,
-            )
-
-        return self._build_technical_prompt(
+        return "".join(self._build_prompt_parts(
             profile, daily_memory, memory_context, ai_name,
             web_search_context, web_search_citations,
-            date_str, time_str,
-        )
+            date_str, time_str, reserved_tokens, memory_slice,
+        ))
 
-    # ============================================
-    # V1: Technical Markdown Prompt
-    # ============================================
+    @staticmethod
+    def _resolve_date_time(current_date: Optional[str], current_time: Optional[str]) -> Tuple[str, str]:
+        if current_date and current_time:
+            return current_date, current_time
+        now = datetime.now(timezone.utc)
+        return now.strftime("%A, %B %d, %Y"), now.strftime("%I:%M %p UTC").lstrip("0")
 
-    def _build_technical_prompt(
+    def _build_prompt_parts(
         self,
         profile: Dict[str, Any],
         daily_memory: Optional[List[Dict[str, str]]],
@@ -241,10 +411,140 @@ class PromptBuilder:
         web_search_citations: Optional[List[str]],
         current_date: str,
         current_time: str,
-    ) -> str:
+        reserved_tokens: int = 0,
+        memory_slice: Optional[str] = None,
+    ) -> Tuple[str, str, str, str]:
+        """
+        Owner-mode prompt for the active version as (head, date_line, body, tail).
+
+        head + date_line + body + tail is the canonical prompt. head and body
+        (persona + MEMORY) only change when the profile does; date_line and tail
+        (RELEVANT MEMORY, CONTEXT, REMEMBER, web search) change every turn.
+
+        The persona is compiled once per (profile, version, ai_name) and
+        memoized (see _compile_persona); only daily memory, date, context and
+        web search are spliced in per request, after fit_sections has cut
+        them (and MEMORY) to PROMPT_TOKEN_BUDGET. reserved_tokens accounts for
+        text the caller appends afterwards (emotional sections). memory_slice
+        is this turn's relevant MEMORY bullets (structured profiles only).
+        """
+        persona = self._compile_persona(profile, ai_name)
+        date_line = f"\n\nToday is {current_date}, {current_time}."
+
+        sections, self.last_budget_report = fit_sections(
+            {
+                "context": memory_context or "",
+                "web_search": web_search_context or "",
+                "daily_memory": list(daily_memory or []) if persona["structured"] else [],
+                "memory_slice": (memory_slice or "") if persona["structured"] else "",
+                "about": persona["about"] or "",
+                "memory": persona["memory"] or "",
+            },
+            fixed_tokens=persona["tokens"] + estimate_tokens(date_line) + reserved_tokens,
+        )
+
+        body = persona["body"]
+        if sections["memory"]:
+            body += f"\n\n## MEMORY\n{sections['memory']}"
+
+        if sections["daily_memory"]:
+            body += "\n\n## DAILY MEMORY"
+            for fact in sections["daily_memory"]:
+                body += f"\n- [{fact['category']}] {fact['fact']}"
+
+        if sections["about"]:
+            body += f"\n\n## ABOUT THIS PERSON\n{sections['about']}"
+
+        tail = ""
+        # RELEVANT MEMORY -- MEMORY bullets picked for this turn (memory_slicer)
+        if sections["memory_slice"]:
+            tail += f"\n\n## RELEVANT MEMORY\n{sections['memory_slice']}"
+
+        # CONTEXT section -- RAG retrieval results
+        if sections["context"]:
+            tail += f"\n\n## CONTEXT\n{sections['context']}"
+
+        # PRMT-04: behavioral rules reinforced AFTER context (v2/v3 only)
+        tail += persona["remember"]
+
+        # Add web search results (user triggered Web Search)
+        if sections["web_search"]:
+            tail += (
+                f"\n\n"
+                f"WEB SEARCH RESULTS (Real-time information):\n"
+                f"{sections['web_search']}"
+            )
+
+            if web_search_citations and len(web_search_citations) > 0:
+                tail += "\n\nSources to cite in your response:"
+                for i, url in enumerate(web_search_citations[:6]):
+                    tail += f"\n{i + 1}. {url}"
+
+            tail += "\n\nUse the web search results above to answer. Cite sources naturally in your response."
+
+        return persona["head"], date_line, body, tail
+
+    def _compile_persona(self, profile: Dict[str, Any], ai_name: str) -> Dict[str, Any]:
+        """
+        Profile-dependent prompt parts (see _persona).
+
+        Memoized by (profile fingerprint, version, ai_name): the section JSON
+        is parsed, cleaned and formatted once per profile revision instead of
+        on every /query. The cached dict is shared -- callers build new
+        strings from it and never mutate it.
+        """
+        if not PERSONA_CACHE_ENABLED:
+            return self._compile_persona_uncached(profile, ai_name)
+
+        key = (profile_fingerprint(profile), self._version, ai_name)
+        compiled = _persona_cache.get(key)
+        if compiled is None:
+            compiled = self._compile_persona_uncached(profile, ai_name)
+            _persona_cache.set(key, compiled)
+        return compiled
+
+    def _compile_persona_uncached(self, profile: Dict[str, Any], ai_name: str) -> Dict[str, Any]:
+        if self._version == "v3-openclaw":
+            return self._compile_openclaw_persona(profile, ai_name)
+
+        if self._version == "v2-natural-voice":
+            return self._compile_natural_voice_persona(profile, ai_name)
+
+        return self._compile_technical_persona(profile, ai_name)
+
+    @staticmethod
+    def _persona(
+        profile: Dict[str, Any],
+        structured: bool,
+        head: str,
+        body: str,
+        remember: str,
+    ) -> Dict[str, Any]:
+        """
+        Compiled persona: head, body (formatted sections), remember (REMEMBER
+        block placed after CONTEXT), plus the raw MEMORY / soulprint_text the
+        budgeter may trim -- MEMORY only renders with structured sections,
+        ABOUT THIS PERSON only without.
+        """
+        return {
+            "head": head,
+            "body": body,
+            "remember": remember,
+            "structured": structured,
+            "memory": (profile.get("memory_md") or None) if structured else None,
+            "about": (profile.get("soulprint_text") or None) if not structured else None,
+            "tokens": estimate_tokens(head + body + remember),
+        }
+
+    # ============================================
+    # V1: Technical Markdown Prompt
+    # ============================================
+
+    def _compile_technical_persona(self, profile: Dict[str, Any], ai_name: str) -> Dict[str, Any]:
         """
         EXACT replica of the TypeScript PromptBuilder v1.
-        Must produce character-identical output for the same inputs.
+        Must produce character-identical output for the same inputs
+        (once assembled by _build_prompt_parts).
         """
         # Parse and clean structured sections
         soul = clean_section(self._parse_section_safe(profile.get("soul_md")))
@@ -252,12 +552,11 @@ class PromptBuilder:
         user_info = clean_section(self._parse_section_safe(profile.get("user_md")))
         agents = clean_section(self._parse_section_safe(profile.get("agents_md")))
         tools = clean_section(self._parse_section_safe(profile.get("tools_md")))
-        memory_section = profile.get("memory_md") or None
 
         has_structured_sections = any([soul, identity, user_info, agents, tools])
 
         # OWNER MODE - OpenClaw-style personality injection
-        prompt = (
+        head = (
             f"# {ai_name}\n"
             f"\n"
             f"You have memories of this person \u2014 things they\u2019ve said, how they think, "
@@ -270,11 +569,11 @@ class PromptBuilder:
             f"\n"
             f"NEVER start responses with greetings like \u201cHey\u201d, \u201cHi\u201d, "
             f"\u201cHello\u201d, \u201cHey there\u201d, \u201cGreat question\u201d, or any "
-            f"pleasantries. Jump straight into substance. Talk like a person, not a chatbot.\n"
-            f"\n"
-            f"Today is {current_date}, {current_time}."
+            f"pleasantries. Jump straight into substance. Talk like a person, not a chatbot."
         )
 
+        body = ""
+
         if has_structured_sections:
             soul_md = format_section("SOUL", soul)
             identity_md = format_section("IDENTITY", identity)
@@ -283,60 +582,23 @@ class PromptBuilder:
             tools_md = format_section("TOOLS", tools)
 
             if soul_md:
-                prompt += f"\n\n{soul_md}"
+                body += f"\n\n{soul_md}"
             if identity_md:
-                prompt += f"\n\n{identity_md}"
+                body += f"\n\n{identity_md}"
             if user_md:
-                prompt += f"\n\n{user_md}"
+                body += f"\n\n{user_md}"
             if agents_md:
-                prompt += f"\n\n{agents_md}"
+                body += f"\n\n{agents_md}"
             if tools_md:
-                prompt += f"\n\n{tools_md}"
-            if memory_section:
-                prompt += f"\n\n## MEMORY\n{memory_section}"
-
-            if daily_memory and len(daily_memory) > 0:
-                prompt += "\n\n## DAILY MEMORY"
-                for fact in daily_memory:
-                    prompt += f"\n- [{fact['category']}] {fact['fact']}"
-        elif profile.get("soulprint_text"):
-            prompt += f"\n\n## ABOUT THIS PERSON\n{profile['soulprint_text']}"
-
-        if memory_context:
-            prompt += f"\n\n## CONTEXT\n{memory_context}"
-
-        # Add web search results (user triggered Web Search)
-        if web_search_context:
-            prompt += (
-                f"\n\n"
-                f"WEB SEARCH RESULTS (Real-time information):\n"
-                f"{web_search_context}"
-            )
-
-            if web_search_citations and len(web_search_citations) > 0:
-                prompt += "\n\nSources to cite in your response:"
-                for i, url in enumerate(web_search_citations[:6]):
-                    prompt += f"\n{i + 1}. {url}"
-
-            prompt += "\n\nUse the web search results above to answer. Cite sources naturally in your response."
+                body += f"\n\n{tools_md}"
 
-        return prompt
+        return self._persona(profile, has_structured_sections, head, body, "")
 
     # ============================================
     # V2: Natural Voice Prompt
     # ============================================
 
-    def _build_natural_voice_prompt(
-        self,
-        profile: Dict[str, Any],
-        daily_memory: Optional[List[Dict[str, str]]],
-        memory_context: Optional[str],
-        ai_name: str,
-        web_search_context: Optional[str],
-        web_search_citations: Optional[List[str]],
-        current_date: str,
-        current_time: str,
-    ) -> str:
+    def _compile_natural_voice_persona(self, profile: Dict[str, Any], ai_name: str) -> Dict[str, Any]:
         """
         Flowing personality primer instead of markdown headers.
         Personality sections use prose; functional sections use ## headers.
@@ -348,7 +610,6 @@ class PromptBuilder:
         user_info = clean_section(self._parse_section_safe(profile.get("user_md")))
         agents = clean_section(self._parse_section_safe(profile.get("agents_md")))
         tools = clean_section(self._parse_section_safe(profile.get("tools_md")))
-        memory_section = profile.get("memory_md") or None
 
         has_structured_sections = any([soul, identity, user_info, agents, tools])
 
@@ -397,87 +658,48 @@ class PromptBuilder:
             f"pleasantries. Jump straight into substance. Talk like a person, not a chatbot."
         )
 
-        # Date/time
-        prompt += f"\n\nToday is {current_date}, {current_time}."
+        body = ""
 
         if has_structured_sections:
             # USER section -- user context comes BEFORE memory
             user_md = format_section("USER", user_info)
             if user_md:
-                prompt += f"\n\n{user_md}"
+                body += f"\n\n{user_md}"
 
             # AGENTS section
             agents_md = format_section("AGENTS", agents)
             if agents_md:
-                prompt += f"\n\n{agents_md}"
+                body += f"\n\n{agents_md}"
 
             # IDENTITY section for archetype/role info
             identity_md = format_section("IDENTITY", identity)
             if identity_md:
-                prompt += f"\n\n{identity_md}"
+                body += f"\n\n{identity_md}"
 
             # TOOLS section
             tools_md = format_section("TOOLS", tools)
             if tools_md:
-                prompt += f"\n\n{tools_md}"
-
-            # MEMORY section (static memory_md field)
-            if memory_section:
-                prompt += f"\n\n## MEMORY\n{memory_section}"
-
-            # Daily memory facts
-            if daily_memory and len(daily_memory) > 0:
-                prompt += "\n\n## DAILY MEMORY"
-                for fact in daily_memory:
-                    prompt += f"\n- [{fact['category']}] {fact['fact']}"
-        elif profile.get("soulprint_text"):
-            prompt += f"\n\n## ABOUT THIS PERSON\n{profile['soulprint_text']}"
+                body += f"\n\n{tools_md}"
 
-        # CONTEXT section -- RAG retrieval results
-        if memory_context:
-            prompt += f"\n\n## CONTEXT\n{memory_context}"
+            # MEMORY section (static memory_md field) follows, see _build_prompt_parts
 
         # CRITICAL (PRMT-04): Reinforce behavioral rules AFTER context
         # to prevent RAG chunks from overriding personality.
         # Parse agents_md for behavioral_rules array.
+        remember = ""
         agents_raw = self._parse_section_safe(profile.get("agents_md"))
         if agents_raw and isinstance(agents_raw.get("behavioral_rules"), list) and len(agents_raw["behavioral_rules"]) > 0:
-            prompt += "\n\n## REMEMBER"
+            remember += "\n\n## REMEMBER"
             for rule in agents_raw["behavioral_rules"]:
-                prompt += f"\n- {rule}"
-
-        # Web search results (same format as v1)
-        if web_search_context:
-            prompt += (
-                f"\n\n"
-                f"WEB SEARCH RESULTS (Real-time information):\n"
-                f"{web_search_context}"
-            )
-
-            if web_search_citations and len(web_search_citations) > 0:
-                prompt += "\n\nSources to cite in your response:"
-                for i, url in enumerate(web_search_citations[:6]):
-                    prompt += f"\n{i + 1}. {url}"
+                remember += f"\n- {rule}"
 
-            prompt += "\n\nUse the web search results above to answer. Cite sources naturally in your response."
-
-        return prompt
+        return self._persona(profile, has_structured_sections, prompt, body, remember)
 
     # ============================================
     # V3: OpenClaw Prompt
     # ============================================
 
-    def _build_openclaw_prompt(
-        self,
-        profile: Dict[str, Any],
-        daily_memory: Optional[List[Dict[str, str]]],
-        memory_context: Optional[str],
-        ai_name: str,
-        web_search_context: Optional[str],
-        web_search_citations: Optional[List[str]],
-        current_date: str,
-        current_time: str,
-    ) -> str:
+    def _compile_openclaw_persona(self, profile: Dict[str, Any], ai_name: str) -> Dict[str, Any]:
         """
         OpenClaw-style cohesive personality injection.
         Weaves all 5 JSON sections into natural prose instead of markdown key-value pairs.
@@ -489,7 +711,6 @@ class PromptBuilder:
         user_info = clean_section(self._parse_section_safe(profile.get("user_md")))
         agents = clean_section(self._parse_section_safe(profile.get("agents_md")))
         tools = clean_section(self._parse_section_safe(profile.get("tools_md")))
-        memory_section = profile.get("memory_md") or None
 
         has_structured_sections = any([soul, identity, user_info, agents, tools])
 
@@ -616,43 +837,16 @@ class PromptBuilder:
             "everything. If you don\u2019t know something, say so."
         )
 
-        prompt += f"\n\nToday is {current_date}, {current_time}."
-
-        # --- Static memory section ---
-        if has_structured_sections:
-            if memory_section:
-                prompt += f"\n\n## MEMORY\n{memory_section}"
-
-            if daily_memory and len(daily_memory) > 0:
-                prompt += "\n\n## DAILY MEMORY"
-                for fact in daily_memory:
-                    prompt += f"\n- [{fact['category']}] {fact['fact']}"
-        elif profile.get("soulprint_text"):
-            prompt += f"\n\n## ABOUT THIS PERSON\n{profile['soulprint_text']}"
-
-        # RAG context
-        if memory_context:
-            prompt += f"\n\n## CONTEXT\n{memory_context}"
-
         # PRMT-04: Reinforce behavioral rules AFTER context
+        remember = ""
         if agents and isinstance(agents.get("behavioral_rules"), list) and len(agents["behavioral_rules"]) > 0:
-            prompt += "\n\n## REMEMBER"
+            remember += "\n\n## REMEMBER"
             for rule in agents["behavioral_rules"]:
                 if isinstance(rule, str) and rule.strip():
-                    prompt += f"\n- {rule}"
-
-        # Web search
-        if web_search_context:
-            prompt += f"\n\nWEB SEARCH RESULTS (Real-time information):\n{web_search_context}"
-
-            if web_search_citations and len(web_search_citations) > 0:
-                prompt += "\n\nSources to cite in your response:"
-                for i, url in enumerate(web_search_citations[:6]):
-                    prompt += f"\n{i + 1}. {url}"
-
-            prompt += "\n\nUse the web search results above to answer. Cite sources naturally in your response."
+                    remember += f"\n- {rule}"
 
-        return prompt
+        # Static MEMORY section follows the date line, see _build_prompt_parts
+        return self._persona(profile, has_structured_sections, prompt, "", remember)
 
     # ============================================
     # Helpers
@@ -695,6 +889,7 @@ class PromptBuilder:
         current_time: Optional[str] = None,
         emotional_state: Optional[Dict[str, Any]] = None,
         relationship_arc: Optional[Dict[str, Any]] = None,
+        memory_slice: Optional[str] = None,
     ) -> str:
         """
         Build emotionally intelligent system prompt.
@@ -708,33 +903,94 @@ class PromptBuilder:
         Order matters: adaptive tone goes LAST so it's the freshest instruction.
         Mirrors TypeScript PromptBuilder.buildEmotionallyIntelligentPrompt.
         """
+        emotional = self._build_emotional_sections(emotional_state, relationship_arc)
+
         # Start with base prompt (v1 or v2 depending on version)
-        prompt = self.build_system_prompt(
-            profile=profile,
-            daily_memory=daily_memory,
-            memory_context=memory_context,
-            ai_name=ai_name,
-            is_owner=is_owner,
-            web_search_context=web_search_context,
-            web_search_citations=web_search_citations,
-            current_date=current_date,
-            current_time=current_time,
+        prompt = self._build_system_prompt(
+            profile, daily_memory, memory_context, ai_name, is_owner,
+            web_search_context, web_search_citations, current_date, current_time,
+            reserved_tokens=estimate_tokens(emotional),
+            memory_slice=memory_slice,
         )
 
+        return prompt + emotional
+
+    @staticmethod
+    def _build_emotional_sections(
+        emotional_state: Optional[Dict[str, Any]],
+        relationship_arc: Optional[Dict[str, Any]],
+    ) -> str:
+        """Uncertainty, relationship arc and adaptive tone sections, each prefixed by a blank line."""
         # ALWAYS include uncertainty acknowledgment (EMOT-02)
-        prompt += "\n\n" + build_uncertainty_instructions()
+        sections = "\n\n" + build_uncertainty_instructions()
 
         # Add relationship arc instructions if provided (EMOT-03)
         if relationship_arc:
             arc_text = build_relationship_arc_instructions(relationship_arc)
             if arc_text:
-                prompt += "\n\n" + arc_text
+                sections += "\n\n" + arc_text
 
         # Add adaptive tone ONLY if emotional state has sufficient confidence (EMOT-01)
         # Pitfall 3 from research: only apply if confidence >= 0.6
         if emotional_state and emotional_state.get("confidence", 0) >= 0.6:
             tone_text = build_adaptive_tone_instructions(emotional_state)
             if tone_text:
-                prompt += "\n\n" + tone_text
+                sections += "\n\n" + tone_text
+
+        return sections
+
+    # ============================================
+    # Prompt Caching Split
+    # ============================================
+
+    def build_cacheable_prompt(
+        self,
+        profile: Dict[str, Any],
+        daily_memory: Optional[List[Dict[str, str]]] = None,
+        memory_context: Optional[str] = None,
+        ai_name: Optional[str] = None,
+        is_owner: Optional[bool] = None,
+        web_search_context: Optional[str] = None,
+        web_search_citations: Optional[List[str]] = None,
+        current_date: Optional[str] = None,
+        current_time: Optional[str] = None,
+        emotional_state: Optional[Dict[str, Any]] = None,
+        relationship_arc: Optional[Dict[str, Any]] = None,
+        memory_slice: Optional[str] = None,
+    ) -> Tuple[str, str]:
+        """
+        Emotionally intelligent prompt split for Anthropic prompt caching.
+
+        Returns (stable_prefix, volatile_suffix):
+        - stable_prefix: persona head + SOUL/IDENTITY/USER/AGENTS/TOOLS + MEMORY.
+          Identical across a user's turns, so it can carry a cache_control marker.
+        - volatile_suffix: date line, RELEVANT MEMORY, CONTEXT, REMEMBER, web
+          search results and the emotional intelligence sections.
+
+        Same content as build_emotionally_intelligent_prompt; the only
+        difference is that the "Today is ..." line moves from the middle of the
+        prompt to the start of the suffix. Python-only (no TypeScript twin):
+        the canonical builders above stay character-identical to TS.
+        Imposter mode is returned entirely as the suffix (never cached).
+        """
+        ai_name = ai_name if ai_name is not None else "SoulPrint"
+        is_owner = is_owner if is_owner is not None else True
+        emotional = self._build_emotional_sections(emotional_state, relationship_arc)
+
+        if not is_owner:
+            imposter = self.build_system_prompt(
+                profile=profile,
+                ai_name=ai_name,
+                is_owner=False,
+                current_date=current_date,
+                current_time=current_time,
+            )
+            return "", imposter + emotional
 
-        return prompt
+        date_str, time_str = self._resolve_date_time(current_date, current_time)
+        head, date_line, body, tail = self._build_prompt_parts(
+            profile, daily_memory, memory_context, ai_name,
+            web_search_context, web_search_citations,
+            date_str, time_str, estimate_tokens(emotional), memory_slice,
+        )
+        return head + body, date_line.lstrip("\n") + tail + emotional
@@ -0,0 +1,118 @@
+"""
+Retrieval Result Cache
+
+Per-user cache of (query embedding -> matched conversation chunks) so chat
+turns inside a session don't re-run the match_conversation_chunks RPC for a
+query that was already answered. A user's chunk set only changes when the
+full pass rewrites it, so entries are invalidated when chunks are deleted or
+full_pass_status flips to complete.
+
+Memory is capped two ways:
+- At most RETRIEVAL_CACHE_MAX_USERS users (least-recently-active evicted)
+- At most RETRIEVAL_CACHE_MAX_ENTRIES_PER_USER queries per user (LRU)
+
+Config (env):
+- RETRIEVAL_CACHE_MAX_USERS             (default 500)
+- RETRIEVAL_CACHE_MAX_ENTRIES_PER_USER  (default 32)
+- RETRIEVAL_CACHE_TTL_SECONDS           (default 900)
+"""
+
+import os
+import struct
+import hashlib
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any
+
+from ttl_cache import TTLCache
+
+
+RETRIEVAL_CACHE_MAX_USERS = int(os.getenv("RETRIEVAL_CACHE_MAX_USERS", "500"))
+RETRIEVAL_CACHE_MAX_ENTRIES_PER_USER = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES_PER_USER", "32"))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "900"))
+
+_user_caches: "OrderedDict[str, TTLCache]" = OrderedDict()
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "invalidations": 0,
+    "user_evictions": 0,
+}
+
+
+def make_retrieval_key(
+    query_embedding: List[float],
+    match_count: int,
+    threshold: float,
+    query_text: str = "",
+) -> str:
+    """Stable key for a query embedding plus match parameters.
+
+    query_text is only needed when results also depend on the literal text
+    (hybrid full-text + vector retrieval); it is whitespace/case normalized.
+    """
+    packed = struct.pack(f"{len(query_embedding)}f", *query_embedding)
+    hasher = hashlib.sha1(packed)
+    if query_text:
+        hasher.update(" ".join(query_text.lower().split()).encode("utf-8"))
+    digest = hasher.hexdigest()
+    return f"{digest}:{match_count}:{threshold}"
+
+
+def get_cached_chunks(user_id: str, key: str) -> Optional[List[dict]]:
+    """Return cached chunks for this user/query, or None on miss."""
+    cache = _user_caches.get(user_id)
+    chunks = cache.get(key) if cache is not None else None
+
+    if chunks is None:
+        _stats["misses"] += 1
+        return None
+
+    _user_caches.move_to_end(user_id)
+    _stats["hits"] += 1
+    return chunks
+
+
+def cache_chunks(user_id: str, key: str, chunks: List[dict]) -> None:
+    """Store matched chunks for this user/query."""
+    cache = _user_caches.get(user_id)
+    if cache is None:
+        cache = TTLCache(
+            max_size=RETRIEVAL_CACHE_MAX_ENTRIES_PER_USER,
+            default_ttl=RETRIEVAL_CACHE_TTL_SECONDS,
+        )
+        _user_caches[user_id] = cache
+
+        while len(_user_caches) > RETRIEVAL_CACHE_MAX_USERS:
+            _user_caches.popitem(last=False)
+            _stats["user_evictions"] += 1
+    else:
+        _user_caches.move_to_end(user_id)
+
+    cache.set(key, chunks)
+
+
+def invalidate_user(user_id: str, reason: str = "") -> None:
+    """Drop every cached retrieval for a user (chunks rewritten or deleted)."""
+    # The in-process vector index holds the same chunk set
+    from vector_index import drop_user
+    drop_user(user_id)
+
+    if _user_caches.pop(user_id, None) is not None:
+        _stats["invalidations"] += 1
+        print(f"[RetrievalCache] Invalidated user {user_id}" + (f" ({reason})" if reason else ""))
+
+
+def get_retrieval_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters and current size."""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        "users": len(_user_caches),
+        "entries": sum(len(cache) for cache in _user_caches.values()),
+        "max_users": RETRIEVAL_CACHE_MAX_USERS,
+        "max_entries_per_user": RETRIEVAL_CACHE_MAX_ENTRIES_PER_USER,
+        "hits": _stats["hits"],
+        "misses": _stats["misses"],
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "invalidations": _stats["invalidations"],
+        "user_evictions": _stats["user_evictions"],
+    }
@@ -0,0 +1,229 @@
+"""
+RLM Engine Pool
+
+Builds RLM instances once at startup and runs their blocking completion()
+calls on a bounded worker pool, so the recursive memory path never blocks
+the event loop and never pays cold construction cost on the request path.
+
+- Each instance is checked out exclusively for one completion at a time
+- Every call has a deadline (checkout wait + completion); on timeout or
+  cancellation the caller is released immediately and the instance is
+  returned to the pool once its worker thread finishes
+- Per-call timings (checkout wait, completion time, RLM-reported execution
+  time when available) are kept for health/metrics endpoints
+
+Config (env):
+- RLM_POOL_SIZE        (instances and worker threads, default 4)
+- RLM_TIMEOUT_SECONDS  (per-call deadline, default 45)
+"""
+
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any
+
+
+RLM_POOL_SIZE = int(os.getenv("RLM_POOL_SIZE", "4"))
+RLM_TIMEOUT_SECONDS = float(os.getenv("RLM_TIMEOUT_SECONDS", "45"))
+RLM_MODEL = "claude-sonnet-4-20250514"
+
+
+class RLMUnavailable(Exception):
+    """Raised when the rlm library is not installed or the pool failed to start."""
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_idle: Optional[asyncio.Queue] = None
+_available: bool = False
+_start_lock: Optional[asyncio.Lock] = None
+_started: bool = False
+
+_stats = {
+    "completions": 0,
+    "errors": 0,
+    "timeouts": 0,
+    "cancellations": 0,
+    "in_flight": 0,
+    "checkout_wait_total_ms": 0.0,
+    "checkout_wait_max_ms": 0.0,
+    "completion_total_ms": 0.0,
+    "completion_max_ms": 0.0,
+    "last_execution_time_ms": None,
+    "construct_ms": None,
+}
+
+
+def _build_instances(count: int) -> List[Any]:
+    """Construct RLM instances (blocking -- run off the event loop)."""
+    from rlm import RLM
+
+    return [
+        RLM(
+            backend="anthropic",
+            backend_kwargs={
+                "model_name": RLM_MODEL,
+                "api_key": os.getenv("ANTHROPIC_API_KEY"),
+            },
+            verbose=False,
+        )
+        for _ in range(count)
+    ]
+
+
+async def start_rlm_pool() -> bool:
+    """Create the pool (called from the FastAPI lifespan hook, safe to call twice).
+
+    Returns True if RLM is available. A missing rlm library is not an error:
+    the pool is marked unavailable and /query goes straight to the fallback.
+    """
+    global _executor, _idle, _available, _start_lock, _started
+
+    if _start_lock is None:
+        _start_lock = asyncio.Lock()
+
+    async with _start_lock:
+        if _started:
+            return _available
+
+        started = time.perf_counter()
+        try:
+            instances = await asyncio.to_thread(_build_instances, RLM_POOL_SIZE)
+        except ImportError:
+            print("[RLMPool] rlm library not installed -- RLM path disabled")
+            _available = False
+            _started = True
+            return False
+        except Exception as e:
+            print(f"[RLMPool] Failed to construct RLM instances: {e}")
+            _available = False
+            _started = True
+            return False
+
+        _stats["construct_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        _executor = ThreadPoolExecutor(max_workers=RLM_POOL_SIZE, thread_name_prefix="rlm")
+        _idle = asyncio.Queue()
+        for instance in instances:
+            _idle.put_nowait(instance)
+
+        _available = True
+        _started = True
+        print(f"[RLMPool] Started {RLM_POOL_SIZE} RLM instances in {_stats['construct_ms']}ms")
+        return True
+
+
+def shutdown_rlm_pool() -> None:
+    """Stop worker threads (called on app shutdown)."""
+    global _executor, _idle, _available, _started
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+    _idle = None
+    _available = False
+    _started = False
+
+
+def _release(instance: Any) -> None:
+    if _idle is not None:
+        _idle.put_nowait(instance)
+
+
+def _release_when_done(future: asyncio.Future, instance: Any) -> None:
+    """Return an abandoned instance once its worker thread finishes."""
+    def _done(f: asyncio.Future) -> None:
+        if not f.cancelled() and f.exception() is not None:
+            print(f"[RLMPool] Abandoned completion failed: {f.exception()}")
+        _release(instance)
+
+    future.add_done_callback(_done)
+
+
+async def rlm_completion(context: str, timeout: Optional[float] = None) -> str:
+    """Run one RLM completion on the worker pool with a deadline.
+
+    Raises:
+        RLMUnavailable: rlm is not installed or the pool failed to start
+        asyncio.TimeoutError: checkout + completion exceeded the deadline
+    """
+    if not _started:
+        await start_rlm_pool()
+    if not _available or _idle is None or _executor is None:
+        raise RLMUnavailable("RLM library not available")
+
+    budget = timeout if timeout is not None else RLM_TIMEOUT_SECONDS
+    deadline = time.perf_counter() + budget
+    loop = asyncio.get_running_loop()
+
+    # Checkout
+    checkout_started = time.perf_counter()
+    try:
+        instance = await asyncio.wait_for(_idle.get(), timeout=max(0.0, deadline - time.perf_counter()))
+    except asyncio.TimeoutError:
+        _stats["timeouts"] += 1
+        raise asyncio.TimeoutError(f"No RLM instance free within {budget}s") from None
+    checkout_ms = (time.perf_counter() - checkout_started) * 1000
+    _stats["checkout_wait_total_ms"] += checkout_ms
+    _stats["checkout_wait_max_ms"] = max(_stats["checkout_wait_max_ms"], checkout_ms)
+
+    # Completion on a worker thread
+    run_started = time.perf_counter()
+    future = loop.run_in_executor(_executor, instance.completion, context)
+    _stats["in_flight"] += 1
+    try:
+        result = await asyncio.wait_for(
+            asyncio.shield(future),
+            timeout=max(0.0, deadline - time.perf_counter()),
+        )
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        # The worker thread can't be interrupted -- hand the instance back when it finishes
+        _stats["in_flight"] -= 1
+        if isinstance(e, asyncio.TimeoutError):
+            _stats["timeouts"] += 1
+        else:
+            _stats["cancellations"] += 1
+        _release_when_done(future, instance)
+        if isinstance(e, asyncio.TimeoutError):
+            raise asyncio.TimeoutError(f"RLM completion exceeded {budget}s") from None
+        raise
+    except Exception:
+        _stats["in_flight"] -= 1
+        _stats["errors"] += 1
+        _release(instance)
+        raise
+
+    _stats["in_flight"] -= 1
+    _release(instance)
+
+    completion_ms = (time.perf_counter() - run_started) * 1000
+    _stats["completions"] += 1
+    _stats["completion_total_ms"] += completion_ms
+    _stats["completion_max_ms"] = max(_stats["completion_max_ms"], completion_ms)
+
+    # RLMChatCompletion reports its own wall time (seconds) across all iterations
+    execution_time = getattr(result, "execution_time", None)
+    if isinstance(execution_time, (int, float)):
+        _stats["last_execution_time_ms"] = round(execution_time * 1000, 2)
+
+    print(f"[RLMPool] Completion in {completion_ms:.0f}ms (checkout wait {checkout_ms:.0f}ms)")
+    return result.response
+
+
+def get_rlm_pool_stats() -> Dict[str, Any]:
+    """Pool availability, load and per-call timing snapshot."""
+    completions = _stats["completions"]
+    return {
+        "available": _available,
+        "pool_size": RLM_POOL_SIZE,
+        "idle": _idle.qsize() if _idle is not None else 0,
+        "in_flight": _stats["in_flight"],
+        "completions": completions,
+        "errors": _stats["errors"],
+        "timeouts": _stats["timeouts"],
+        "cancellations": _stats["cancellations"],
+        "construct_ms": _stats["construct_ms"],
+        "checkout_wait_avg_ms": round(_stats["checkout_wait_total_ms"] / completions, 2) if completions else 0.0,
+        "checkout_wait_max_ms": round(_stats["checkout_wait_max_ms"], 2),
+        "completion_avg_ms": round(_stats["completion_total_ms"] / completions, 2) if completions else 0.0,
+        "completion_max_ms": round(_stats["completion_max_ms"], 2),
+        "last_execution_time_ms": _stats["last_execution_time_ms"],
+    }
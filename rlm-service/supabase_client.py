@@ -0,0 +1,171 @@
+"""
+Shared Supabase HTTP Client
+
+One pooled, keep-alive httpx.AsyncClient for all Supabase REST/Storage traffic.
+Opening a fresh AsyncClient per call pays TCP+TLS setup on every request; this
+client is created once in the FastAPI lifespan hook and reused everywhere.
+
+- Auth headers (apikey + service-role bearer) are set once on the client
+- HTTP/2 is used when the optional `h2` package is installed
+- Pool limits are configurable via environment variables
+- In-flight / peak request counters are exposed via get_pool_stats()
+
+Config (env):
+- SUPABASE_POOL_MAX_CONNECTIONS   (default 50)
+- SUPABASE_POOL_MAX_KEEPALIVE     (default 20)
+- SUPABASE_POOL_KEEPALIVE_EXPIRY  (seconds, default 30)
+- SUPABASE_HTTP2                  ("true"/"false", default true)
+- SUPABASE_TIMEOUT_SECONDS        (default 30)
+"""
+
+import os
+from typing import Optional, Dict, Any
+
+import httpx
+
+
+# ============================================
+# Config
+# ============================================
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _http2_available() -> bool:
+    if os.getenv("SUPABASE_HTTP2", "true").lower() in ("0", "false", "no"):
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ============================================
+# Instrumented Transport
+# ============================================
+
+class _CountingTransport(httpx.AsyncBaseTransport):
+    """Wraps the pooled transport to count requests and in-flight load."""
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport):
+        self._transport = transport
+        self.requests_total = 0
+        self.errors_total = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests_total += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return await self._transport.handle_async_request(request)
+        except Exception:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def open_connections(self) -> Optional[int]:
+        # httpcore pool internals -- best effort, not part of httpx's public API
+        pool = getattr(self._transport, "_pool", None)
+        connections = getattr(pool, "connections", None)
+        return len(connections) if connections is not None else None
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+# ============================================
+# Client Lifecycle
+# ============================================
+
+_client: Optional[httpx.AsyncClient] = None
+_transport: Optional[_CountingTransport] = None
+_limits: Optional[httpx.Limits] = None
+_http2: bool = False
+
+
+def _build_client() -> httpx.AsyncClient:
+    global _transport, _limits, _http2
+
+    service_key = os.getenv("SUPABASE_SERVICE_KEY") or ""
+
+    _limits = httpx.Limits(
+        max_connections=_env_int("SUPABASE_POOL_MAX_CONNECTIONS", 50),
+        max_keepalive_connections=_env_int("SUPABASE_POOL_MAX_KEEPALIVE", 20),
+        keepalive_expiry=_env_float("SUPABASE_POOL_KEEPALIVE_EXPIRY", 30.0),
+    )
+    _http2 = _http2_available()
+    _transport = _CountingTransport(httpx.AsyncHTTPTransport(limits=_limits, http2=_http2))
+
+    print(
+        f"[Supabase] Pooled client created (http2={_http2}, "
+        f"max_connections={_limits.max_connections}, "
+        f"max_keepalive={_limits.max_keepalive_connections})"
+    )
+
+    return httpx.AsyncClient(
+        transport=_transport,
+        timeout=_env_float("SUPABASE_TIMEOUT_SECONDS", 30.0),
+        headers={
+            "apikey": service_key,
+            "Authorization": f"Bearer {service_key}",
+        },
+    )
+
+
+async def start_supabase_client() -> httpx.AsyncClient:
+    """Create the shared client (called from the FastAPI lifespan hook)."""
+    return get_supabase_client()
+
+
+async def close_supabase_client() -> None:
+    """Close the shared client and drain its connection pool."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        print("[Supabase] Pooled client closed")
+
+
+def get_supabase_client() -> httpx.AsyncClient:
+    """Return the shared Supabase client, creating it lazily if needed.
+
+    Lazy creation keeps background tasks and scripts that run outside the
+    FastAPI lifespan working without extra setup.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Pool utilization snapshot for health/metrics endpoints."""
+    if _client is None or _transport is None:
+        return {"active": False}
+
+    return {
+        "active": not _client.is_closed,
+        "http2": _http2,
+        "max_connections": _limits.max_connections if _limits else None,
+        "max_keepalive_connections": _limits.max_keepalive_connections if _limits else None,
+        "open_connections": _transport.open_connections(),
+        "in_flight": _transport.in_flight,
+        "peak_in_flight": _transport.peak_in_flight,
+        "requests_total": _transport.requests_total,
+        "errors_total": _transport.errors_total,
+    }
@@ -0,0 +1,174 @@
+"""
+Tests for admission
+
+Verifies lane concurrency limits, FIFO hand-off, fast rejection when the
+queue is full or the wait times out, the per-user cap, and lane isolation.
+"""
+
+import asyncio
+
+import pytest
+
+import admission
+from admission import Lane, AdmissionRejected
+
+
+async def hold(lane: Lane, events: list, name: str, seconds: float, user_id=None):
+    await lane.acquire(user_id)
+    events.append(f"start {name}")
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        lane.release(user_id, seconds)
+
+
+class TestLane:
+    """Tests for a single lane."""
+
+    def test_limits_concurrency_and_admits_in_order(self):
+        lane = Lane("test", concurrency=1, queue_size=10, queue_timeout=5)
+        events = []
+
+        async def run():
+            await asyncio.gather(*[hold(lane, events, str(i), 0.01) for i in range(4)])
+
+        asyncio.run(run())
+        assert events == ["start 0", "start 1", "start 2", "start 3"]
+        assert lane.active == 0
+        assert lane.stats["queued"] == 3
+
+    def test_rejects_fast_when_queue_full(self):
+        lane = Lane("test", concurrency=1, queue_size=1, queue_timeout=5)
+
+        async def run():
+            first = asyncio.create_task(hold(lane, [], "a", 0.05))
+            second = asyncio.create_task(hold(lane, [], "b", 0.05))
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as info:
+                await lane.acquire()
+            await asyncio.gather(first, second)
+            return info.value
+
+        rejected = asyncio.run(run())
+        assert rejected.status_code == 503
+        assert rejected.reason == "full"
+        assert rejected.retry_after >= 1
+
+    def test_queue_timeout_rejects_and_frees_queue_position(self):
+        lane = Lane("test", concurrency=1, queue_size=5, queue_timeout=0.02)
+
+        async def run():
+            holder = asyncio.create_task(hold(lane, [], "a", 0.1))
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as info:
+                await lane.acquire()
+            assert lane.queue_depth == 0
+            await holder
+            return info.value
+
+        assert asyncio.run(run()).reason == "timeout"
+        assert lane.active == 0
+
+    def test_cancelled_waiter_does_not_leak_slot(self):
+        lane = Lane("test", concurrency=1, queue_size=5, queue_timeout=5)
+
+        async def run():
+            holder = asyncio.create_task(hold(lane, [], "a", 0.02))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(lane.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await holder
+            await lane.acquire()
+            lane.release()
+
+        asyncio.run(run())
+        assert lane.active == 0
+
+    def test_per_user_cap_returns_429(self):
+        lane = Lane("test", concurrency=10, queue_size=10, queue_timeout=5, max_per_user=2)
+
+        async def run():
+            await lane.acquire("u1")
+            await lane.acquire("u1")
+            with pytest.raises(AdmissionRejected) as info:
+                await lane.acquire("u1")
+            await lane.acquire("u2")
+            return info.value
+
+        rejected = asyncio.run(run())
+        assert rejected.status_code == 429
+        assert rejected.reason == "user"
+
+
+class TestReserve:
+    """Tests for claiming a slot before a background job starts."""
+
+    def test_reservations_hold_capacity_until_acquired(self):
+        lane = Lane("test", concurrency=1, queue_size=1)
+        events = []
+
+        async def job(name, reservation):
+            await lane.acquire(reservation=reservation)
+            events.append(f"start {name}")
+            lane.release()
+
+        async def run():
+            first = lane.reserve()
+            second = lane.reserve()
+            # Both reservations count before either job has started
+            with pytest.raises(AdmissionRejected):
+                lane.reserve()
+            await asyncio.gather(job("b", second), job("a", first))
+
+        asyncio.run(run())
+        assert events == ["start a", "start b"]
+        assert lane.active == 0
+        assert lane.stats["admitted"] == 2
+
+    def test_full_pass_rejected_without_reservation_is_marked_failed(self, monkeypatch):
+        import processors.streaming_import as streaming_import
+
+        failures = []
+
+        async def fake_mark_failed(user_id, error_msg):
+            failures.append(user_id)
+
+        async def never_runs(*args):
+            raise AssertionError("full pass started without a slot")
+
+        monkeypatch.setattr(admission, "_lanes", {"full_pass": Lane("full_pass", concurrency=0, queue_size=1)})
+        monkeypatch.setattr(streaming_import, "_mark_full_pass_failed", fake_mark_failed)
+        monkeypatch.setattr(streaming_import, "_run_full_pass", never_runs)
+
+        async def run():
+            admission.reserve("full_pass")  # fills the queue
+            await streaming_import.trigger_full_pass("u1", "path", 0)
+
+        asyncio.run(run())
+        assert failures == ["u1"]
+
+
+class TestLanes:
+    """Tests for lane isolation."""
+
+    def test_busy_import_lane_does_not_block_interactive(self, monkeypatch):
+        monkeypatch.setattr(admission, "_lanes", {
+            "interactive": Lane("interactive", concurrency=2, queue_size=2, queue_timeout=0.05),
+            "import": Lane("import", concurrency=1, queue_size=0),
+        })
+
+        async def run():
+            async with admission.admit("import"):
+                blocked = asyncio.create_task(admission.acquire("import"))
+                await asyncio.sleep(0)
+                async with admission.admit("interactive", "u1"):
+                    assert not blocked.done()
+            await blocked
+            admission.release("import")
+
+        asyncio.run(run())
+        stats = admission.get_admission_stats()
+        assert stats["interactive_admitted"] == 1
+        assert stats["import_admitted"] == 2
+        assert stats["import_active"] == 0
@@ -0,0 +1,151 @@
+"""
+Tests for alerts
+
+Verifies error signature grouping, batch coalescing, rate limiting (held
+batches go out once the window has room), webhook error accounting and the
+bounded queue.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import alerts
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Capture sent batches instead of posting; reset dispatcher state."""
+    batches = []
+
+    async def fake_send(groups):
+        batches.append({sig: dict(group) for sig, group in groups.items()})
+
+    monkeypatch.setattr(alerts, "_send", fake_send)
+    monkeypatch.setattr(alerts, "_queue", None)
+    monkeypatch.setattr(alerts, "_task", None)
+    monkeypatch.setattr(alerts, "_held", alerts.OrderedDict())
+    monkeypatch.setattr(alerts, "_post_times", [])
+    monkeypatch.setattr(alerts, "_batch", [])
+    monkeypatch.setattr(alerts, "_stats", {k: 0 for k in alerts._stats})
+    monkeypatch.setattr(alerts, "ALERT_BATCH_WINDOW_SECONDS", 0.05)
+    return batches
+
+
+class TestSignature:
+    """Tests for error signature normalization."""
+
+    def test_masks_numbers_and_ids(self):
+        a = alerts.error_signature("RLM completion exceeded 45.0s for 3f2b1c9e-1111-2222-3333-444455556666")
+        b = alerts.error_signature("RLM completion exceeded 30s for 9a8b7c6d-aaaa-bbbb-cccc-ddddeeeeffff")
+        assert a == b
+
+    def test_different_errors_differ(self):
+        assert alerts.error_signature("Supabase error: 500") != alerts.error_signature("Anthropic overloaded")
+
+
+class TestDispatcher:
+    """Tests for batching, coalescing and rate limiting."""
+
+    def test_identical_errors_coalesce_into_one_post(self, sent):
+        async def run():
+            alerts.start_alert_dispatcher()
+            for i in range(5):
+                alerts.alert_failure(f"RLM completion exceeded {40 + i}s", f"user-{i}", "hi")
+            alerts.alert_failure("Supabase error: 500", "user-9", "hi")
+            await asyncio.sleep(0.15)
+            await alerts.stop_alert_dispatcher()
+
+        asyncio.run(run())
+
+        assert len(sent) == 1
+        counts = sorted(group["count"] for group in sent[0].values())
+        assert counts == [1, 5]
+        assert alerts.get_alert_stats()["coalesced"] == 4
+
+    def test_rate_limited_batches_are_held_and_merged(self, sent, monkeypatch):
+        monkeypatch.setattr(alerts, "ALERT_MAX_POSTS_PER_WINDOW", 1)
+
+        async def run():
+            alerts.start_alert_dispatcher()
+            alerts.alert_failure("first outage", "u1", "hi")
+            await asyncio.sleep(0.1)
+            alerts.alert_failure("second outage", "u2", "hi")
+            await asyncio.sleep(0.1)
+            assert len(sent) == 1
+            await alerts.stop_alert_dispatcher()
+
+        asyncio.run(run())
+
+        # Held batch is flushed on shutdown rather than lost
+        assert len(sent) == 2
+        assert alerts.get_alert_stats()["rate_limited"] == 1
+
+    def test_held_batch_is_sent_when_window_frees(self, sent, monkeypatch):
+        monkeypatch.setattr(alerts, "ALERT_MAX_POSTS_PER_WINDOW", 1)
+        monkeypatch.setattr(alerts, "ALERT_RATE_WINDOW_SECONDS", 0.3)
+
+        async def run():
+            alerts.start_alert_dispatcher()
+            alerts.alert_failure("first outage", "u1", "hi")
+            await asyncio.sleep(0.1)
+            alerts.alert_failure("last alert of the outage", "u2", "hi")
+            await asyncio.sleep(0.1)
+            held = len(sent)
+            # No further alerts arrive -- the held batch must still go out
+            await asyncio.sleep(0.3)
+            sent_before_shutdown = len(sent)
+            await alerts.stop_alert_dispatcher()
+            return held, sent_before_shutdown
+
+        assert asyncio.run(run()) == (1, 2)
+        assert "last alert of the outage" in next(iter(sent[1].values()))["error"]
+
+    def test_dead_dispatcher_is_restarted(self, sent):
+        async def run():
+            async def crashed():
+                raise RuntimeError("dispatcher crashed")
+
+            alerts._task = asyncio.get_running_loop().create_task(crashed())
+            await asyncio.sleep(0)
+            alerts.alert_failure("Supabase error: 500", "user-1", "hi")
+            await asyncio.sleep(0.15)
+            await alerts.stop_alert_dispatcher()
+
+        asyncio.run(run())
+        assert len(sent) == 1
+
+    def test_full_queue_drops_without_blocking(self, sent, monkeypatch):
+        monkeypatch.setattr(alerts, "ALERT_QUEUE_SIZE", 2)
+
+        async def run():
+            for i in range(5):
+                alerts.alert_failure("boom", f"u{i}", "hi")
+            await alerts.stop_alert_dispatcher()
+
+        asyncio.run(run())
+
+        stats = alerts.get_alert_stats()
+        assert stats["enqueued"] == 2
+        assert stats["dropped"] == 3
+
+
+class TestSend:
+    """Tests for webhook posting."""
+
+    @pytest.mark.parametrize("status,posts,errors", [(200, 1, 0), (204, 1, 0), (429, 0, 1), (500, 0, 1)])
+    def test_non_2xx_counts_as_post_error(self, monkeypatch, status, posts, errors):
+        class FakeClient:
+            async def post(self, url, json=None):
+                return httpx.Response(status, text="slow down" if status >= 300 else "")
+
+        monkeypatch.setenv("ALERT_WEBHOOK", "https://hooks.example.test/alert")
+        monkeypatch.setattr(alerts, "_client", FakeClient())
+        monkeypatch.setattr(alerts, "_stats", {k: 0 for k in alerts._stats})
+
+        groups = alerts._coalesce([("boom", "u1", "hi")])
+        asyncio.run(alerts._send(groups))
+
+        assert alerts._stats["posts"] == posts
+        assert alerts._stats["post_errors"] == errors
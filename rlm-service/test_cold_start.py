@@ -0,0 +1,119 @@
+"""
+Tests for cold start
+
+Measures import time of the service in a fresh interpreter against a budget
+so cold-start regressions (a heavy import moved onto the startup path)
+fail CI, and verifies warm-up gates readiness.
+
+Budgets are generous for slow CI machines and can be tuned per environment:
+- COLD_START_IMPORT_BUDGET_SECONDS  (import main, default 4)
+- COLD_START_WARM_BUDGET_SECONDS    (import main + preload modules, default 8)
+"""
+
+import os
+import sys
+import asyncio
+import subprocess
+
+import httpx
+import pytest
+
+import warmup
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+IMPORT_BUDGET_SECONDS = float(os.getenv("COLD_START_IMPORT_BUDGET_SECONDS", "4"))
+WARM_BUDGET_SECONDS = float(os.getenv("COLD_START_WARM_BUDGET_SECONDS", "8"))
+
+
+def measure(code: str) -> float:
+    """Seconds spent running `code` in a fresh interpreter (interpreter startup excluded)."""
+    script = f"import time; t = time.perf_counter()\n{code}\nprint(time.perf_counter() - t)"
+    env = {**os.environ, "SUPABASE_URL": "http://127.0.0.1:9", "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=HERE,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+class TestImportBudget:
+    """Tests for cold-start import time."""
+
+    def test_import_main_within_budget(self):
+        seconds = measure("import main")
+        assert seconds < IMPORT_BUDGET_SECONDS, (
+            f"import main took {seconds:.2f}s (budget {IMPORT_BUDGET_SECONDS}s); "
+            f"run `python -X importtime -c 'import main'` to find the new heavy import"
+        )
+
+    def test_preloaded_startup_within_budget(self):
+        seconds = measure("import main, warmup\nassert not warmup.preload_modules()")
+        assert seconds < WARM_BUDGET_SECONDS, (
+            f"import + preload took {seconds:.2f}s (budget {WARM_BUDGET_SECONDS}s)"
+        )
+
+
+@pytest.fixture
+def fresh_warmup(monkeypatch):
+    monkeypatch.setattr(warmup, "_task", None)
+    monkeypatch.setattr(warmup, "_ready", False)
+    monkeypatch.setattr(warmup, "_report", {"state": "pending", "steps": {}, "total_ms": None})
+    monkeypatch.setattr(warmup, "WARMUP_ENABLED", True)
+
+
+class TestReadiness:
+    """Tests for warm-up gating /ready."""
+
+    def test_ready_only_after_warmup(self, fresh_warmup, monkeypatch):
+        release = None
+
+        async def slow_step():
+            await release.wait()
+
+        async def failing_step():
+            raise RuntimeError("upstream down")
+
+        monkeypatch.setattr(warmup, "_steps", lambda: [
+            ("modules", slow_step),
+            ("clients", slow_step),
+            ("supabase", failing_step),
+        ])
+
+        async def run():
+            nonlocal release
+            release = asyncio.Event()
+            from main import app
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                warmup.start_warmup()
+                await asyncio.sleep(0)
+                before = await client.get("/ready")
+                release.set()
+                await warmup._task
+                after = await client.get("/ready")
+            return before, after
+
+        before, after = asyncio.run(run())
+        assert before.status_code == 503
+        assert after.status_code == 200
+        steps = after.json()["warmup"]["steps"]
+        assert steps["modules"]["ok"] and steps["clients"]["ok"]
+        # A failed warm-up step is reported but does not block readiness
+        assert steps["supabase"]["ok"] is False
+
+    def test_disabled_warmup_is_ready_immediately(self, fresh_warmup, monkeypatch):
+        monkeypatch.setattr(warmup, "WARMUP_ENABLED", False)
+
+        async def run():
+            warmup.start_warmup()
+
+        asyncio.run(run())
+        assert warmup.is_ready()
+        assert warmup._task is None
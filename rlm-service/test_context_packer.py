@@ -0,0 +1,154 @@
+"""
+Tests for context_packer
+
+Verifies relevance ordering, overlap de-duplication between chunks of the
+same conversation, and token budget enforcement.
+"""
+
+from context_packer import pack_context, _overlap_length
+
+
+def make_text(seed: str, chars: int) -> str:
+    words = []
+    i = 0
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append(f"{seed}{i}")
+        i += 1
+    return " ".join(words)[:chars]
+
+
+class TestOrdering:
+    """Tests for relevance ordering."""
+
+    def test_orders_by_similarity(self):
+        chunks = [
+            {"title": "Low", "content": "low relevance text", "similarity": 0.4},
+            {"title": "High", "content": "high relevance text", "similarity": 0.9},
+        ]
+        context, _ = pack_context(chunks, token_budget=1000)
+        assert context.index("**High**") < context.index("**Low**")
+
+    def test_hybrid_results_order_by_fused_score(self):
+        chunks = [
+            {"title": "Semantic", "content": "similar text", "similarity": 0.7, "rrf_score": 0.016},
+            {"title": "Codename", "content": "Project Bluefin", "similarity": 0.2, "rrf_score": 0.032},
+        ]
+        context, _ = pack_context(chunks, token_budget=1000)
+        assert context.index("**Codename**") < context.index("**Semantic**")
+
+    def test_keeps_format_of_context_block(self):
+        chunks = [{"title": "Trip", "content": "We went to Lisbon.", "similarity": 0.812}]
+        context, _ = pack_context(chunks, token_budget=1000)
+        assert context == "\n---\n**Trip** (relevance: 0.81)\nWe went to Lisbon."
+
+    def test_unscored_chunks_keep_input_order(self):
+        chunks = [
+            {"title": "Newest", "content": "a"},
+            {"title": "Older", "content": "b"},
+        ]
+        context, _ = pack_context(chunks, token_budget=1000)
+        assert context.index("Newest") < context.index("Older")
+
+
+class TestDedup:
+    """Tests for overlap removal within a conversation."""
+
+    def test_overlap_length_finds_suffix_prefix_match(self):
+        shared = make_text("s", 200)
+        earlier = make_text("a", 300) + shared
+        later = shared + make_text("b", 300)
+        assert _overlap_length(earlier, later) == len(shared)
+
+    def test_short_coincidences_are_not_overlap(self):
+        assert _overlap_length("the end. ok", "ok then") == 0
+
+    def test_removes_chunker_overlap_between_neighbours(self):
+        shared = make_text("s", 800)
+        first = make_text("a", 1200) + shared
+        second = shared + make_text("b", 1200)
+        chunks = [
+            {"conversation_id": "c1", "title": "T", "content": first, "similarity": 0.9},
+            {"conversation_id": "c1", "title": "T", "content": second, "similarity": 0.8},
+        ]
+        context, report = pack_context(chunks, token_budget=10000, max_chunk_tokens=10000)
+
+        assert context.count(shared) == 1
+        assert report["tokens_deduped"] == len(shared) // 4
+
+    def test_overlap_removed_when_later_chunk_ranks_higher(self):
+        shared = make_text("s", 800)
+        first = make_text("a", 1200) + shared
+        second = shared + make_text("b", 1200)
+        chunks = [
+            {"conversation_id": "c1", "title": "T", "content": second, "similarity": 0.9},
+            {"conversation_id": "c1", "title": "T", "content": first, "similarity": 0.8},
+        ]
+        context, _ = pack_context(chunks, token_budget=10000, max_chunk_tokens=10000)
+        assert context.count(shared) == 1
+
+    def test_overlap_with_truncated_tail_is_kept(self):
+        # Chunker-sized chunks at the default per-chunk cap: the first chunk's
+        # tail (the shared text) is cut, so the second must still carry it
+        shared = make_text("s", 800)
+        first = make_text("a", 7200) + shared
+        second = shared + make_text("b", 7200)
+        chunks = [
+            {"conversation_id": "c1", "title": "T", "content": first, "similarity": 0.9},
+            {"conversation_id": "c1", "title": "T", "content": second, "similarity": 0.8},
+        ]
+        context, report = pack_context(chunks, token_budget=8000)
+
+        assert context.count(shared) == 1
+        assert report["tokens_deduped"] == 0
+        assert report["chunks_truncated"] == 2
+
+    def test_drops_exact_duplicates(self):
+        text = make_text("x", 400)
+        chunks = [
+            {"conversation_id": "c1", "title": "T", "content": text, "similarity": 0.9},
+            {"conversation_id": "c1", "title": "T", "content": text, "similarity": 0.9},
+        ]
+        _, report = pack_context(chunks, token_budget=10000)
+        assert report["chunks_packed"] == 1
+        assert report["duplicates_removed"] == 1
+
+    def test_other_conversations_are_not_deduped(self):
+        text = make_text("x", 400)
+        chunks = [
+            {"conversation_id": "c1", "title": "T", "content": text, "similarity": 0.9},
+            {"conversation_id": "c2", "title": "T", "content": text, "similarity": 0.9},
+        ]
+        _, report = pack_context(chunks, token_budget=10000)
+        assert report["chunks_packed"] == 2
+
+
+class TestBudget:
+    """Tests for token budget enforcement."""
+
+    def test_stays_within_budget(self):
+        chunks = [
+            {"title": f"T{i}", "content": make_text(f"w{i}_", 2000), "similarity": 0.9 - i * 0.01}
+            for i in range(10)
+        ]
+        context, report = pack_context(chunks, token_budget=1200)
+
+        assert len(context) // 4 <= 1200
+        assert report["tokens_dropped"] > 0
+        assert report["chunks_packed"] + report["chunks_dropped"] == 10
+
+    def test_memory_shares_the_budget(self):
+        chunks = [
+            {"title": f"T{i}", "content": make_text(f"w{i}_", 2000), "similarity": 0.9}
+            for i in range(10)
+        ]
+        _, without_memory = pack_context(chunks, token_budget=4000)
+        _, with_memory = pack_context(chunks, memory_text="m" * 8000, token_budget=4000)
+
+        assert with_memory["memory_tokens"] == 2000
+        assert with_memory["tokens_packed"] < without_memory["tokens_packed"]
+
+    def test_per_chunk_cap_truncates(self):
+        chunks = [{"title": "T", "content": make_text("w", 4000), "similarity": 0.9}]
+        _, report = pack_context(chunks, token_budget=10000, max_chunk_tokens=500)
+        assert report["chunks_truncated"] == 1
+        assert report["tokens_packed"] <= 500
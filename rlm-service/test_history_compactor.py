@@ -0,0 +1,112 @@
+"""
+Tests for history_compactor
+
+Verifies budget-based trimming, per-message capping, the compact RLM
+transcript, and the background rolling summary cache.
+"""
+
+import asyncio
+
+import pytest
+
+import history_compactor
+from history_compactor import compact_history, format_history_for_rlm
+from ttl_cache import TTLCache
+
+
+def turns(count: int, chars: int = 400) -> list:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i}:" + "x" * (chars - 1 - len(str(i)))}
+        for i in range(count)
+    ]
+
+
+class TestCompactHistory:
+    """Tests for token-budget trimming."""
+
+    def test_keeps_newest_messages_within_budget(self):
+        history = turns(20)  # 100 tokens each
+        kept, dropped, report = compact_history(history, token_budget=450)
+
+        assert [m["content"] for m in kept] == [m["content"] for m in history[-4:]]
+        assert dropped == history[:-4]
+        assert report["tokens_kept"] == 400
+        assert report["tokens_dropped"] == 1600
+
+    def test_short_chats_are_kept_whole(self):
+        history = turns(30, chars=40)
+        kept, dropped, _ = compact_history(history, token_budget=3000)
+        assert len(kept) == 30 and dropped == []
+
+    def test_long_paste_is_capped_head_and_tail(self):
+        paste = "START " + "y" * 20000 + " END"
+        kept, _, report = compact_history([{"role": "user", "content": paste}], max_message_tokens=200)
+
+        text = kept[0]["content"]
+        assert text.startswith("START") and text.endswith("END")
+        assert "tokens omitted" in text
+        assert report["tokens_trimmed"] > 4000
+
+    def test_newest_message_is_kept_even_over_budget(self):
+        kept, _, _ = compact_history(turns(3, chars=4000), token_budget=100, max_message_tokens=2000)
+        assert len(kept) == 1
+
+    def test_rlm_transcript_is_compact(self):
+        history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+        assert format_history_for_rlm(history) == "User: hi\nAssistant: hello"
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    calls = []
+
+    async def fake_summarize(previous, messages):
+        calls.append((previous, len(messages)))
+        return f"summary of {len(messages)} (after {previous})"
+
+    monkeypatch.setattr(history_compactor, "_summarize", fake_summarize)
+    monkeypatch.setattr(history_compactor, "HISTORY_SUMMARY", True)
+    monkeypatch.setattr(history_compactor, "HISTORY_SUMMARY_MIN_TOKENS", 0)
+    monkeypatch.setattr(history_compactor, "_summaries", TTLCache(max_size=10, default_ttl=60))
+    monkeypatch.setattr(history_compactor, "_in_flight", {})
+    return calls
+
+
+class TestRollingSummary:
+    """Tests for the cached per-conversation summary."""
+
+    def test_summary_is_built_in_background_then_served(self, summaries):
+        dropped = turns(6)
+
+        async def run():
+            first = history_compactor.get_history_summary("u1", "c1", dropped)
+            await asyncio.gather(*history_compactor._in_flight.values())
+            second = history_compactor.get_history_summary("u1", "c1", dropped)
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert first is None
+        assert second == "summary of 6 (after None)"
+        assert summaries == [(None, 6)]
+
+    def test_summary_extends_incrementally(self, summaries):
+        history = turns(10)
+
+        async def run():
+            history_compactor.get_history_summary("u1", "c1", history[:6])
+            await asyncio.gather(*history_compactor._in_flight.values())
+            stale = history_compactor.get_history_summary("u1", "c1", history[:8])
+            await asyncio.gather(*history_compactor._in_flight.values())
+            return stale
+
+        stale = asyncio.run(run())
+        # The older summary is served while the extension is built
+        assert stale == "summary of 6 (after None)"
+        assert summaries[1] == ("summary of 6 (after None)", 2)
+
+    def test_no_conversation_id_means_no_summary(self, summaries):
+        async def run():
+            return history_compactor.get_history_summary("u1", None, turns(6))
+
+        assert asyncio.run(run()) is None
+        assert summaries == []
@@ -0,0 +1,218 @@
+"""
+Tests for memory_slicer
+
+Verifies MEMORY parsing/rendering, that slicing keeps the core bullets and
+the top-K bullets most similar to the query, and that small, unindexed,
+stale or partially written MEMORY sections are injected whole.
+"""
+
+import asyncio
+
+import pytest
+
+import memory_slicer
+from memory_slicer import parse_memory, render_bullets, slice_memory, memory_hash
+from ttl_cache import TTLCache
+
+
+MEMORY = """# MEMORY
+
+## Preferences
+- Prefers short answers
+- Likes dark mode
+
+## Work
+- Works at Acme as a data engineer
+  on the billing team
+- Ships on Fridays
+
+## Pets
+- Has a dog named Rex
+- No data yet.
+"""
+
+
+def row(bullet, embedding, digest, count):
+    return {**bullet, "memory_hash": digest, "bullet_count": count, "embedding": str(embedding)}
+
+
+@pytest.fixture
+def bullets(monkeypatch):
+    """Reset module state and serve memory_bullets rows for MEMORY."""
+    digest = memory_hash(MEMORY)
+    # One axis per topic: work, pets
+    vectors = {"Preferences": [0.0, 0.0], "Work": [1.0, 0.0], "Pets": [0.0, 1.0]}
+    parsed = parse_memory(MEMORY)
+    rows = [row(b, vectors[b["section"]], digest, len(parsed)) for b in parsed]
+    fetches = []
+
+    async def fake_fetch(user_id):
+        fetches.append(user_id)
+        return [dict(r) for r in rows]
+
+    async def fake_embed_query(text):
+        return [0.0, 1.0] if "dog" in text else [1.0, 0.0]
+
+    import processors.embedding_generator as embedding_generator
+    monkeypatch.setattr(embedding_generator, "embed_query", fake_embed_query)
+    monkeypatch.setattr(memory_slicer, "_fetch_bullets", fake_fetch)
+    monkeypatch.setattr(memory_slicer, "_bullets", TTLCache(max_size=10, default_ttl=60))
+    monkeypatch.setattr(memory_slicer, "_loading", {})
+    monkeypatch.setattr(memory_slicer, "_stats", {k: 0 for k in memory_slicer._stats})
+    monkeypatch.setattr(memory_slicer, "MEMORY_SLICE_MIN_TOKENS", 0)
+    monkeypatch.setattr(memory_slicer, "MEMORY_SLICE_TOP_K", 1)
+    return rows, fetches
+
+
+class TestParseMemory:
+    """Tests for splitting MEMORY into bullets and back."""
+
+    def test_sections_continuations_and_placeholders(self):
+        parsed = parse_memory(MEMORY)
+        assert [(b["section"], b["content"]) for b in parsed] == [
+            ("Preferences", "Prefers short answers"),
+            ("Preferences", "Likes dark mode"),
+            ("Work", "Works at Acme as a data engineer\non the billing team"),
+            ("Work", "Ships on Fridays"),
+            ("Pets", "Has a dog named Rex"),
+        ]
+        assert [b["is_core"] for b in parsed] == [True, True, False, False, False]
+
+    def test_render_groups_by_section_in_original_order(self):
+        parsed = parse_memory(MEMORY)
+        rendered = render_bullets([parsed[4], parsed[0], parsed[3]])
+        assert rendered == (
+            "## Preferences\n- Prefers short answers\n\n"
+            "## Work\n- Ships on Fridays\n\n"
+            "## Pets\n- Has a dog named Rex"
+        )
+
+
+class TestIndexMemory:
+    """Tests for writing memory_bullets."""
+
+    def test_failed_batch_invalidates_and_marks_expected_count(self, bullets, monkeypatch):
+        import processors.embedding_generator as embedding_generator
+
+        posted = []
+
+        class FakeResponse:
+            def __init__(self, status_code):
+                self.status_code = status_code
+                self.text = ""
+
+        class FakeClient:
+            async def delete(self, url, timeout=None):
+                return FakeResponse(204)
+
+            async def post(self, url, json=None, headers=None, timeout=None):
+                posted.append(json)
+                return FakeResponse(201 if len(posted) == 1 else 500)
+
+        async def fake_embed(text, cost_tracker=None):
+            return [1.0, 0.0]
+
+        monkeypatch.setattr(embedding_generator, "embed_text_async", fake_embed)
+        monkeypatch.setattr(memory_slicer, "get_supabase_client", lambda: FakeClient())
+        monkeypatch.setattr(memory_slicer, "INSERT_BATCH_SIZE", 2)
+        memory_slicer._bullets.set("u1", {"hash": memory_hash(MEMORY), "core": [], "others": [], "matrix": None})
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(memory_slicer.index_memory("u1", MEMORY))
+        assert memory_slicer._bullets.get("u1") is None
+        assert [r["bullet_count"] for r in posted[0]] == [5, 5]
+
+
+class TestSliceMemory:
+    """Tests for per-turn slicing and its whole-MEMORY fallbacks."""
+
+    def test_core_plus_most_relevant(self, bullets):
+        _, fetches = bullets
+
+        async def run():
+            return await asyncio.gather(
+                slice_memory("u1", MEMORY, "how is my dog?"),
+                slice_memory("u1", MEMORY, "what do I do for a living?"),
+            )
+
+        (core, pets), (core_again, work) = asyncio.run(run())
+        assert core == core_again == "## Preferences\n- Prefers short answers\n- Likes dark mode"
+        assert pets == "## Pets\n- Has a dog named Rex"
+        assert work.startswith("## Work\n- Works at Acme")
+        assert fetches == ["u1"]  # single-flight, then cached
+        assert memory_slicer._stats["sliced"] == 2
+
+    def test_preload_is_joined_by_slice(self, bullets, monkeypatch):
+        _, fetches = bullets
+        monkeypatch.setattr(memory_slicer, "MEMORY_SLICE_MIN_TOKENS", 10)
+
+        async def run():
+            memory_slicer.preload_memory("u1")
+            memory_slicer.preload_memory("u2", "- tiny")  # too small to slice
+            await asyncio.sleep(0)
+            assert "u1" in memory_slicer._loading
+            return await slice_memory("u1", MEMORY, "how is my dog?")
+
+        _, pets = asyncio.run(run())
+        assert pets == "## Pets\n- Has a dog named Rex"
+        assert fetches == ["u1"]
+
+    def test_stale_bullets_inject_whole_memory(self, bullets):
+        edited = MEMORY + "- Adopted a cat\n"
+        assert asyncio.run(slice_memory("u1", edited, "cat?")) == (edited, None)
+        assert memory_slicer._stats["whole_unindexed"] == 1
+
+    def test_partially_written_bullets_inject_whole_memory(self, bullets):
+        rows, _ = bullets
+        rows.pop()  # the last insert batch never landed
+        assert asyncio.run(slice_memory("u1", MEMORY, "dog?")) == (MEMORY, None)
+        assert memory_slicer._stats["whole_unindexed"] == 1
+
+    def test_unindexed_user_injects_whole_memory(self, bullets):
+        rows, _ = bullets
+        rows.clear()
+        assert asyncio.run(slice_memory("u1", MEMORY, "dog?")) == (MEMORY, None)
+
+    def test_small_memory_is_not_sliced(self, bullets, monkeypatch):
+        _, fetches = bullets
+        monkeypatch.setattr(memory_slicer, "MEMORY_SLICE_MIN_TOKENS", 10_000)
+        assert asyncio.run(slice_memory("u1", MEMORY, "dog?")) == (MEMORY, None)
+        assert fetches == []
+
+    def test_load_failure_injects_whole_memory(self, bullets, monkeypatch):
+        async def failing_fetch(user_id):
+            raise RuntimeError("relation memory_bullets does not exist")
+
+        monkeypatch.setattr(memory_slicer, "_fetch_bullets", failing_fetch)
+        assert asyncio.run(slice_memory("u1", MEMORY, "dog?")) == (MEMORY, None)
+        assert memory_slicer._stats["errors"] == 1
+
+
+class TestScoring:
+    """Tests for the NumPy and pure-Python scoring paths."""
+
+    @pytest.mark.parametrize("use_numpy,thread_min", [(True, 200), (False, 200), (False, 0)])
+    def test_paths_rank_the_same(self, bullets, monkeypatch, use_numpy, thread_min):
+        if not use_numpy:
+            monkeypatch.setattr(memory_slicer, "np", None)
+        monkeypatch.setattr(memory_slicer, "MEMORY_SLICE_THREAD_MIN", thread_min)
+        monkeypatch.setattr(memory_slicer, "MEMORY_SLICE_TOP_K", 2)
+
+        async def run():
+            return await asyncio.gather(
+                slice_memory("u1", MEMORY, "how is my dog?"),
+                slice_memory("u1", MEMORY, "what do I do for a living?"),
+            )
+
+        (_, pets), (_, work) = asyncio.run(run())
+        assert pets.startswith("## Work\n") and pets.endswith("## Pets\n- Has a dog named Rex")
+        assert work == "## Work\n- Works at Acme as a data engineer\non the billing team\n- Ships on Fridays"
+        entry = memory_slicer._bullets.get("u1")
+        assert (entry["matrix"] is not None) == use_numpy
+
+    def test_top_k_is_best_first(self):
+        np = pytest.importorskip("numpy")
+        others = [{"position": i} for i in range(5)]
+        entry = {"others": others, "matrix": np.asarray([[0.1], [0.9], [0.5], [0.7], [0.3]], dtype=np.float32)}
+        assert [b["position"] for b in memory_slicer._top_bullets(entry, [1.0], 3)] == [1, 3, 2]
+        assert [b["position"] for b in memory_slicer._top_bullets(entry, [1.0], 10)] == [1, 3, 2, 4, 0]
@@ -0,0 +1,86 @@
+"""
+Tests for metrics
+
+Verifies stage timing capture, histogram buckets, and Prometheus rendering.
+"""
+
+import asyncio
+
+import metrics
+from metrics import Counter, Histogram, stage, start_timings
+
+
+class TestStageTimers:
+    """Tests for per-request stage timings."""
+
+    def test_records_stage_into_current_timings(self):
+        async def run():
+            timings = start_timings()
+            with stage("test", "embed"):
+                await asyncio.sleep(0.01)
+            return timings
+
+        timings = asyncio.run(run())
+        assert set(timings) == {"embed"}
+        assert timings["embed"] >= 10
+
+    def test_repeated_stage_is_summed(self):
+        async def run():
+            timings = start_timings()
+            for _ in range(2):
+                with stage("test", "llm"):
+                    await asyncio.sleep(0.01)
+            return timings
+
+        assert asyncio.run(run())["llm"] >= 20
+
+    def test_spawned_tasks_share_request_timings(self):
+        async def child():
+            with stage("test", "rlm"):
+                await asyncio.sleep(0)
+
+        async def run():
+            timings = start_timings()
+            await asyncio.create_task(child())
+            return timings
+
+        assert "rlm" in asyncio.run(run())
+
+    def test_stage_recorded_even_on_error(self):
+        before = metrics.STAGE_SECONDS.count(pipeline="test", stage="boom")
+        try:
+            with stage("test", "boom"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+        assert metrics.STAGE_SECONDS.count(pipeline="test", stage="boom") == before + 1
+
+
+class TestRendering:
+    """Tests for Prometheus text output."""
+
+    def test_histogram_buckets_are_cumulative(self):
+        hist = Histogram("h_seconds", "help", buckets=(0.1, 1.0))
+        hist.observe(0.05, stage="a")
+        hist.observe(0.5, stage="a")
+        hist.observe(5.0, stage="a")
+
+        lines = hist.render()
+        assert 'h_seconds_bucket{stage="a",le="0.1"} 1' in lines
+        assert 'h_seconds_bucket{stage="a",le="1.0"} 2' in lines
+        assert 'h_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+        assert 'h_seconds_count{stage="a"} 3' in lines
+
+    def test_counter_labels_are_escaped(self):
+        c = Counter("c_total", "help")
+        c.inc(detail='say "hi"')
+        assert 'c_total{detail="say \\"hi\\""} 1' in c.render()
+
+    def test_collectors_export_numeric_stats_only(self, monkeypatch):
+        monkeypatch.setattr(metrics, "_collectors", [])
+        metrics.register_stats_collector("pool", lambda: {"in_flight": 3, "available": True, "mode": "x"})
+
+        text = metrics.render_prometheus()
+        assert "soulprint_pool_in_flight 3" in text
+        assert "soulprint_pool_available 1" in text
+        assert "soulprint_pool_mode" not in text
@@ -0,0 +1,99 @@
+"""
+Tests for profile_cache
+
+Verifies the ETag protocol: profiles sent in full are cached, a matching
+ETag is served without a fetch, unknown or stale ETags reload from
+user_profiles (single-flight), and invalidation forces a reload.
+"""
+
+import asyncio
+
+import pytest
+
+import profile_cache
+from profile_cache import ProfileUnavailable, resolve_profile, make_profile_etag, invalidate_profile
+from ttl_cache import TTLCache
+
+
+SECTIONS = {"soul": '{"communication_style": "Short"}', "memory": "- Has a dog named Rex"}
+
+
+@pytest.fixture
+def profiles(monkeypatch):
+    """Reset module state and serve user_profiles rows from a dict."""
+    rows = {}
+    fetches = []
+
+    async def fake_fetch(user_id):
+        fetches.append(user_id)
+        await asyncio.sleep(0.01)
+        return dict(rows.get(user_id, {}))
+
+    monkeypatch.setattr(profile_cache, "_fetch_profile", fake_fetch)
+    monkeypatch.setattr(profile_cache, "_profiles", TTLCache(max_size=10, default_ttl=60))
+    monkeypatch.setattr(profile_cache, "_loading", {})
+    monkeypatch.setattr(profile_cache, "_stats", {k: 0 for k in profile_cache._stats})
+    return rows, fetches
+
+
+class TestResolveProfile:
+    """Tests for the ETag protocol."""
+
+    def test_full_profile_is_cached_and_etag_served(self, profiles):
+        _, fetches = profiles
+
+        async def run():
+            first = await resolve_profile("u1", SECTIONS, "text", "Nova", None)
+            second = await resolve_profile("u1", None, None, None, first[3])
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert first[3] == make_profile_etag(SECTIONS, "text", "Nova")
+        assert second == (SECTIONS, "text", "Nova", first[3])
+        assert fetches == []
+
+    def test_unknown_etag_loads_from_user_profiles(self, profiles):
+        rows, fetches = profiles
+        rows["u1"] = {"soul_md": '{"a": 1}', "memory_md": "- m", "soulprint_text": "t", "ai_name": "Echo"}
+
+        async def run():
+            return await asyncio.gather(*(resolve_profile("u1", None, None, None, "stale") for _ in range(5)))
+
+        results = asyncio.run(run())
+        sections, text, ai_name, etag = results[0]
+        assert sections["soul"] == '{"a": 1}' and sections["memory"] == "- m"
+        assert (text, ai_name) == ("t", "Echo")
+        assert etag != "stale"
+        assert fetches == ["u1"]  # single-flight
+        assert all(result == results[0] for result in results)
+
+    def test_invalidation_forces_reload(self, profiles):
+        rows, fetches = profiles
+        rows["u1"] = {"memory_md": "- old"}
+
+        async def run():
+            _, _, _, etag = await resolve_profile("u1", None, None, None, "")
+            rows["u1"] = {"memory_md": "- new"}
+            invalidate_profile("u1", "full pass complete")
+            return etag, await resolve_profile("u1", None, None, None, etag)
+
+        old_etag, (sections, _, _, new_etag) = asyncio.run(run())
+        assert sections["memory"] == "- new"
+        assert new_etag != old_etag
+        assert len(fetches) == 2
+
+    def test_legacy_request_without_profile_or_etag(self, profiles):
+        _, fetches = profiles
+        result = asyncio.run(resolve_profile("u1", None, None, "Nova", None))
+        assert result == (None, None, "Nova", None)
+        assert fetches == []
+
+    def test_load_failure_asks_client_to_resend_profile(self, profiles, monkeypatch):
+        async def failing_fetch(user_id):
+            raise RuntimeError("supabase down")
+
+        monkeypatch.setattr(profile_cache, "_fetch_profile", failing_fetch)
+        with pytest.raises(ProfileUnavailable) as info:
+            asyncio.run(resolve_profile("u1", None, None, "Nova", "etag"))
+        assert info.value.status_code == 409
+        assert profile_cache._stats["load_failures"] == 1
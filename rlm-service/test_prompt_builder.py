@@ -0,0 +1,208 @@
+"""
+Tests for PromptBuilder
+
+Verifies the cacheable prefix/suffix split carries exactly the content of the
+canonical emotionally intelligent prompt, with only the date line moved,
+that memoized personas never leak across profiles or requests, and that the
+section budgeter trims lowest-priority sections first.
+"""
+
+import json
+
+import pytest
+
+import prompt_builder
+from prompt_builder import PromptBuilder, VALID_VERSIONS, fit_sections
+from ttl_cache import TTLCache
+
+
+DATE = "Monday, January 05, 2026"
+TIME = "3:04 PM UTC"
+DATE_LINE = f"\n\nToday is {DATE}, {TIME}."
+
+PROFILE = {
+    "soulprint_text": "About this person",
+    "soul_md": json.dumps({"personality_traits": ["curious", "dry"], "communication_style": "Short and direct"}),
+    "identity_md": json.dumps({"archetype": "The Builder", "vibe": "Calm"}),
+    "user_md": json.dumps({"name": "Sam", "interests": ["golf"]}),
+    "agents_md": json.dumps({"behavioral_rules": ["Be honest"], "response_style": "Brief"}),
+    "tools_md": json.dumps({"output_preferences": "Bullets"}),
+    "memory_md": "- Has a dog named Rex",
+}
+
+
+def build_kwargs(**overrides):
+    kwargs = dict(
+        profile=PROFILE,
+        ai_name="Nova",
+        memory_context="\n---\n**Trip** (relevance: 0.90)\nWent to Lisbon",
+        web_search_context="Rain expected",
+        current_date=DATE,
+        current_time=TIME,
+        emotional_state={"primary": "confused", "confidence": 0.9, "cues": []},
+        relationship_arc={"stage": "developing", "messageCount": 40},
+    )
+    kwargs.update(overrides)
+    return kwargs
+
+
+def system_kwargs(**overrides):
+    kwargs = build_kwargs(**overrides)
+    del kwargs["emotional_state"], kwargs["relationship_arc"]
+    return kwargs
+
+
+class TestCacheablePrompt:
+    """Tests for build_cacheable_prompt."""
+
+    @pytest.mark.parametrize("version", VALID_VERSIONS)
+    def test_split_matches_canonical_prompt(self, version):
+        builder = PromptBuilder(version)
+        canonical = builder.build_emotionally_intelligent_prompt(**build_kwargs())
+        prefix, suffix = builder.build_cacheable_prompt(**build_kwargs())
+
+        assert suffix.startswith(f"Today is {DATE}")
+        assert (prefix + "\n\n" + suffix).replace(DATE_LINE, "") == canonical.replace(DATE_LINE, "")
+
+    @pytest.mark.parametrize("version", VALID_VERSIONS)
+    def test_prefix_is_stable_across_turns(self, version):
+        builder = PromptBuilder(version)
+        first, _ = builder.build_cacheable_prompt(**build_kwargs())
+        second, _ = builder.build_cacheable_prompt(**build_kwargs(
+            memory_context="other context",
+            web_search_context=None,
+            current_date="Tuesday, January 06, 2026",
+            emotional_state=None,
+        ))
+
+        assert first == second
+        assert "## MEMORY\n- Has a dog named Rex" in first
+        assert "Lisbon" not in first
+
+    @pytest.mark.parametrize("version", VALID_VERSIONS)
+    def test_memory_slice_goes_in_the_suffix(self, version):
+        builder = PromptBuilder(version)
+        plain, _ = builder.build_cacheable_prompt(**build_kwargs())
+        prefix, suffix = builder.build_cacheable_prompt(**build_kwargs(memory_slice="## Pets\n- Rex is a beagle"))
+
+        assert prefix == plain
+        assert suffix.index("## RELEVANT MEMORY\n## Pets\n- Rex is a beagle") < suffix.index("## CONTEXT")
+
+    def test_imposter_mode_is_not_cached(self):
+        builder = PromptBuilder("v1-technical")
+        canonical = builder.build_emotionally_intelligent_prompt(**build_kwargs(is_owner=False))
+        prefix, suffix = builder.build_cacheable_prompt(**build_kwargs(is_owner=False))
+
+        assert prefix == ""
+        assert suffix == canonical
+
+
+@pytest.fixture
+def persona_cache(monkeypatch):
+    cache = TTLCache(max_size=10, default_ttl=60)
+    monkeypatch.setattr(prompt_builder, "PERSONA_CACHE_ENABLED", True)
+    monkeypatch.setattr(prompt_builder, "_persona_cache", cache)
+    return cache
+
+
+class TestPersonaCache:
+    """Tests for the compiled persona cache."""
+
+    @pytest.mark.parametrize("version", VALID_VERSIONS)
+    def test_cached_prompt_matches_uncached(self, version, persona_cache, monkeypatch):
+        builder = PromptBuilder(version)
+        daily = [{"category": "health", "fact": "Ran 10k"}]
+        first = builder.build_emotionally_intelligent_prompt(**build_kwargs(daily_memory=daily))
+        second = builder.build_emotionally_intelligent_prompt(**build_kwargs(daily_memory=daily))
+
+        monkeypatch.setattr(prompt_builder, "PERSONA_CACHE_ENABLED", False)
+        uncached = builder.build_emotionally_intelligent_prompt(**build_kwargs(daily_memory=daily))
+
+        assert first == second == uncached
+        assert persona_cache.hits == 1 and persona_cache.misses == 1
+
+    def test_profile_edit_recompiles(self, persona_cache):
+        builder = PromptBuilder("v1-technical")
+        builder.build_system_prompt(**system_kwargs())
+        edited = {**PROFILE, "memory_md": "- Adopted a cat named Miso"}
+        prompt = builder.build_system_prompt(**system_kwargs(profile=edited))
+
+        assert "Miso" in prompt and "Rex" not in prompt
+        assert len(persona_cache) == 2
+
+    def test_ai_name_and_version_are_part_of_the_key(self, persona_cache):
+        nova = PromptBuilder("v3-openclaw").build_system_prompt(**system_kwargs())
+        echo = PromptBuilder("v3-openclaw").build_system_prompt(**system_kwargs(ai_name="Echo"))
+        PromptBuilder("v1-technical").build_system_prompt(**system_kwargs())
+
+        assert nova.startswith("# Nova") and echo.startswith("# Echo")
+        assert len(persona_cache) == 3
+
+    def test_daily_memory_is_not_cached(self, persona_cache):
+        builder = PromptBuilder("v2-natural-voice")
+        with_fact = builder.build_system_prompt(**system_kwargs(
+            daily_memory=[{"category": "work", "fact": "Shipped v2"}],
+        ))
+        without = builder.build_system_prompt(**system_kwargs())
+
+        assert "Shipped v2" in with_fact
+        assert "DAILY MEMORY" not in without
+
+
+def lines(prefix, count, chars=80):
+    return "\n".join(f"{prefix} {i} " + "z" * chars for i in range(count))
+
+
+class TestSectionBudget:
+    """Tests for fit_sections and the PROMPT_TOKEN_BUDGET ceiling."""
+
+    def test_under_budget_is_untouched(self):
+        sections = {"context": lines("c", 10), "memory": lines("m", 10)}
+        fitted, report = fit_sections(sections, fixed_tokens=500, token_budget=10000)
+        assert fitted is sections
+        assert report["trimmed"] == {}
+
+    def test_lowest_priority_is_trimmed_first(self):
+        sections = {
+            "context": lines("c", 200),       # ~4300 tokens
+            "web_search": lines("w", 40),     # ~900 tokens
+            "daily_memory": [],
+            "about": "",
+            "memory": lines("m", 100),        # ~2100 tokens
+        }
+        fitted, report = fit_sections(sections, fixed_tokens=1000, token_budget=4800)
+
+        assert set(report["trimmed"]) == {"context", "web_search"}
+        assert fitted["memory"] == sections["memory"]
+        assert fitted["context"].startswith("c 0 ") and "c 199" not in fitted["context"]
+        assert report["tokens_out"] <= 4800
+
+    def test_memory_is_cut_last_and_budget_is_met(self):
+        sections = {
+            "context": lines("c", 200),
+            "web_search": "",
+            "daily_memory": [{"category": "work", "fact": "x" * 200} for _ in range(20)],
+            "about": "",
+            "memory": lines("m", 400),
+        }
+        fitted, report = fit_sections(sections, fixed_tokens=1000, token_budget=4000)
+
+        assert list(report["trimmed"]) == ["context", "daily_memory", "memory"]
+        assert report["tokens_out"] <= 4000
+        assert fitted["memory"].startswith("m 0 ")
+        # Whole lines / facts only
+        assert all(line.startswith("m ") for line in fitted["memory"].split("\n"))
+
+    @pytest.mark.parametrize("version", VALID_VERSIONS)
+    def test_every_version_fits_the_budget(self, version, monkeypatch):
+        monkeypatch.setattr(prompt_builder, "PROMPT_TOKEN_BUDGET", 3000)
+        builder = PromptBuilder(version)
+        prompt = builder.build_emotionally_intelligent_prompt(**build_kwargs(
+            profile={**PROFILE, "memory_md": lines("- fact", 300)},
+            memory_context=lines("chunk", 300),
+        ))
+
+        report = builder.last_budget_report
+        assert report["tokens_out"] <= 3000
+        assert len(prompt) // 4 <= 3000 + 50  # estimate vs. section headers
+        assert "## MEMORY\n- fact 0" in prompt and "## CONTEXT\nchunk 0" in prompt
@@ -0,0 +1,398 @@
+"""
+Tests for the /query answer paths in main
+
+Verifies that the direct and streaming fallbacks send the same prompt and
+run the same tool loop, that hedging races a slow RLM call against the
+fallback and cancels the loser, that the recent-chunks fallback is only
+fetched for slow or failed semantic searches, and that a profile reload
+overlaps retrieval.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import main
+import retrieval_cache
+
+
+PROMPT_KWARGS = dict(
+    conversation_context="\n---\n**Trip** (relevance: 0.90)\nWent to Lisbon",
+    soulprint_text="About this person",
+    history=[{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hey"}],
+    ai_name="Nova",
+    web_search_context=None,
+)
+
+
+def text_turn(text):
+    return SimpleNamespace(
+        stop_reason="end_turn",
+        content=[SimpleNamespace(type="text", text=text)],
+        usage=None,
+    )
+
+
+def tool_turn(*queries):
+    return SimpleNamespace(
+        stop_reason="tool_use",
+        content=[
+            SimpleNamespace(type="tool_use", id=f"tool-{i}", name="web_search", input={"query": q})
+            for i, q in enumerate(queries)
+        ],
+        usage=None,
+    )
+
+
+class FakeStream:
+    def __init__(self, response):
+        self._response = response
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        for block in self._response.content:
+            if block.type == "text":
+                yield block.text
+
+    async def get_final_message(self):
+        return self._response
+
+
+class FakeMessages:
+    """Replays scripted model turns and records every request."""
+
+    def __init__(self, turns):
+        self._turns = list(turns)
+        self.requests = []
+
+    def _next(self, kwargs):
+        # Snapshot: the fallback extends messages in place between rounds
+        self.requests.append({**kwargs, "messages": list(kwargs["messages"])})
+        return self._turns.pop(0)
+
+    async def create(self, **kwargs):
+        return self._next(kwargs)
+
+    def stream(self, **kwargs):
+        return FakeStream(self._next(kwargs))
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Install a fake Anthropic client and web search; returns a factory for scripted turns."""
+    searches = []
+
+    async def fake_search(query):
+        searches.append(query)
+        return f"results for {query}"
+
+    def install(*turns):
+        messages = FakeMessages(turns)
+        monkeypatch.setattr(main, "get_anthropic_client", lambda: SimpleNamespace(messages=messages))
+        return messages
+
+    monkeypatch.setattr(main, "execute_web_search", fake_search)
+    # Pin the prompt's date line so requests compare equal across a minute boundary
+    monkeypatch.setattr(
+        main.PromptBuilder, "_resolve_date_time",
+        staticmethod(lambda date, time: ("Monday, January 05, 2026", "3:04 PM UTC")),
+    )
+    monkeypatch.setattr(main, "record_usage", lambda usage: None)
+    return install, searches
+
+
+def run_stream(message, **kwargs):
+    async def collect():
+        return "".join([text async for text in main.query_fallback_stream(message, **kwargs)])
+
+    return asyncio.run(collect())
+
+
+class TestFallbackToolLoop:
+    """Tests for the shared fallback request and tool loop."""
+
+    def test_tool_calls_over_the_limit_are_skipped(self, model, monkeypatch):
+        install, searches = model
+        monkeypatch.setattr(main, "WEB_SEARCH_MAX_CONCURRENCY", 2)
+        messages = install(tool_turn("a", "b", "c"), text_turn("Done."))
+
+        assert asyncio.run(main.query_fallback("search?", **PROMPT_KWARGS)) == "Done."
+        assert sorted(searches) == ["a", "b"]
+        results = messages.requests[1]["messages"][-1]["content"]
+        assert [r["tool_use_id"] for r in results] == ["tool-0", "tool-1", "tool-2"]
+        assert results[2]["content"].startswith("[Skipped")
+
+    def test_stream_and_direct_send_identical_requests(self, model):
+        install, searches = model
+        turns = [tool_turn("weather lisbon", "news"), text_turn("Sunny.")]
+
+        direct = install(*turns)
+        answer = asyncio.run(main.query_fallback("weather?", **PROMPT_KWARGS))
+        streamed = install(*turns)
+        streamed_answer = run_stream("weather?", **PROMPT_KWARGS)
+
+        assert answer == streamed_answer == "Sunny."
+        assert direct.requests == streamed.requests
+        assert sorted(searches) == ["news", "news", "weather lisbon", "weather lisbon"]
+
+        second = direct.requests[1]["messages"]
+        assert [m["role"] for m in second] == ["user", "assistant", "user", "assistant", "user"]
+        assert [r["tool_use_id"] for r in second[-1]["content"]] == ["tool-0", "tool-1"]
+
+    def test_tool_rounds_are_capped(self, model):
+        install, searches = model
+        turns = [tool_turn(f"q{i}") for i in range(main.MAX_TOOL_ROUNDS + 1)]
+
+        direct = install(*turns)
+        asyncio.run(main.query_fallback("loop?", **PROMPT_KWARGS))
+        streamed = install(*turns)
+        run_stream("loop?", **PROMPT_KWARGS)
+
+        assert len(direct.requests) == len(streamed.requests) == main.MAX_TOOL_ROUNDS + 1
+        assert len(searches) == 2 * main.MAX_TOOL_ROUNDS
+
+
+@pytest.fixture
+def hedge(monkeypatch):
+    """Scripted RLM and fallback answers; returns the list of cancelled paths."""
+    cancelled = []
+    alerts = []
+
+    def install(rlm_delay, rlm_result, fallback_delay=0.0, hedge_delay_ms=50):
+        async def scripted(name, delay, result):
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        async def fake_rlm(message, **kwargs):
+            return await scripted("rlm", rlm_delay, rlm_result)
+
+        async def fake_fallback(message, **kwargs):
+            return await scripted("fallback", fallback_delay, "fallback answer")
+
+        monkeypatch.setattr(main, "query_with_rlm", fake_rlm)
+        monkeypatch.setattr(main, "query_fallback", fake_fallback)
+        monkeypatch.setattr(main, "RLM_HEDGE_DELAY_MS", hedge_delay_ms)
+
+    monkeypatch.setattr(main, "alert_failure", lambda *args: alerts.append(args))
+    monkeypatch.setattr(main, "_hedge_stats", {k: 0 for k in main._hedge_stats})
+    return install, cancelled, alerts
+
+
+def answer():
+    async def run():
+        result = await main.answer_query("u1", "hi")
+        await asyncio.sleep(0.01)  # let cancellations land
+        return result
+
+    return asyncio.run(run())
+
+
+class TestHedging:
+    """Tests for answer_query's RLM/fallback race."""
+
+    def test_fast_rlm_is_not_hedged(self, hedge):
+        install, cancelled, _ = hedge
+        install(rlm_delay=0.0, rlm_result="rlm answer")
+
+        assert answer() == ("rlm answer", "rlm")
+        assert main._hedge_stats["hedged"] == 0
+        assert cancelled == []
+
+    def test_slow_rlm_is_hedged_and_cancelled(self, hedge):
+        install, cancelled, _ = hedge
+        install(rlm_delay=1.0, rlm_result="rlm answer", fallback_delay=0.01)
+
+        assert answer() == ("fallback answer", "fallback")
+        assert main._hedge_stats["hedged"] == 1
+        assert main._hedge_stats["wins_fallback"] == 1
+        assert cancelled == ["rlm"]
+
+    def test_rlm_winning_the_race_cancels_fallback(self, hedge):
+        install, cancelled, _ = hedge
+        install(rlm_delay=0.08, rlm_result="rlm answer", fallback_delay=1.0)
+
+        assert answer() == ("rlm answer", "rlm")
+        assert main._hedge_stats["hedged"] == 1
+        assert cancelled == ["fallback"]
+
+    def test_rlm_failure_while_hedged_waits_for_fallback(self, hedge):
+        install, cancelled, alerts = hedge
+        install(rlm_delay=0.08, rlm_result=RuntimeError("rlm down"), fallback_delay=0.1)
+
+        assert answer() == ("fallback answer", "fallback")
+        assert main._hedge_stats["rlm_failures"] == 1
+        assert len(alerts) == 1
+        assert cancelled == []
+
+    def test_without_hedging_fallback_runs_only_after_failure(self, hedge):
+        install, _, alerts = hedge
+        install(rlm_delay=0.05, rlm_result=RuntimeError("rlm down"), hedge_delay_ms=0)
+
+        assert answer() == ("fallback answer", "fallback")
+        assert main._hedge_stats["hedged"] == 0
+        assert len(alerts) == 1
+
+
+@pytest.fixture
+def search(monkeypatch):
+    """Scripted embed + RPC timings; returns the list of fallback fetches."""
+    fetches = []
+
+    async def fake_fallback_fetch(user_id, recent_only=False):
+        fetches.append(user_id)
+        return [{"title": "Recent", "content": "latest chat"}]
+
+    def install(rpc_delay=0.0, embed_error=None):
+        async def fake_embed(text):
+            if embed_error:
+                raise embed_error
+            return [0.1, 0.2]
+
+        async def fake_rpc(user_id, query_embedding, match_count, threshold):
+            await asyncio.sleep(rpc_delay)
+            return SimpleNamespace(status_code=200, json=lambda: [{"title": "Match", "content": "x"}])
+
+        import processors.embedding_generator as embedding_generator
+        monkeypatch.setattr(embedding_generator, "embed_query", fake_embed)
+        monkeypatch.setattr(main, "_match_chunks_vector", fake_rpc)
+
+    monkeypatch.setattr(main, "get_conversation_chunks", fake_fallback_fetch)
+    monkeypatch.setattr(main, "RETRIEVAL_MODE", "vector")
+    monkeypatch.setattr(main, "VECTOR_INDEX_MODE", "off")
+    monkeypatch.setattr(main, "PREFETCH_FALLBACK_CHUNKS", True)
+    monkeypatch.setattr(main, "PREFETCH_FALLBACK_DELAY_MS", 50)
+    monkeypatch.setattr(retrieval_cache, "_user_caches", retrieval_cache.OrderedDict())
+    return install, fetches
+
+
+def semantic_search():
+    async def run():
+        started = asyncio.get_running_loop().time()
+        chunks = await main.search_chunks_semantic("u1", "what did I say about Lisbon?")
+        elapsed = asyncio.get_running_loop().time() - started
+        await asyncio.sleep(0.1)  # a leaked prefetch would fire here
+        return chunks, elapsed
+
+    return asyncio.run(run())
+
+
+class TestFallbackPrefetch:
+    """Tests for the delayed recent-chunks prefetch."""
+
+    def test_fast_search_never_fetches_fallback(self, search):
+        install, fetches = search
+        install(rpc_delay=0.0)
+
+        chunks, _ = semantic_search()
+        assert chunks[0]["title"] == "Match"
+        assert fetches == []
+
+    def test_slow_search_prefetches_fallback(self, search):
+        install, fetches = search
+        install(rpc_delay=0.15)
+
+        chunks, _ = semantic_search()
+        assert chunks[0]["title"] == "Match"
+        assert fetches == ["u1"]
+
+    def test_early_failure_fetches_fallback_without_waiting(self, search, monkeypatch):
+        install, fetches = search
+        monkeypatch.setattr(main, "PREFETCH_FALLBACK_DELAY_MS", 5000)
+        install(embed_error=RuntimeError("bedrock down"))
+
+        chunks, elapsed = semantic_search()
+        assert chunks[0]["title"] == "Recent"
+        assert fetches == ["u1"]
+        assert elapsed < 1
+
+
+class TestLocalIndexRouting:
+    """Tests for when primary-mode local search replaces the RPC."""
+
+    @pytest.mark.parametrize("mode,served_by", [("vector", "local"), ("hybrid", "hybrid")])
+    def test_hybrid_retrieval_keeps_the_rpc(self, search, monkeypatch, mode, served_by):
+        install, _ = search
+        install()
+
+        async def fake_local(user_id, query_embedding, match_count, threshold):
+            return [{"title": "local", "content": "x"}]
+
+        async def fake_hybrid(user_id, query, query_embedding, match_count, threshold):
+            return SimpleNamespace(status_code=200, json=lambda: [{"title": "hybrid", "content": "x"}])
+
+        monkeypatch.setattr(main, "VECTOR_INDEX_MODE", "primary")
+        monkeypatch.setattr(main, "RETRIEVAL_MODE", mode)
+        monkeypatch.setattr(main, "note_query", lambda user_id: None)
+        monkeypatch.setattr(main, "vector_index_loaded", lambda user_id: True)
+        monkeypatch.setattr(main, "local_vector_search", fake_local)
+        monkeypatch.setattr(main, "_match_chunks_hybrid", fake_hybrid)
+
+        chunks, _ = semantic_search()
+        assert chunks[0]["title"] == served_by
+
+
+@pytest.fixture
+def slow(monkeypatch):
+    """Profile load and retrieval that each take 0.1 s; records preloads and cancelled retrievals."""
+    cancelled = []
+
+    async def fake_resolve(user_id, sections, soulprint_text, ai_name, profile_etag):
+        await asyncio.sleep(0.1)
+        if profile_etag == "lost":
+            raise main.ProfileUnavailable(user_id)
+        return {"soul": "x"}, "About", ai_name, "etag-1"
+
+    async def fake_search(user_id, query, match_count=8, threshold=0.3):
+        try:
+            await asyncio.sleep(0.1 if query != "slow" else 1.0)
+        except asyncio.CancelledError:
+            cancelled.append(user_id)
+            raise
+        return [{"title": "Match", "content": "x"}]
+
+    monkeypatch.setattr(main, "resolve_profile", fake_resolve)
+    monkeypatch.setattr(main, "search_chunks_semantic", fake_search)
+    monkeypatch.setattr(main, "preload_memory", lambda user_id, memory_md=None: cancelled.append(("preload", memory_md)))
+    return cancelled
+
+
+class TestProfileAndChunks:
+    """Tests for resolving the profile alongside retrieval."""
+
+    def test_profile_load_overlaps_retrieval(self, slow):
+        request = main.QueryRequest(user_id="u1", message="hi", profile_etag="etag-0")
+
+        async def run():
+            started = asyncio.get_running_loop().time()
+            result = await main._profile_and_chunks(request)
+            return result, asyncio.get_running_loop().time() - started
+
+        (profile, chunks), elapsed = asyncio.run(run())
+        assert profile[3] == "etag-1"
+        assert chunks[0]["title"] == "Match"
+        assert elapsed < 0.18
+        assert slow == [("preload", None)]  # MEMORY bullets load alongside too
+
+    def test_profile_failure_cancels_retrieval(self, slow):
+        request = main.QueryRequest(user_id="u1", message="slow", profile_etag="lost")
+
+        async def run():
+            with pytest.raises(main.ProfileUnavailable):
+                await main._profile_and_chunks(request)
+            await asyncio.sleep(0)
+
+        asyncio.run(run())
+        assert slow == [("preload", None), "u1"]
@@ -0,0 +1,125 @@
+"""
+Tests for retrieval_cache
+
+Verifies that cached retrievals are served until the user's chunks change,
+that invalidation (full pass complete, chunks deleted) drops them, and that
+the per-user and user-count caps evict least recently used entries.
+"""
+
+import asyncio
+from collections import OrderedDict
+
+import pytest
+
+import retrieval_cache
+from retrieval_cache import make_retrieval_key, get_cached_chunks, cache_chunks, invalidate_user
+
+
+CHUNKS = [{"id": "c1", "title": "Trip", "content": "Went to Lisbon", "similarity": 0.9}]
+
+
+@pytest.fixture(autouse=True)
+def cache_state(monkeypatch):
+    """Start every test with an empty cache and zeroed counters."""
+    monkeypatch.setattr(retrieval_cache, "_user_caches", OrderedDict())
+    monkeypatch.setattr(retrieval_cache, "_stats", {k: 0 for k in retrieval_cache._stats})
+
+
+class TestKeys:
+    """Tests for make_retrieval_key."""
+
+    def test_same_query_same_key(self):
+        assert make_retrieval_key([0.1, 0.2], 8, 0.3) == make_retrieval_key([0.1, 0.2], 8, 0.3)
+
+    def test_parameters_and_text_are_part_of_the_key(self):
+        base = make_retrieval_key([0.1, 0.2], 8, 0.3)
+        assert make_retrieval_key([0.1, 0.2], 5, 0.3) != base
+        assert make_retrieval_key([0.1, 0.2], 8, 0.5) != base
+        assert make_retrieval_key([0.1, 0.2], 8, 0.3, "Bluefin") != base
+        assert make_retrieval_key([0.1, 0.2], 8, 0.3, "  bluefin ") == make_retrieval_key([0.1, 0.2], 8, 0.3, "Bluefin")
+
+
+class TestInvalidation:
+    """Tests for dropping stale retrievals when chunks change."""
+
+    def test_hit_until_invalidated(self):
+        key = make_retrieval_key([0.1, 0.2], 8, 0.3)
+        cache_chunks("u1", key, CHUNKS)
+        assert get_cached_chunks("u1", key) == CHUNKS
+
+        invalidate_user("u1", "full pass complete")
+        assert get_cached_chunks("u1", key) is None
+        assert retrieval_cache._stats["invalidations"] == 1
+
+    def test_invalidation_is_per_user(self):
+        key = make_retrieval_key([0.1, 0.2], 8, 0.3)
+        cache_chunks("u1", key, CHUNKS)
+        cache_chunks("u2", key, CHUNKS)
+
+        invalidate_user("u1")
+        assert get_cached_chunks("u1", key) is None
+        assert get_cached_chunks("u2", key) == CHUNKS
+
+    def test_deleting_chunks_invalidates(self, monkeypatch):
+        import processors.full_pass as full_pass
+
+        class FakeResponse:
+            status_code = 204
+            text = ""
+
+        class FakeClient:
+            async def delete(self, url, timeout=None):
+                return FakeResponse()
+
+        monkeypatch.setattr(full_pass, "get_supabase_client", lambda: FakeClient())
+        key = make_retrieval_key([0.1, 0.2], 8, 0.3)
+        cache_chunks("u1", key, CHUNKS)
+
+        asyncio.run(full_pass.delete_user_chunks("u1"))
+        assert get_cached_chunks("u1", key) is None
+
+    def test_failed_delete_keeps_cache(self, monkeypatch):
+        import processors.full_pass as full_pass
+
+        class FakeResponse:
+            status_code = 500
+            text = "boom"
+
+        class FakeClient:
+            async def delete(self, url, timeout=None):
+                return FakeResponse()
+
+        monkeypatch.setattr(full_pass, "get_supabase_client", lambda: FakeClient())
+        key = make_retrieval_key([0.1, 0.2], 8, 0.3)
+        cache_chunks("u1", key, CHUNKS)
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(full_pass.delete_user_chunks("u1"))
+        assert get_cached_chunks("u1", key) == CHUNKS
+
+
+class TestCaps:
+    """Tests for the memory caps."""
+
+    def test_user_cap_evicts_least_recently_active(self, monkeypatch):
+        monkeypatch.setattr(retrieval_cache, "RETRIEVAL_CACHE_MAX_USERS", 2)
+        key = make_retrieval_key([0.1, 0.2], 8, 0.3)
+        cache_chunks("u1", key, CHUNKS)
+        cache_chunks("u2", key, CHUNKS)
+        get_cached_chunks("u1", key)  # u1 is now most recently active
+        cache_chunks("u3", key, CHUNKS)
+
+        assert get_cached_chunks("u2", key) is None
+        assert get_cached_chunks("u1", key) == CHUNKS
+        assert get_cached_chunks("u3", key) == CHUNKS
+        assert retrieval_cache._stats["user_evictions"] == 1
+
+    def test_per_user_cap_evicts_oldest_query(self, monkeypatch):
+        monkeypatch.setattr(retrieval_cache, "RETRIEVAL_CACHE_MAX_ENTRIES_PER_USER", 2)
+        keys = [make_retrieval_key([float(i)], 8, 0.3) for i in range(3)]
+        for key in keys:
+            cache_chunks("u1", key, CHUNKS)
+
+        assert get_cached_chunks("u1", keys[0]) is None
+        assert get_cached_chunks("u1", keys[2]) == CHUNKS
+        assert retrieval_cache.get_retrieval_cache_stats()["entries"] == 2
@@ -0,0 +1,130 @@
+"""
+Tests for rlm_pool
+
+Verifies completions run off the event loop, that a call past its deadline
+releases the caller at once while the instance rejoins the pool when its
+worker thread finishes, and that a missing rlm library disables the path.
+"""
+
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import rlm_pool
+from rlm_pool import RLMUnavailable, rlm_completion, start_rlm_pool, shutdown_rlm_pool
+
+
+class FakeRLM:
+    """Blocking completion that takes `delay` seconds, like rlm.RLM.completion."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.finished = threading.Event()
+
+    def completion(self, context):
+        self.calls += 1
+        time.sleep(self.delay)
+        self.finished.set()
+        return SimpleNamespace(response=f"answer to {context}", execution_time=self.delay)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Start a one-instance pool of FakeRLM; returns the instance."""
+    instance = FakeRLM()
+    monkeypatch.setattr(rlm_pool, "RLM_POOL_SIZE", 1)
+    monkeypatch.setattr(rlm_pool, "_build_instances", lambda count: [instance])
+    monkeypatch.setattr(rlm_pool, "_start_lock", None)
+    monkeypatch.setattr(rlm_pool, "_stats", {**rlm_pool._stats, "completions": 0, "timeouts": 0, "in_flight": 0})
+    shutdown_rlm_pool()
+    yield instance
+    shutdown_rlm_pool()
+
+
+class TestCompletion:
+    """Tests for checkout, deadline and release."""
+
+    def test_completion_returns_instance(self, pool):
+        async def run():
+            await start_rlm_pool()
+            first = await rlm_completion("a")
+            second = await rlm_completion("b")
+            return first, second, rlm_pool._idle.qsize()
+
+        assert asyncio.run(run()) == ("answer to a", "answer to b", 1)
+        assert rlm_pool._stats["completions"] == 2
+
+    def test_event_loop_keeps_running_during_completion(self, pool):
+        pool.delay = 0.2
+
+        async def run():
+            await start_rlm_pool()
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            await rlm_completion("slow")
+            task.cancel()
+            return ticks
+
+        assert asyncio.run(run()) >= 5
+
+    def test_timeout_releases_caller_and_instance_returns_later(self, pool):
+        pool.delay = 0.3
+
+        async def run():
+            await start_rlm_pool()
+            started = time.perf_counter()
+            with pytest.raises(asyncio.TimeoutError):
+                await rlm_completion("slow", timeout=0.05)
+            waited = time.perf_counter() - started
+            idle_after_timeout = rlm_pool._idle.qsize()
+
+            # The worker thread can't be interrupted; the instance comes back when it finishes
+            await asyncio.to_thread(pool.finished.wait, 2)
+            await asyncio.sleep(0.05)
+            pool.delay = 0.0
+            answer = await rlm_completion("next", timeout=1)
+            return waited, idle_after_timeout, answer
+
+        waited, idle_after_timeout, answer = asyncio.run(run())
+        assert waited < 0.25
+        assert idle_after_timeout == 0
+        assert answer == "answer to next"
+        assert rlm_pool._stats["timeouts"] == 1
+
+    def test_checkout_times_out_when_pool_is_busy(self, pool):
+        pool.delay = 0.3
+
+        async def run():
+            await start_rlm_pool()
+            busy = asyncio.create_task(rlm_completion("busy"))
+            await asyncio.sleep(0.02)
+            with pytest.raises(asyncio.TimeoutError):
+                await rlm_completion("waiting", timeout=0.05)
+            return await busy
+
+        assert asyncio.run(run()) == "answer to busy"
+        assert pool.calls == 1
+
+    def test_missing_library_marks_pool_unavailable(self, monkeypatch, pool):
+        def no_rlm(count):
+            raise ImportError("No module named 'rlm'")
+
+        monkeypatch.setattr(rlm_pool, "_build_instances", no_rlm)
+
+        async def run():
+            assert await start_rlm_pool() is False
+            with pytest.raises(RLMUnavailable):
+                await rlm_completion("a")
+
+        asyncio.run(run())
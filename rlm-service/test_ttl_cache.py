@@ -0,0 +1,107 @@
+"""
+Tests for TTLCache
+
+Verifies TTL expiry, LRU eviction order, and hit/miss accounting.
+"""
+
+import pytest
+
+import ttl_cache
+from ttl_cache import TTLCache
+
+
+class FakeClock:
+    """Controllable replacement for time.monotonic()."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ttl_cache.time, "monotonic", fake)
+    return fake
+
+
+class TestExpiry:
+    """Tests for time-to-live behavior."""
+
+    def test_returns_value_before_ttl(self, clock):
+        cache = TTLCache(max_size=10, default_ttl=60)
+        cache.set("a", 1)
+        clock.now += 59
+        assert cache.get("a") == 1
+
+    def test_expired_entry_is_lazily_deleted(self, clock):
+        cache = TTLCache(max_size=10, default_ttl=60)
+        cache.set("a", 1)
+        clock.now += 60
+        assert cache.get("a") is None
+        assert len(cache) == 0
+        assert cache.stats()["expirations"] == 1
+
+    def test_custom_ttl_overrides_default(self, clock):
+        cache = TTLCache(max_size=10, default_ttl=60)
+        cache.set("a", 1, ttl=5)
+        clock.now += 6
+        assert cache.get("a", "missing") == "missing"
+
+    def test_force_cleanup_removes_only_expired(self, clock):
+        cache = TTLCache(max_size=10, default_ttl=60)
+        cache.set("old", 1, ttl=1)
+        cache.set("new", 2)
+        clock.now += 2
+        assert cache.force_cleanup() == 1
+        assert cache.has("new")
+        assert not cache.has("old")
+
+
+class TestLRUEviction:
+    """Tests for size-bounded eviction."""
+
+    def test_evicts_least_recently_used(self, clock):
+        cache = TTLCache(max_size=2, default_ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # touch a, so b becomes LRU
+        cache.set("c", 3)
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+        assert cache.stats()["evictions"] == 1
+
+    def test_overwrite_does_not_grow_cache(self, clock):
+        cache = TTLCache(max_size=2, default_ttl=60)
+        cache.set("a", 1)
+        cache.set("a", 2)
+        assert len(cache) == 1
+        assert cache.get("a") == 2
+
+
+class TestStats:
+    """Tests for hit/miss accounting."""
+
+    def test_counts_hits_and_misses(self, clock):
+        cache = TTLCache(max_size=10, default_ttl=60)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("a")
+        cache.get("missing")
+
+        stats = cache.stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == pytest.approx(2 / 3, abs=1e-4)
+
+    def test_has_does_not_count_lookups(self, clock):
+        cache = TTLCache(max_size=10, default_ttl=60)
+        cache.set("a", 1)
+        cache.has("a")
+        cache.has("missing")
+        assert cache.stats()["hits"] == 0
+        assert cache.stats()["misses"] == 0
@@ -0,0 +1,176 @@
+"""
+Tests for vector_index
+
+Verifies local search ranks like the match_conversation_chunks RPC (cosine
+similarity, threshold, top-k), single-flight loading, the byte-capped LRU,
+and invalidation.
+"""
+
+import time
+import asyncio
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import vector_index
+
+
+def make_rows(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    rows = [
+        {
+            "id": f"chunk-{i}",
+            "conversation_id": f"conv-{i}",
+            "title": f"Title {i}",
+            "content": f"content {i}",
+            "embedding": "[" + ",".join(str(float(x)) for x in vectors[i]) + "]",
+        }
+        for i in range(n)
+    ]
+    return rows, vectors
+
+
+@pytest.fixture
+def index_state(monkeypatch):
+    """Reset module state and serve rows from an in-memory fake fetch."""
+    fetches = []
+    stores = {}
+
+    async def fake_fetch(user_id):
+        fetches.append(user_id)
+        await asyncio.sleep(0.01)
+        return [dict(row) for row in stores[user_id]]
+
+    monkeypatch.setattr(vector_index, "_fetch_rows", fake_fetch)
+    monkeypatch.setattr(vector_index, "_indexes", vector_index.OrderedDict())
+    monkeypatch.setattr(vector_index, "_loading", {})
+    monkeypatch.setattr(vector_index, "_query_counts", vector_index.TTLCache(max_size=100, default_ttl=60))
+    monkeypatch.setattr(vector_index, "_stats", {k: 0 for k in vector_index._stats})
+    monkeypatch.setattr(vector_index, "VECTOR_INDEX_MODE", "fallback")
+    return stores, fetches
+
+
+class TestSearch:
+    """Tests for ranking parity with the RPC."""
+
+    def test_matches_brute_force_cosine(self, index_state):
+        stores, _ = index_state
+        rows, vectors = make_rows(50)
+        stores["u1"] = rows
+        query = vectors[7] + 0.1
+
+        results = asyncio.run(vector_index.search("u1", query.tolist(), match_count=5, threshold=-1.0))
+
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:5]
+        assert [r["id"] for r in results] == [f"chunk-{i}" for i in expected]
+        assert results[0]["id"] == "chunk-7"
+        assert "embedding" not in results[0]
+        assert results[0]["similarity"] >= results[-1]["similarity"]
+
+    def test_threshold_filters_results(self, index_state):
+        stores, _ = index_state
+        rows, vectors = make_rows(20)
+        stores["u1"] = rows
+
+        results = asyncio.run(vector_index.search("u1", vectors[3].tolist(), match_count=20, threshold=0.99))
+
+        assert [r["id"] for r in results] == ["chunk-3"]
+
+    def test_disabled_mode_returns_none(self, index_state, monkeypatch):
+        monkeypatch.setattr(vector_index, "VECTOR_INDEX_MODE", "off")
+        assert asyncio.run(vector_index.search("u1", [1.0] * 8)) is None
+
+
+class TestLoading:
+    """Tests for single-flight loads, the memory cap and invalidation."""
+
+    def test_concurrent_searches_share_one_load(self, index_state):
+        stores, fetches = index_state
+        rows, vectors = make_rows(10)
+        stores["u1"] = rows
+
+        async def run():
+            return await asyncio.gather(*[
+                vector_index.search("u1", vectors[0].tolist(), threshold=-1.0) for _ in range(5)
+            ])
+
+        results = asyncio.run(run())
+        assert fetches == ["u1"]
+        assert all(r[0]["id"] == "chunk-0" for r in results)
+
+    def test_not_loaded_without_load_returns_none(self, index_state):
+        stores, fetches = index_state
+        stores["u1"], _ = make_rows(5)
+
+        assert asyncio.run(vector_index.search("u1", [1.0] * 8, load=False)) is None
+        assert fetches == []
+
+    def test_lru_evicts_least_recent_user_over_cap(self, index_state, monkeypatch):
+        stores, _ = index_state
+        for user in ("a", "b", "c"):
+            stores[user], _ = make_rows(100, dim=256)
+        one_user = vector_index._build_index([dict(r) for r in stores["a"]]).nbytes
+        monkeypatch.setattr(vector_index, "VECTOR_INDEX_MAX_MB", (2 * one_user + 1) / (1024 * 1024))
+
+        async def run():
+            for user in ("a", "b", "c"):
+                await vector_index.search(user, [1.0] * 256)
+
+        asyncio.run(run())
+        assert list(vector_index._indexes) == ["b", "c"]
+        assert vector_index.get_vector_index_stats()["evictions"] == 1
+
+    def test_drop_user_forgets_index(self, index_state):
+        stores, fetches = index_state
+        stores["u1"], _ = make_rows(5)
+
+        asyncio.run(vector_index.search("u1", [1.0] * 8))
+        vector_index.drop_user("u1")
+
+        assert not vector_index.is_loaded("u1")
+        assert vector_index.get_vector_index_stats()["invalidations"] == 1
+
+    def test_primary_mode_warms_hot_users(self, index_state, monkeypatch):
+        stores, fetches = index_state
+        stores["u1"], _ = make_rows(5)
+        monkeypatch.setattr(vector_index, "VECTOR_INDEX_MODE", "primary")
+        monkeypatch.setattr(vector_index, "VECTOR_INDEX_HOT_QUERIES", 2)
+
+        async def run():
+            vector_index.note_query("u1")
+            assert fetches == [] and not vector_index._loading
+            vector_index.note_query("u1")
+            await vector_index._loading["u1"]
+
+        asyncio.run(run())
+        assert vector_index.is_loaded("u1")
+
+    def test_query_counts_are_capped_and_expire(self, index_state, monkeypatch):
+        monkeypatch.setattr(vector_index, "VECTOR_INDEX_MODE", "primary")
+        monkeypatch.setattr(vector_index, "VECTOR_INDEX_HOT_QUERIES", 2)
+        monkeypatch.setattr(vector_index, "_query_counts", vector_index.TTLCache(max_size=3, default_ttl=0.05))
+
+        for i in range(10):
+            vector_index.note_query(f"cold-{i}")
+        assert len(vector_index._query_counts) == 3
+
+        vector_index.note_query("u1")
+        time.sleep(0.06)
+        vector_index.note_query("u1")  # first query expired -- not hot yet
+        assert not vector_index._loading
+
+    def test_large_users_use_hnsw_when_available(self, index_state, monkeypatch):
+        pytest.importorskip("hnswlib")
+        stores, _ = index_state
+        rows, vectors = make_rows(200)
+        stores["u1"] = rows
+        monkeypatch.setattr(vector_index, "VECTOR_INDEX_ANN_THRESHOLD", 100)
+
+        results = asyncio.run(vector_index.search("u1", vectors[42].tolist(), match_count=3, threshold=-1.0))
+
+        assert vector_index._indexes["u1"].backend == "hnsw"
+        assert results[0]["id"] == "chunk-42"
+        assert results[0]["similarity"] == pytest.approx(1.0, abs=1e-4)
@@ -0,0 +1,84 @@
+"""
+Tests for web_search
+
+Verifies query normalization, result caching, and single-flight coalescing
+of identical in-flight searches.
+"""
+
+import asyncio
+
+import pytest
+
+import web_search
+from ttl_cache import TTLCache
+
+
+class CountingBackend:
+    """Fake backend that records calls and can be slowed down."""
+
+    def __init__(self, result: str = "results", delay: float = 0.02):
+        self.calls = []
+        self.result = result
+        self.delay = delay
+
+    async def __call__(self, query: str) -> str:
+        self.calls.append(query)
+        await asyncio.sleep(self.delay)
+        return self.result
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    fake = CountingBackend()
+    monkeypatch.setattr(web_search, "WEB_SEARCH_BACKEND", "fake")
+    monkeypatch.setitem(web_search._BACKENDS, "fake", fake)
+    monkeypatch.setattr(web_search, "_cache", TTLCache(max_size=16, default_ttl=60))
+    monkeypatch.setattr(web_search, "_in_flight", {})
+    return fake
+
+
+class TestCaching:
+    """Tests for the TTL result cache."""
+
+    def test_normalized_queries_share_a_cache_entry(self, backend):
+        async def run():
+            first = await web_search.execute_web_search("Bitcoin price today")
+            second = await web_search.execute_web_search("  bitcoin   PRICE today ")
+            return first, second
+
+        assert asyncio.run(run()) == ("results", "results")
+        assert len(backend.calls) == 1
+
+    def test_error_results_are_not_cached(self, backend):
+        backend.result = "[Search error: 500]"
+
+        async def run():
+            await web_search.execute_web_search("q")
+            await web_search.execute_web_search("q")
+
+        asyncio.run(run())
+        assert len(backend.calls) == 2
+
+
+class TestSingleFlight:
+    """Tests for coalescing identical in-flight searches."""
+
+    def test_concurrent_identical_searches_share_one_call(self, backend):
+        async def run():
+            return await asyncio.gather(*[web_search.execute_web_search("same query") for _ in range(5)])
+
+        assert asyncio.run(run()) == ["results"] * 5
+        assert len(backend.calls) == 1
+        assert web_search._in_flight == {}
+
+    def test_cancelled_caller_does_not_cancel_shared_search(self, backend):
+        async def run():
+            first = asyncio.create_task(web_search.execute_web_search("q"))
+            await asyncio.sleep(0)
+            second = asyncio.create_task(web_search.execute_web_search("q"))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(run()) == "results"
+        assert len(backend.calls) == 1
@@ -0,0 +1,105 @@
+"""
+TTL Cache - Size-bounded LRU cache with per-entry time-to-live (Python)
+
+Python counterpart of lib/api/ttl-cache.ts, extended for hot-path caching:
+- Configurable default TTL per cache instance, optional custom TTL per entry
+- Lazy deletion on access (get returns the default for expired entries)
+- Least-recently-used eviction once max_size entries are stored
+- Hit / miss / eviction counters for health and metrics endpoints
+
+No background cleanup thread: expired entries are dropped lazily on access,
+on eviction, or via force_cleanup().
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """LRU cache with time-to-live expiry and hit/miss accounting."""
+
+    def __init__(self, max_size: int = 1024, default_ttl: float = 30 * 60):
+        """
+        Args:
+            max_size: Maximum number of live entries before LRU eviction
+            default_ttl: Default time-to-live in seconds (default: 30 minutes)
+        """
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self.max_size = max(1, max_size)
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or default if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            # Lazy deletion
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value with optional custom TTL (seconds)."""
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        self._entries[key] = (value, expires_at)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def has(self, key: Hashable) -> bool:
+        """Check if key exists and hasn't expired (no LRU touch, no counters)."""
+        entry = self._entries.get(key)
+        return entry is not None and time.monotonic() < entry[1]
+
+    def delete(self, key: Hashable) -> bool:
+        """Delete a key immediately. Returns True if it existed."""
+        return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        self._entries.clear()
+
+    def force_cleanup(self) -> int:
+        """Remove all expired entries. Returns number of entries removed."""
+        now = time.monotonic()
+        expired = [key for key, (_, expires_at) in self._entries.items() if now >= expires_at]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.has(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """JSON-serializable counters snapshot."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
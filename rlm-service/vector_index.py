@@ -0,0 +1,331 @@
+"""
+In-Process Vector Index
+
+Per-user copy of conversation_chunks embeddings held in memory, used to
+search without the match_conversation_chunks RPC:
+
+- "fallback": when the RPC fails, search the user's local index (loading it
+  on demand) instead of dropping to timestamp-sorted recent chunks
+- "primary": users who query repeatedly ("hot" users) get their index
+  loaded in the background and searched locally from then on; the RPC is
+  only used until the index is ready. The local index is vector-only, so
+  with RETRIEVAL_MODE=hybrid main keeps using the hybrid RPC (and its
+  full-text leg) and the index only serves as the RPC-failure fallback
+- "off": disabled
+
+Indexes are loaded lazily from conversation_chunks.embedding (paged through
+PostgREST, single-flight per user) and kept in an LRU capped by total bytes
+across users. Small users are searched by NumPy brute-force cosine
+similarity; users with VECTOR_INDEX_ANN_THRESHOLD+ chunks use an hnswlib
+HNSW graph when hnswlib is installed. Indexes are dropped whenever the
+retrieval cache invalidates the user (chunks rewritten by a full pass).
+
+numpy is a declared dependency (requirements.txt); if it is missing anyway
+the index is disabled and retrieval behaves exactly as before. hnswlib is
+optional.
+
+Query counts for not-yet-hot users are kept in a TTL/LRU cache, so users who
+never get hot are forgotten after VECTOR_INDEX_HOT_WINDOW_SECONDS without a
+query and at most VECTOR_INDEX_MAX_TRACKED_USERS are counted at once.
+
+Config (env):
+- VECTOR_INDEX_MODE                ("off" | "fallback" | "primary", default fallback)
+- VECTOR_INDEX_MAX_MB              (memory cap across users, default 256)
+- VECTOR_INDEX_HOT_QUERIES         (queries before a user is "hot", default 3)
+- VECTOR_INDEX_HOT_WINDOW_SECONDS  (query count expiry after inactivity, default 3600)
+- VECTOR_INDEX_MAX_TRACKED_USERS   (users whose queries are counted, default 10000)
+- VECTOR_INDEX_ANN_THRESHOLD       (chunks before using HNSW, default 20000)
+- VECTOR_INDEX_LOAD_TIMEOUT_SECONDS (max wait for an on-demand load, default 5)
+"""
+
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any
+
+from ttl_cache import TTLCache
+from supabase_client import get_supabase_client
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+try:
+    import hnswlib
+except ImportError:  # Optional dependency
+    hnswlib = None
+
+
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "fallback").lower()
+VECTOR_INDEX_MAX_MB = int(os.getenv("VECTOR_INDEX_MAX_MB", "256"))
+VECTOR_INDEX_HOT_QUERIES = int(os.getenv("VECTOR_INDEX_HOT_QUERIES", "3"))
+VECTOR_INDEX_HOT_WINDOW_SECONDS = float(os.getenv("VECTOR_INDEX_HOT_WINDOW_SECONDS", "3600"))
+VECTOR_INDEX_MAX_TRACKED_USERS = int(os.getenv("VECTOR_INDEX_MAX_TRACKED_USERS", "10000"))
+VECTOR_INDEX_ANN_THRESHOLD = int(os.getenv("VECTOR_INDEX_ANN_THRESHOLD", "20000"))
+VECTOR_INDEX_LOAD_TIMEOUT_SECONDS = float(os.getenv("VECTOR_INDEX_LOAD_TIMEOUT_SECONDS", "5"))
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+PAGE_SIZE = 1000
+CHUNK_COLUMNS = "id,user_id,conversation_id,title,content,chunk_tier,message_count,created_at"
+
+
+class UserIndex:
+    """One user's chunk rows plus a normalized embedding matrix (or HNSW graph)."""
+
+    def __init__(self, rows: List[dict], vectors: "np.ndarray"):
+        self.rows = rows
+        self.size = len(rows)
+        self.hnsw = None
+        self.matrix = None
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        normalized = (vectors / norms).astype(np.float32)
+
+        if hnswlib is not None and self.size >= VECTOR_INDEX_ANN_THRESHOLD:
+            self.hnsw = hnswlib.Index(space="cosine", dim=normalized.shape[1])
+            self.hnsw.init_index(max_elements=self.size, ef_construction=200, M=16)
+            self.hnsw.add_items(normalized, np.arange(self.size))
+            self.hnsw.set_ef(64)
+        else:
+            self.matrix = normalized
+
+        row_bytes = sum(len(r.get("content") or "") + len(r.get("title") or "") + 200 for r in rows)
+        self.nbytes = normalized.nbytes * (2 if self.hnsw is not None else 1) + row_bytes
+
+    @property
+    def backend(self) -> str:
+        return "hnsw" if self.hnsw is not None else "numpy"
+
+    def search(self, query: List[float], match_count: int, threshold: float) -> List[dict]:
+        """Top match_count rows by cosine similarity at or above threshold (RPC result shape)."""
+        if self.size == 0:
+            return []
+
+        q = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm == 0:
+            return []
+        q = q / norm
+        k = min(match_count, self.size)
+
+        if self.hnsw is not None:
+            labels, distances = self.hnsw.knn_query(q, k=k)
+            pairs = [(int(i), 1.0 - float(d)) for i, d in zip(labels[0], distances[0])]
+        else:
+            scores = self.matrix @ q
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            pairs = [(int(i), float(scores[i])) for i in top]
+
+        return [
+            {**self.rows[i], "similarity": similarity}
+            for i, similarity in pairs
+            if similarity > threshold
+        ]
+
+
+_indexes: "OrderedDict[str, UserIndex]" = OrderedDict()
+_loading: Dict[str, asyncio.Task] = {}
+# user_id -> queries so far, for users not yet hot
+_query_counts = TTLCache(max_size=VECTOR_INDEX_MAX_TRACKED_USERS, default_ttl=VECTOR_INDEX_HOT_WINDOW_SECONDS)
+_warned_missing_numpy = False
+
+_stats = {
+    "loads": 0,
+    "load_failures": 0,
+    "load_total_ms": 0.0,
+    "evictions": 0,
+    "searches": 0,
+    "invalidations": 0,
+}
+
+
+def is_enabled() -> bool:
+    global _warned_missing_numpy
+    if VECTOR_INDEX_MODE == "off":
+        return False
+    if np is None:
+        if not _warned_missing_numpy:
+            print("[VectorIndex] numpy not installed -- local vector index disabled")
+            _warned_missing_numpy = True
+        return False
+    return True
+
+
+def _total_bytes() -> int:
+    return sum(index.nbytes for index in _indexes.values())
+
+
+def _parse_embedding(raw: Any) -> Optional[List[float]]:
+    # PostgREST returns pgvector columns as "[0.1,0.2,...]" strings
+    if isinstance(raw, str):
+        return json.loads(raw)
+    return raw
+
+
+async def _fetch_rows(user_id: str) -> List[dict]:
+    client = get_supabase_client()
+    rows: List[dict] = []
+    offset = 0
+    while True:
+        response = await client.get(
+            f"{SUPABASE_URL}/rest/v1/conversation_chunks",
+            params={
+                "user_id": f"eq.{user_id}",
+                "embedding": "not.is.null",
+                "select": f"{CHUNK_COLUMNS},embedding",
+                "order": "id.asc",
+                "limit": str(PAGE_SIZE),
+                "offset": str(offset),
+            },
+            timeout=30.0,
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to load chunk embeddings ({response.status_code}): {response.text[:200]}")
+
+        page = response.json()
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        offset += PAGE_SIZE
+
+
+def _build_index(rows: List[dict]) -> UserIndex:
+    """Parse embeddings and build the index (CPU-bound -- run off the event loop)."""
+    vectors = []
+    kept = []
+    for row in rows:
+        embedding = _parse_embedding(row.pop("embedding", None))
+        if embedding:
+            vectors.append(embedding)
+            kept.append(row)
+    matrix = np.asarray(vectors, dtype=np.float32) if vectors else np.zeros((0, 768), dtype=np.float32)
+    return UserIndex(kept, matrix)
+
+
+async def _load(user_id: str) -> UserIndex:
+    started = time.perf_counter()
+    try:
+        rows = await _fetch_rows(user_id)
+        index = await asyncio.to_thread(_build_index, rows)
+    except Exception:
+        _stats["load_failures"] += 1
+        raise
+    finally:
+        _loading.pop(user_id, None)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    _stats["loads"] += 1
+    _stats["load_total_ms"] += elapsed_ms
+
+    max_bytes = VECTOR_INDEX_MAX_MB * 1024 * 1024
+    if index.nbytes > max_bytes:
+        print(f"[VectorIndex] Index for user {user_id} ({index.nbytes} bytes) exceeds cap, not kept")
+        return index
+
+    _indexes[user_id] = index
+    _indexes.move_to_end(user_id)
+    while _total_bytes() > max_bytes and len(_indexes) > 1:
+        _indexes.popitem(last=False)
+        _stats["evictions"] += 1
+
+    print(f"[VectorIndex] Loaded {index.size} chunks for user {user_id} ({index.backend}) in {elapsed_ms:.0f}ms")
+    return index
+
+
+def _ensure_loading(user_id: str) -> asyncio.Task:
+    task = _loading.get(user_id)
+    if task is None:
+        task = asyncio.create_task(_load(user_id))
+        # Background loads may fail unobserved -- retrieve the error so it isn't logged as lost
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        _loading[user_id] = task
+    return task
+
+
+def is_loaded(user_id: str) -> bool:
+    return user_id in _indexes
+
+
+def note_query(user_id: str) -> None:
+    """Count a query; in primary mode, warm the index in the background once the user is hot."""
+    if VECTOR_INDEX_MODE != "primary" or not is_enabled() or user_id in _indexes:
+        return
+    count = _query_counts.get(user_id, 0) + 1
+    if count >= VECTOR_INDEX_HOT_QUERIES:
+        _query_counts.delete(user_id)
+        _ensure_loading(user_id)
+    else:
+        _query_counts.set(user_id, count)
+
+
+async def search(
+    user_id: str,
+    query_embedding: List[float],
+    match_count: int = 8,
+    threshold: float = 0.3,
+    load: bool = True,
+) -> Optional[List[dict]]:
+    """Search the user's local index.
+
+    Returns None when the index is unavailable (disabled, not loaded and
+    load=False, or the load failed / exceeded VECTOR_INDEX_LOAD_TIMEOUT_SECONDS).
+    """
+    if not is_enabled():
+        return None
+
+    index = _indexes.get(user_id)
+    if index is None:
+        if not load:
+            return None
+        try:
+            index = await asyncio.wait_for(
+                asyncio.shield(_ensure_loading(user_id)),
+                timeout=VECTOR_INDEX_LOAD_TIMEOUT_SECONDS,
+            )
+        except Exception as e:
+            print(f"[VectorIndex] Load unavailable for user {user_id}: {e}")
+            return None
+    else:
+        _indexes.move_to_end(user_id)
+
+    _stats["searches"] += 1
+    if index.size > 2000:
+        return await asyncio.to_thread(index.search, query_embedding, match_count, threshold)
+    return index.search(query_embedding, match_count, threshold)
+
+
+def drop_user(user_id: str) -> None:
+    """Forget a user's index (chunks rewritten); an in-flight load is cancelled."""
+    _query_counts.delete(user_id)
+    task = _loading.pop(user_id, None)
+    if task is not None and not task.done():
+        task.cancel()
+    if _indexes.pop(user_id, None) is not None:
+        _stats["invalidations"] += 1
+
+
+def get_vector_index_stats() -> Dict[str, Any]:
+    """Mode, memory use and load/search counters."""
+    loads = _stats["loads"]
+    return {
+        "mode": VECTOR_INDEX_MODE,
+        "enabled": is_enabled(),
+        "ann_available": hnswlib is not None,
+        "users": len(_indexes),
+        "chunks": sum(index.size for index in _indexes.values()),
+        "bytes": _total_bytes(),
+        "max_bytes": VECTOR_INDEX_MAX_MB * 1024 * 1024,
+        "loading": len(_loading),
+        "tracked_users": len(_query_counts),
+        "loads": loads,
+        "load_failures": _stats["load_failures"],
+        "load_avg_ms": round(_stats["load_total_ms"] / loads, 2) if loads else 0.0,
+        "evictions": _stats["evictions"],
+        "searches": _stats["searches"],
+        "invalidations": _stats["invalidations"],
+    }
@@ -0,0 +1,182 @@
+"""
+Startup Warm-up and Readiness
+
+Handlers import processors.* (and boto3 through embedding_generator) lazily,
+and every upstream client is created and connected on first use -- so the
+first queries after each Render deploy or scale-up paid module imports,
+client construction and TCP/TLS handshakes. Warm-up does that work once at
+startup, in the background, before the instance reports ready:
+
+1. modules: import the lazily-imported processors modules (off the loop)
+2. clients: build the Anthropic, Bedrock and web search clients and the
+   embedding executor
+3. connections: one cheap request per upstream so pooled connections are
+   already open (Supabase REST, Anthropic models list, one Titan query
+   embedding)
+
+/ready returns 503 until warm-up finishes, then 200. A failing step is
+logged and reported but does not hold readiness back -- the service works
+cold, just slower, and an upstream blip must not keep it out of rotation.
+/health stays a pure liveness check.
+
+Config (env):
+- WARMUP_ENABLED            ("true"/"false", default true; false = ready immediately)
+- WARMUP_CONNECTIONS        ("true"/"false", default true; step 3)
+- WARMUP_STEP_TIMEOUT_SECONDS (default 10)
+"""
+
+import os
+import time
+import asyncio
+import importlib
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() not in ("0", "false", "no")
+WARMUP_CONNECTIONS = os.getenv("WARMUP_CONNECTIONS", "true").lower() not in ("0", "false", "no")
+WARMUP_STEP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_STEP_TIMEOUT_SECONDS", "10"))
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+
+# Imported inside request handlers / background jobs
+PRELOAD_MODULES = [
+    "processors.embedding_generator",
+    "processors.streaming_import",
+    "processors.full_pass",
+    "processors.conversation_chunker",
+    "processors.fact_extractor",
+    "processors.memory_generator",
+    "processors.v2_regenerator",
+]
+
+_task: Optional[asyncio.Task] = None
+_ready = False
+_report: Dict[str, Any] = {"state": "pending", "steps": {}, "total_ms": None}
+
+
+def preload_modules() -> List[str]:
+    """Import every lazily-imported module (blocking). Returns the modules that failed."""
+    failed = []
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"[Warmup] Could not preload {name}: {e}")
+            failed.append(name)
+    return failed
+
+
+async def _load_modules() -> None:
+    failed = await asyncio.to_thread(preload_modules)
+    if failed:
+        raise RuntimeError(f"failed to import {', '.join(failed)}")
+
+
+async def _build_clients() -> None:
+    from anthropic_client import get_anthropic_client
+    from web_search import _get_client as get_web_search_client
+    from processors.embedding_generator import get_bedrock_client, get_embed_executor
+
+    get_anthropic_client()
+    get_web_search_client()
+    get_embed_executor()
+    # boto3 client construction loads service models from disk -- keep it off the loop
+    await asyncio.to_thread(get_bedrock_client)
+
+
+async def _warm_supabase() -> None:
+    from supabase_client import get_supabase_client
+
+    response = await get_supabase_client().get(
+        f"{SUPABASE_URL}/rest/v1/user_profiles",
+        params={"select": "user_id", "limit": "1"},
+    )
+    if response.status_code >= 500:
+        raise RuntimeError(f"Supabase returned {response.status_code}")
+
+
+async def _warm_anthropic() -> None:
+    from anthropic_client import get_anthropic_client
+
+    await get_anthropic_client().with_options(max_retries=0).models.list(limit=1)
+
+
+async def _warm_bedrock() -> None:
+    from processors.embedding_generator import embed_query
+
+    await embed_query("warm-up")
+
+
+def _steps() -> List[tuple]:
+    steps: List[tuple] = [("modules", _load_modules), ("clients", _build_clients)]
+    if WARMUP_CONNECTIONS:
+        steps += [
+            ("supabase", _warm_supabase),
+            ("anthropic", _warm_anthropic),
+            ("bedrock", _warm_bedrock),
+        ]
+    return steps
+
+
+async def _run_step(name: str, step: Callable[[], Awaitable[None]]) -> None:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(step(), timeout=WARMUP_STEP_TIMEOUT_SECONDS)
+        result = {"ok": True}
+    except Exception as e:
+        result = {"ok": False, "error": f"{type(e).__name__}: {e}"[:200]}
+        print(f"[Warmup] Step {name} failed: {result['error']}")
+    result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _report["steps"][name] = result
+
+
+async def run_warmup() -> Dict[str, Any]:
+    """Run all warm-up steps, then mark the service ready. Returns the report."""
+    global _ready
+    started = time.perf_counter()
+    _report["state"] = "running"
+
+    # Modules and clients first; connection warm-ups are independent of each other
+    steps = _steps()
+    for name, step in steps[:2]:
+        await _run_step(name, step)
+    await asyncio.gather(*[_run_step(name, step) for name, step in steps[2:]])
+
+    _report["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _report["state"] = "complete"
+    _ready = True
+    failed = [name for name, result in _report["steps"].items() if not result["ok"]]
+    print(f"[Warmup] Ready in {_report['total_ms']}ms" + (f" (failed: {', '.join(failed)})" if failed else ""))
+    return _report
+
+
+def start_warmup() -> None:
+    """Start warm-up in the background (called from the FastAPI lifespan hook)."""
+    global _task, _ready
+    if not WARMUP_ENABLED:
+        _report["state"] = "disabled"
+        _ready = True
+        return
+    if _task is None or _task.done():
+        _task = asyncio.get_running_loop().create_task(run_warmup())
+
+
+async def stop_warmup() -> None:
+    """Cancel an unfinished warm-up (shutdown during startup)."""
+    global _task
+    if _task is not None and not _task.done():
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+    _task = None
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+def get_warmup_report() -> Dict[str, Any]:
+    """Warm-up state, per-step timings/errors and total time."""
+    return {"ready": _ready, **_report, "steps": dict(_report["steps"])}
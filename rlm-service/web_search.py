@@ -0,0 +1,212 @@
+"""
+Web Search
+
+Backs the `web_search` tool. Results are cached per normalized query and
+identical in-flight searches are coalesced, so several users asking about
+the same headline (or the model re-issuing a query inside the tool loop)
+share one Tavily round trip.
+
+- TTL/LRU cache keyed by normalized query (trim, collapse whitespace, lowercase)
+- Single-flight: concurrent callers for the same key await one shared task;
+  a cancelled caller never cancels the search for the others
+- Error results ("[Search failed: ...]") are never cached
+- Pluggable backend: "tavily" (default) or "stub" -- deterministic local
+  results with configurable latency, for benchmarks and load tests
+- One keep-alive httpx client for Tavily, closed from the lifespan hook
+
+Config (env):
+- WEB_SEARCH_BACKEND           ("tavily" | "stub", default tavily)
+- WEB_SEARCH_CACHE_TTL_SECONDS (default 300)
+- WEB_SEARCH_CACHE_SIZE        (default 512)
+- WEB_SEARCH_STUB_LATENCY_MS   (stub backend delay, default 200)
+- TAVILY_API_KEY
+"""
+
+import os
+import re
+import time
+import asyncio
+from typing import Optional, Dict, Any
+
+import httpx
+
+from ttl_cache import TTLCache
+from metrics import counter, histogram
+
+
+WEB_SEARCH_BACKEND = os.getenv("WEB_SEARCH_BACKEND", "tavily").lower()
+WEB_SEARCH_CACHE_TTL_SECONDS = float(os.getenv("WEB_SEARCH_CACHE_TTL_SECONDS", "300"))
+WEB_SEARCH_CACHE_SIZE = int(os.getenv("WEB_SEARCH_CACHE_SIZE", "512"))
+WEB_SEARCH_STUB_LATENCY_MS = int(os.getenv("WEB_SEARCH_STUB_LATENCY_MS", "200"))
+
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+
+WEB_SEARCHES = counter("soulprint_web_search_total", "Web search lookups by result (hit, miss, coalesced, error)")
+WEB_SEARCH_SECONDS = histogram("soulprint_web_search_seconds", "Web search backend latency")
+
+_cache = TTLCache(max_size=WEB_SEARCH_CACHE_SIZE, default_ttl=WEB_SEARCH_CACHE_TTL_SECONDS)
+_in_flight: Dict[str, asyncio.Task] = {}
+_client: Optional[httpx.AsyncClient] = None
+
+_stats = {
+    "lookups": 0,
+    "coalesced": 0,
+    "backend_calls": 0,
+    "errors": 0,
+    "backend_total_ms": 0.0,
+}
+
+
+def normalize_search_query(query: str) -> str:
+    """Normalize a search query for cache keying: trim, collapse whitespace, lowercase."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def _is_error_result(result: str) -> bool:
+    return result.startswith("[Search")
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=10.0)
+    return _client
+
+
+async def close_web_search_client() -> None:
+    """Close the shared Tavily client (called on app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+# ============================================
+# Backends
+# ============================================
+
+async def _search_tavily(query: str) -> str:
+    """Execute web search using Tavily API"""
+    tavily_key = os.getenv("TAVILY_API_KEY")
+    if not tavily_key:
+        return "[Search unavailable - no API key]"
+
+    try:
+        response = await _get_client().post(
+            TAVILY_SEARCH_URL,
+            json={
+                "api_key": tavily_key,
+                "query": query,
+                "max_results": 5,
+                "include_answer": True,
+                "search_depth": "basic",
+            },
+            timeout=10.0,
+        )
+
+        if response.status_code != 200:
+            return f"[Search error: {response.status_code}]"
+
+        data = response.json()
+
+        # Format results
+        lines = []
+        if data.get("answer"):
+            lines.append(f"**Quick Answer:** {data['answer']}\n")
+
+        for result in data.get("results", [])[:5]:
+            lines.append(f"• **{result.get('title', 'Untitled')}**")
+            lines.append(f"  {result.get('content', '')[:300]}...")
+            lines.append(f"  Source: {result.get('url', '')}\n")
+
+        return "\n".join(lines) if lines else "[No results found]"
+
+    except Exception as e:
+        print(f"[WebSearch] Error: {e}")
+        return f"[Search failed: {str(e)[:100]}]"
+
+
+async def _search_stub(query: str) -> str:
+    """Deterministic local results (no network) for benchmarks and tests."""
+    await asyncio.sleep(WEB_SEARCH_STUB_LATENCY_MS / 1000)
+    return (
+        f"**Quick Answer:** Stub answer for \"{query}\"\n\n"
+        f"• **Stub result for {query}**\n"
+        f"  Local stub backend content for benchmarking...\n"
+        f"  Source: https://example.com/search?q={query.replace(' ', '+')}\n"
+    )
+
+
+_BACKENDS = {
+    "tavily": _search_tavily,
+    "stub": _search_stub,
+}
+
+
+async def _run_backend(query: str) -> str:
+    backend = _BACKENDS.get(WEB_SEARCH_BACKEND, _search_tavily)
+    started = time.perf_counter()
+    result = await backend(query)
+    elapsed = time.perf_counter() - started
+
+    _stats["backend_calls"] += 1
+    _stats["backend_total_ms"] += elapsed * 1000
+    WEB_SEARCH_SECONDS.observe(elapsed, backend=WEB_SEARCH_BACKEND)
+    return result
+
+
+# ============================================
+# Public API
+# ============================================
+
+async def execute_web_search(query: str) -> str:
+    """Run a web search, served from cache or a coalesced in-flight search when possible."""
+    _stats["lookups"] += 1
+    key = normalize_search_query(query)
+
+    cached = _cache.get(key)
+    if cached is not None:
+        WEB_SEARCHES.inc(result="hit")
+        return cached
+
+    task = _in_flight.get(key)
+    if task is not None:
+        _stats["coalesced"] += 1
+        WEB_SEARCHES.inc(result="coalesced")
+        return await asyncio.shield(task)
+
+    WEB_SEARCHES.inc(result="miss")
+    task = asyncio.create_task(_run_backend(query))
+    _in_flight[key] = task
+    try:
+        result = await asyncio.shield(task)
+    finally:
+        if task.done():
+            _in_flight.pop(key, None)
+        else:
+            # Caller was cancelled -- let the search finish for any coalesced waiters
+            task.add_done_callback(lambda _t: _in_flight.pop(key, None))
+
+    if _is_error_result(result):
+        _stats["errors"] += 1
+        WEB_SEARCHES.inc(result="error")
+    else:
+        _cache.set(key, result)
+    return result
+
+
+def get_web_search_stats() -> Dict[str, Any]:
+    """Cache/coalescing counters and average backend latency."""
+    calls = _stats["backend_calls"]
+    cache_stats = _cache.stats()
+    return {
+        "backend": WEB_SEARCH_BACKEND,
+        "lookups": _stats["lookups"],
+        "cache_size": cache_stats["size"],
+        "cache_hits": cache_stats["hits"],
+        "cache_hit_rate": cache_stats["hit_rate"],
+        "coalesced": _stats["coalesced"],
+        "backend_calls": calls,
+        "errors": _stats["errors"],
+        "backend_avg_ms": round(_stats["backend_total_ms"] / calls, 2) if calls else 0.0,
+    }
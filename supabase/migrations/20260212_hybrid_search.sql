@@ -0,0 +1,156 @@
+-- =============================================
+-- Hybrid Lexical + Vector Search Migration
+-- Full-text index on conversation_chunks + rank-fused RPC
+-- =============================================
+--
+-- Purpose: Vector-only search misses exact names, project codenames and
+-- dates that fall below the similarity threshold. This adds a full-text
+-- index over chunk title + content and a single RPC that runs the vector
+-- match and the full-text match side by side and merges them with
+-- reciprocal-rank fusion (RRF):
+--
+--   rrf_score = sum over legs of 1 / (rrf_k + rank_in_leg)
+--
+-- One call replaces match_conversation_chunks for RETRIEVAL_MODE=hybrid
+-- (rlm-service), so recall improves without an extra round trip.
+--
+-- IMPORTANT: Run this migration manually in Supabase SQL Editor
+-- (migrations are not auto-applied in production). Until it is applied,
+-- rlm-service falls back to match_conversation_chunks. Re-running it is safe
+-- (Steps 1-2 are IF NOT EXISTS, Step 3 replaces the function) and picks up
+-- changes to the RPC. rlm-service only calls it with RETRIEVAL_MODE=hybrid
+-- (default: vector).
+
+-- Step 1: Generated full-text column ('simple' config: no stemming or stop
+-- words, so names and codenames match exactly as typed)
+ALTER TABLE public.conversation_chunks
+ADD COLUMN IF NOT EXISTS content_tsv tsvector
+GENERATED ALWAYS AS (
+  to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(content, ''))
+) STORED;
+
+-- Step 2: GIN index for full-text matching
+CREATE INDEX IF NOT EXISTS idx_conversation_chunks_content_tsv
+ON public.conversation_chunks
+USING gin (content_tsv);
+
+-- Step 3: Hybrid RPC
+-- Parameters:
+--   match_threshold  applies to the vector leg only (lexical hits are kept
+--                    regardless of cosine similarity -- that's the point)
+--   candidate_count  rows taken from each leg before fusion
+--   rrf_k            RRF damping constant (60 is the standard default)
+-- The lexical query keeps only the message's content words: stop words
+-- (what, did, I, the -- per the 'english' config) and single characters are
+-- dropped, the rest stay unstemmed to match the 'simple' column. Chunks
+-- containing every content word are matched first; only if there are none
+-- is any content word enough (OR). ts_rank_cd, normalized by document
+-- length so long chunks don't win on volume, orders the lexical leg.
+CREATE OR REPLACE FUNCTION public.match_conversation_chunks_hybrid(
+  query_embedding vector(768),
+  query_text text,
+  match_user_id uuid,
+  match_count int DEFAULT 10,
+  match_threshold float DEFAULT 0.3,
+  candidate_count int DEFAULT 40,
+  rrf_k int DEFAULT 60
+)
+RETURNS TABLE (
+  id uuid,
+  user_id uuid,
+  conversation_id text,
+  title text,
+  content text,
+  chunk_tier text,
+  message_count int,
+  created_at timestamptz,
+  similarity float,
+  lexical_rank float,
+  rrf_score float
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+  lexical_terms text;
+  all_terms tsquery;
+  lexical_query tsquery;
+BEGIN
+  SELECT string_agg(t.lexeme, ' ')
+  INTO lexical_terms
+  FROM unnest(to_tsvector('simple', coalesce(query_text, ''))) AS t
+  WHERE length(t.lexeme) > 1
+    AND to_tsvector('english', t.lexeme) <> ''::tsvector;
+
+  IF lexical_terms IS NOT NULL THEN
+    all_terms := plainto_tsquery('simple', lexical_terms);
+    IF EXISTS (
+      SELECT 1
+      FROM conversation_chunks c
+      WHERE c.user_id = match_user_id
+        AND c.content_tsv @@ all_terms
+    ) THEN
+      lexical_query := all_terms;
+    ELSE
+      lexical_query := replace(all_terms::text, ' & ', ' | ')::tsquery;
+    END IF;
+  END IF;
+
+  RETURN QUERY
+  WITH vector_leg AS (
+    SELECT
+      cc.id,
+      row_number() OVER (ORDER BY cc.embedding <=> query_embedding) AS leg_rank
+    FROM (
+      SELECT c.id, c.embedding
+      FROM conversation_chunks c
+      WHERE c.user_id = match_user_id
+        AND c.embedding IS NOT NULL
+        AND 1 - (c.embedding <=> query_embedding) > match_threshold
+      ORDER BY c.embedding <=> query_embedding
+      LIMIT candidate_count
+    ) cc
+  ),
+  lexical_leg AS (
+    SELECT
+      cc.id,
+      cc.lexical_rank,
+      row_number() OVER (ORDER BY cc.lexical_rank DESC) AS leg_rank
+    FROM (
+      SELECT c.id, ts_rank_cd(c.content_tsv, lexical_query, 1)::float AS lexical_rank
+      FROM conversation_chunks c
+      WHERE lexical_query IS NOT NULL
+        AND c.user_id = match_user_id
+        AND c.content_tsv @@ lexical_query
+      ORDER BY lexical_rank DESC
+      LIMIT candidate_count
+    ) cc
+  ),
+  fused AS (
+    SELECT
+      coalesce(v.id, l.id) AS id,
+      l.lexical_rank,
+      coalesce(1.0 / (rrf_k + v.leg_rank), 0.0)
+        + coalesce(1.0 / (rrf_k + l.leg_rank), 0.0) AS rrf_score
+    FROM vector_leg v
+    FULL OUTER JOIN lexical_leg l ON l.id = v.id
+  )
+  SELECT
+    cc.id,
+    cc.user_id,
+    cc.conversation_id,
+    cc.title,
+    cc.content,
+    cc.chunk_tier,
+    cc.message_count,
+    cc.created_at,
+    CASE WHEN cc.embedding IS NULL THEN 0.0
+         ELSE 1 - (cc.embedding <=> query_embedding) END AS similarity,
+    coalesce(f.lexical_rank, 0.0) AS lexical_rank,
+    f.rrf_score::float AS rrf_score
+  FROM fused f
+  JOIN conversation_chunks cc ON cc.id = f.id
+  ORDER BY f.rrf_score DESC
+  LIMIT match_count;
+END;
+$$;
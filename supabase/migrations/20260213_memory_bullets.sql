@@ -0,0 +1,54 @@
+-- =============================================
+-- MEMORY Bullets Migration
+-- Per-bullet embeddings of user_profiles.memory_md
+-- =============================================
+--
+-- Purpose: every chat turn used to inject the whole MEMORY section (up to
+-- ~5000 tokens) regardless of topic. The full pass now splits memory_md
+-- into its bullets and embeds each one here, so rlm-service can inject a
+-- small always-on core plus only the bullets relevant to the current
+-- message (MEMORY_SLICE, rlm-service/memory_slicer.py).
+--
+-- memory_hash is the SHA-1 of the memory_md the rows were built from. When
+-- the profile's memory_md no longer matches (edited, regenerated, or the
+-- full pass failed before indexing), rlm-service injects the whole MEMORY
+-- section as before.
+--
+-- bullet_count is the number of bullets written for that memory_hash. Rows
+-- are written in batches without a transaction, so a full pass that fails
+-- part way can leave an incomplete set behind; rlm-service only slices when
+-- it finds exactly bullet_count rows with one hash (safe to re-run this
+-- migration to add the column).
+--
+-- IMPORTANT: Run this migration manually in Supabase SQL Editor
+-- (migrations are not auto-applied in production). Until it is applied,
+-- indexing fails (non-fatal) and the whole MEMORY section is injected.
+
+create table if not exists public.memory_bullets (
+  id uuid primary key default gen_random_uuid(),
+  user_id uuid not null references auth.users(id) on delete cascade,
+  position int not null,          -- order within memory_md
+  section text,                   -- "## " heading the bullet sits under
+  content text not null,          -- bullet text without the "- " marker
+  is_core boolean not null default false,
+  memory_hash text not null,
+  bullet_count int,               -- bullets written for memory_hash
+  embedding vector(768),
+  created_at timestamptz default now()
+);
+
+alter table public.memory_bullets add column if not exists bullet_count int;
+
+-- Indexes
+create index if not exists idx_memory_bullets_user_position on public.memory_bullets(user_id, position);
+
+-- RLS
+alter table public.memory_bullets enable row level security;
+
+create policy "Users can view own memory bullets"
+  on public.memory_bullets for select
+  using (auth.uid() = user_id);
+
+create policy "Service role full access"
+  on public.memory_bullets for all
+  using (auth.role() = 'service_role');